@@ -0,0 +1,8 @@
+"""Offline benchmarks for the TTN Platform Interface processor.
+
+Run from the repository root::
+
+    uv run python -m benchmarks.run
+
+See ``benchmarks.run`` for the available options.
+"""
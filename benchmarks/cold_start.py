@@ -0,0 +1,237 @@
+"""Cold-start cost: import time and first-event latency.
+
+Every run starts a fresh interpreter, as Lambda does for a new container,
+and measures:
+
+- importing ``ttn_platform_interface`` (what Lambda does before the first
+  event)
+- building the config schema
+- the first uplink invocation, then a warm one
+- the first downlink sweep (which opens the HTTP session), then a warm one
+
+and whether aiohttp was loaded by the import (pydoover's processor runtime
+may import it itself) or only by the uplink path. The TTN stand-in runs in
+this (parent) process so it doesn't load aiohttp into the child. ``python -X importtime`` is run once for a per-module breakdown.
+
+Examples::
+
+    uv run python -m benchmarks.cold_start
+    uv run python -m benchmarks.cold_start --runs 20 --fleet 1000 --top 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).parents[1]
+
+PHASES = (
+    ("import_ms", "import"),
+    ("config_ms", "config"),
+    ("first_uplink_ms", "1st uplink"),
+    ("warm_uplink_ms", "warm uplink"),
+    ("first_sweep_ms", "1st sweep"),
+    ("warm_sweep_ms", "warm sweep"),
+)
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+# Run with ``-c`` so nothing but the interpreter itself is loaded beforehand
+_IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import ttn_platform_interface
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def measure_import() -> float:
+    """Milliseconds to import the package in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_SNIPPET],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return round(float(output.splitlines()[-1]), 3)
+
+
+async def child(args) -> dict:
+    import ttn_platform_interface
+
+    result = {"aiohttp_after_import": "aiohttp" in sys.modules}
+    start = time.perf_counter()
+    ttn_platform_interface.get_config()
+    result["config_ms"] = _ms(start)
+
+    from tests.fakes import BenchApp, FakeTagStore, bench_config
+    from ttn_platform_interface.warm_state import WARM_STATE
+
+    from . import payloads
+    from .run import invoke
+
+    rng = random.Random(args.seed)
+    device_ids = payloads.device_ids(args.fleet)
+    store = FakeTagStore()
+    config = bench_config(device_ids, args.ttn_url)
+
+    for f_cnt, phase in enumerate(("first_uplink_ms", "warm_uplink_ms"), 1):
+        event = SimpleNamespace(
+            message=SimpleNamespace(
+                data=payloads.uplink_message(rng, device_ids, f_cnt)
+            )
+        )
+        result[phase] = round(
+            await invoke(BenchApp(config, store), "on_message_create", event) * 1000, 3
+        )
+    result["aiohttp_loaded_by_uplink"] = (
+        "aiohttp" in sys.modules and not result["aiohttp_after_import"]
+    )
+
+    try:
+        for phase in ("first_sweep_ms", "warm_sweep_ms"):
+            device_id = rng.choice(device_ids)
+            store.put(f"ttn_downlink_request_{device_id}", {"frm_payload": "AQID"})
+            result[phase] = round(
+                await invoke(BenchApp(config, store), "on_schedule", None) * 1000, 3
+            )
+    finally:
+        await WARM_STATE.close()
+    return result
+
+
+def import_breakdown(top: int) -> tuple[float, list[tuple[str, float, float]]]:
+    """Total import time (ms) and the ``top`` slowest modules by self time."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import ttn_platform_interface"],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    modules = []
+    total = 0.0
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append((name, int(self_us) / 1000, int(cumulative_us) / 1000))
+        if not indent:
+            # Top-level imports (the package and what ``-c`` itself pulls in)
+            total += int(cumulative_us) / 1000
+    modules.sort(key=lambda m: m[1], reverse=True)
+    return total, modules[:top]
+
+
+def run_child(args, ttn_url: str) -> dict:
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.cold_start",
+            "--child",
+            "--ttn-url",
+            ttn_url,
+            "--fleet",
+            str(args.fleet),
+            "--seed",
+            str(args.seed),
+        ],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return {"import_ms": measure_import(), **json.loads(output.splitlines()[-1])}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--runs", type=int, default=10, help="Fresh interpreters to start"
+    )
+    parser.add_argument("--fleet", type=int, default=100, help="Mapped device count")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--ttn-url", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> dict:
+    args = parse_args(argv)
+    if args.child:
+        logging.basicConfig(level=logging.ERROR)
+        print(json.dumps(await child(args)))
+        return {}
+
+    from tests.fakes import FakeTtnServer
+
+    server = FakeTtnServer(seed=args.seed)
+    await server.start()
+    try:
+        # Children block on the subprocess, so run them off the event loop
+        # that is serving the TTN stand-in
+        runs = [
+            await asyncio.to_thread(run_child, args, server.url)
+            for _ in range(args.runs)
+        ]
+    finally:
+        await server.stop()
+    import_total, slowest = import_breakdown(args.top)
+
+    results = {
+        "runs": args.runs,
+        "fleet": args.fleet,
+        **{
+            key: round(statistics.median(run[key] for run in runs), 3)
+            for key, _ in PHASES
+        },
+        "aiohttp_after_import": any(run["aiohttp_after_import"] for run in runs),
+        "aiohttp_loaded_by_uplink": any(
+            run["aiohttp_loaded_by_uplink"] for run in runs
+        ),
+        "importtime_total_ms": round(import_total, 3),
+        "slowest_imports": [
+            {"module": name, "self_ms": self_ms, "cumulative_ms": cumulative_ms}
+            for name, self_ms, cumulative_ms in slowest
+        ],
+    }
+
+    print(f"median of {args.runs} fresh interpreters, {args.fleet} mapped devices")
+    print("  ".join(f"{title:>11}" for _, title in PHASES))
+    print("  ".join(f"{results[key]:>11}" for key, _ in PHASES))
+    print(f"aiohttp imported with the package: {results['aiohttp_after_import']}")
+    print(f"aiohttp imported by the uplink path: {results['aiohttp_loaded_by_uplink']}")
+    print(
+        f"\n-X importtime: {results['importtime_total_ms']} ms, slowest modules (self time):"
+    )
+    for name, self_ms, cumulative_ms in slowest:
+        print(f"  {self_ms:>8.2f} ms  {cumulative_ms:>8.2f} ms cumulative  {name}")
+
+    if args.json:
+        await asyncio.to_thread(
+            Path(args.json).write_text, json.dumps(results, indent=2)
+        )
+    return results
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,150 @@
+"""Peak RSS against fleet size.
+
+Each fleet size runs in a fresh interpreter, so the figure is the whole
+process's peak resident set (``ru_maxrss``) -- what Lambda compares against
+the function's ``MemorySize`` -- rather than traced Python allocations.
+
+The child process imports the processor, handles one uplink from every
+device (in micro-batches, with large gateway lists), then runs a downlink
+sweep and a forced rebuild of the ``device_mapping_state`` summary over the
+whole fleet.
+
+Examples::
+
+    uv run python -m benchmarks.memory
+    uv run python -m benchmarks.memory --fleet 1000 10000 50000 --gateways 64
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import resource
+import subprocess
+import sys
+from types import SimpleNamespace
+
+DEFAULT_FLEETS = (10, 1000, 10_000, 50_000)
+
+# doover_config.json's Lambda MemorySize, in MB
+LAMBDA_MEMORY_MB = 128
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def child(args) -> dict:
+    # Imported here so the parent process stays small
+    from tests.fakes import BenchApp, FakeTagStore, FakeTtnServer, bench_config
+    from ttn_platform_interface.device_state import refresh_summary
+    from ttn_platform_interface.warm_state import WARM_STATE
+
+    from . import payloads
+    from .run import invoke
+
+    baseline = peak_rss_mb()
+    fleet = args.fleet[0]
+    rng = random.Random(args.seed)
+    device_ids = payloads.device_ids(fleet)
+    server = FakeTtnServer()
+    await server.start()
+    store = FakeTagStore()
+    config = bench_config(device_ids, server.url)
+
+    try:
+        # One uplink from every device, in micro-batches, so every device
+        # has state and the summary covers the whole fleet
+        for start in range(0, fleet, args.batch):
+            batch = [
+                payloads.uplink(rng, device_id, start + i + 1, args.gateways)
+                for i, device_id in enumerate(device_ids[start : start + args.batch])
+            ]
+            body = json.dumps({"uplinks": batch})
+            del batch
+            event = SimpleNamespace(message=SimpleNamespace(data=body))
+            await invoke(BenchApp(config, store), "on_message_create", event)
+        after_uplinks = peak_rss_mb()
+
+        for device_id in rng.sample(device_ids, max(1, fleet // 10)):
+            store.put(f"ttn_downlink_request_{device_id}", {"frm_payload": "AQID"})
+        await invoke(BenchApp(config, store), "on_schedule", None)
+
+        app = BenchApp(config, store)
+        await app.setup()
+        await refresh_summary(app.tags, force=True)
+        await app.close()
+    finally:
+        await WARM_STATE.close()
+        await server.stop()
+
+    return {
+        "fleet": fleet,
+        "baseline_mb": round(baseline, 1),
+        "after_uplinks_mb": round(after_uplinks, 1),
+        "peak_mb": round(peak_rss_mb(), 1),
+        "tag_store_mb": round(sum(len(v) for v in store.raw.values()) / 2**20, 1),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fleet", type=int, nargs="+", default=list(DEFAULT_FLEETS))
+    parser.add_argument(
+        "--batch", type=int, default=100, help="Uplinks per channel message"
+    )
+    parser.add_argument(
+        "--gateways", type=int, default=16, help="rx_metadata entries per uplink"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> list[dict]:
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(asyncio.run(child(args))))
+        return []
+
+    results = []
+    for fleet in args.fleet:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.memory",
+                "--child",
+                "--fleet",
+                str(fleet),
+                "--batch",
+                str(args.batch),
+                "--gateways",
+                str(args.gateways),
+                "--seed",
+                str(args.seed),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+
+    print(
+        f"{'fleet':>8}  {'import MB':>9}  {'uplinks MB':>10}  {'peak MB':>8}  {'headroom MB':>11}"
+    )
+    for r in results:
+        print(
+            f"{r['fleet']:>8}  {r['baseline_mb']:>9}  {r['after_uplinks_mb']:>10}  "
+            f"{r['peak_mb']:>8}  {LAMBDA_MEMORY_MB - r['peak_mb']:>11.1f}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Synthetic TTN uplink payloads of realistic shape and size."""
+
+import base64
+import json
+import random
+from datetime import UTC, datetime, timedelta
+
+EPOCH = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+def device_ids(count: int) -> list[str]:
+    return [f"bench-{i:05d}" for i in range(count)]
+
+
+def _gateway(rng: random.Random, index: int, at: str) -> dict:
+    # Mirrors the fields TTN includes per gateway in rx_metadata
+    return {
+        "gateway_ids": {
+            "gateway_id": f"gw-{index:04d}",
+            "eui": f"{rng.getrandbits(64):016X}",
+        },
+        "time": at,
+        "timestamp": rng.getrandbits(32),
+        "rssi": rng.randint(-120, -40),
+        "channel_rssi": rng.randint(-120, -40),
+        "snr": round(rng.uniform(-15, 12), 1),
+        "location": {
+            "latitude": round(rng.uniform(-45, -10), 6),
+            "longitude": round(rng.uniform(110, 155), 6),
+            "altitude": rng.randint(0, 500),
+            "source": "SOURCE_REGISTRY",
+        },
+        "uplink_token": base64.b64encode(rng.randbytes(60)).decode(),
+        "channel_index": rng.randint(0, 7),
+        "received_at": at,
+    }
+
+
+def uplink(
+    rng: random.Random,
+    device_id: str,
+    f_cnt: int,
+    gateways: int = 3,
+    payload_bytes: int = 12,
+) -> dict:
+    """One TTN uplink webhook message."""
+    at = (EPOCH + timedelta(seconds=f_cnt)).isoformat().replace("+00:00", "Z")
+    payload = rng.randbytes(payload_bytes)
+    return {
+        "end_device_ids": {
+            "device_id": device_id,
+            "application_ids": {"application_id": "bench-app"},
+            "dev_eui": f"{rng.getrandbits(64):016X}",
+            "dev_addr": f"{rng.getrandbits(32):08X}",
+        },
+        "correlation_ids": [f"as:up:{rng.getrandbits(128):032X}"],
+        "received_at": at,
+        "uplink_message": {
+            "session_key_id": base64.b64encode(rng.randbytes(16)).decode(),
+            "f_port": 2,
+            "f_cnt": f_cnt,
+            "frm_payload": base64.b64encode(payload).decode(),
+            "decoded_payload": {
+                "temperature": round(rng.uniform(-10, 40), 2),
+                "humidity": rng.randint(0, 100),
+                "battery": round(rng.uniform(3.0, 4.2), 3),
+            },
+            "rx_metadata": [_gateway(rng, i, at) for i in range(gateways)],
+            "settings": {
+                "data_rate": {"lora": {"bandwidth": 125000, "spreading_factor": 7}},
+                "frequency": "917200000",
+            },
+            "received_at": at,
+            "consumed_airtime": "0.061696s",
+        },
+    }
+
+
+def uplink_message(
+    rng: random.Random,
+    device_ids: list[str],
+    f_cnt: int,
+    batch: int = 1,
+    gateways: int = 3,
+    payload_bytes: int = 12,
+) -> str:
+    """A channel message body: one uplink, or a micro-batch of ``batch`` uplinks."""
+    messages = [
+        uplink(rng, rng.choice(device_ids), f_cnt + i, gateways, payload_bytes)
+        for i in range(batch)
+    ]
+    return json.dumps(messages[0] if batch == 1 else {"uplinks": messages})
@@ -0,0 +1,376 @@
+"""Benchmark the uplink path and the downlink sweep.
+
+Each scenario runs many invocations of the real handlers in one process,
+so the warm-container state is reused between them just as it is while
+Lambda keeps a container warm. For every scenario and fleet size it
+reports:
+
+- throughput (invocations and uplinks or downlinks per second)
+- per-invocation latency (p50/p95/p99, ms)
+- round trips per invocation (tag reads, tag writes, connection pings,
+  TTN requests)
+- peak traced memory during one invocation
+
+Examples::
+
+    uv run python -m benchmarks.run
+    uv run python -m benchmarks.run --fleet 10 1000 10000 --gateways 64
+    uv run python -m benchmarks.run --scenario sweep --ttn-429 0.05 --ttn-5xx 0.02
+    uv run python -m benchmarks.run --tag-latency-ms 5 --json results.json
+    uv run python -m benchmarks.run --scenario mqtt --mqtt-seconds 5 --set mqtt_batch_window_ms=250
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+from tests.fakes import (
+    BenchApp,
+    FakeMqttBroker,
+    FakeTagStore,
+    FakeTtnServer,
+    bench_config,
+)
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from . import payloads
+
+DEFAULT_FLEETS = (10, 100, 1000, 10_000)
+
+# Invocations traced for the peak memory figure (tracing is slow, so it is
+# kept out of the timed runs)
+MEMORY_SAMPLES = 5
+
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+async def invoke(app: BenchApp, handler: str, event) -> float:
+    """Run one invocation (setup, handler, close) and return its duration."""
+    start = time.perf_counter()
+    await app.setup()
+    try:
+        await getattr(app, handler)(event)
+    finally:
+        await app.close()
+    return time.perf_counter() - start
+
+
+async def peak_memory(run_once) -> int:
+    """Peak traced memory (bytes) over a few invocations."""
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(MEMORY_SAMPLES):
+            tracemalloc.reset_peak()
+            await run_once()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def summarise(
+    name: str,
+    fleet: int,
+    durations: list[float],
+    units: int,
+    round_trips: dict,
+    peak: int | None,
+) -> dict:
+    invocations = len(durations)
+    elapsed = sum(durations)
+    return {
+        "scenario": name,
+        "fleet": fleet,
+        "invocations": invocations,
+        "per_second": round(invocations / elapsed, 1) if elapsed else 0.0,
+        "units_per_second": round(units / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 95) * 1000, 3),
+        "p99_ms": round(percentile(durations, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(durations) * 1000, 3) if durations else 0.0,
+        **{
+            f"{key}_per_invocation": round(value / invocations, 2)
+            for key, value in round_trips.items()
+            if isinstance(value, int)
+        },
+        **{
+            key: value
+            for key, value in round_trips.items()
+            if not isinstance(value, int)
+        },
+        **({} if peak is None else {"peak_memory_kb": round(peak / 1024, 1)}),
+    }
+
+
+async def bench_uplinks(args, fleet: int, server: FakeTtnServer) -> dict:
+    """Uplink path: one channel message per invocation."""
+    rng = random.Random(args.seed)
+    device_ids = payloads.device_ids(fleet)
+    store = FakeTagStore(latency=args.tag_latency_ms / 1000)
+    config = bench_config(device_ids, server.url, **args.settings)
+    f_cnt = 0
+
+    def next_event():
+        nonlocal f_cnt
+        f_cnt += args.batch
+        body = payloads.uplink_message(
+            rng, device_ids, f_cnt, args.batch, args.gateways, args.payload_bytes
+        )
+        return SimpleNamespace(message=SimpleNamespace(data=body))
+
+    async def run_once() -> float:
+        return await invoke(BenchApp(config, store), "on_message_create", next_event())
+
+    # Warm-up invocation, as on the first event of a fresh container
+    await run_once()
+    store.reads = store.writes = store.pings = 0
+
+    durations = [await run_once() for _ in range(args.invocations)]
+    round_trips = store.counters()
+    peak = await peak_memory(run_once)
+    return summarise(
+        "uplink", fleet, durations, args.invocations * args.batch, round_trips, peak
+    )
+
+
+async def bench_sweep(args, fleet: int, server: FakeTtnServer) -> dict:
+    """Downlink sweep: one schedule run per invocation."""
+    rng = random.Random(args.seed)
+    device_ids = payloads.device_ids(fleet)
+    store = FakeTagStore(latency=args.tag_latency_ms / 1000)
+    config = bench_config(device_ids, server.url, **args.settings)
+    pending = max(1, int(fleet * args.pending))
+
+    def queue_downlinks():
+        marked = {}
+        for device_id in rng.sample(device_ids, pending):
+            store.put(
+                f"ttn_downlink_request_{device_id}",
+                [{"frm_payload": "AQID", "f_port": 2} for _ in range(args.queue_depth)],
+            )
+            marked[device_id] = f"{time.time():.6f}"
+        store.put("downlink_pending", marked)
+
+    async def run_once() -> float:
+        queue_downlinks()
+        return await invoke(BenchApp(config, store), "on_schedule", None)
+
+    await run_once()
+    store.reads = store.writes = store.pings = 0
+    server.requests = server.downlinks = 0
+    server.statuses.clear()
+
+    durations = [await run_once() for _ in range(args.invocations)]
+    round_trips = {**store.counters(), **server.counters()}
+    delivered = server.downlinks
+    peak = await peak_memory(run_once)
+    return summarise("sweep", fleet, durations, delivered, round_trips, peak)
+
+
+async def bench_mqtt(args, fleet: int, server: FakeTtnServer) -> dict:
+    """MQTT ingest: one scheduled run streaming uplinks for ``--mqtt-seconds``.
+
+    A publisher floods the broker stand-in for the whole run; throughput is
+    the number of uplinks processed (and acknowledged) per second.
+    """
+    rng = random.Random(args.seed)
+    device_ids = payloads.device_ids(fleet)
+    store = FakeTagStore(latency=args.tag_latency_ms / 1000)
+    broker = FakeMqttBroker("bench-app@ttn", "bench-key")
+    await broker.start()
+    config = bench_config(
+        device_ids,
+        server.url,
+        **{
+            "mqtt_url": broker.url,
+            "mqtt_ingest_seconds": args.mqtt_seconds,
+            **args.settings,
+        },
+    )
+
+    async def publish():
+        f_cnt = 0
+        while True:
+            f_cnt += 1
+            device_id = device_ids[f_cnt % fleet]
+            uplink = payloads.uplink(
+                rng, device_id, f_cnt, args.gateways, args.payload_bytes
+            )
+            await broker.publish(
+                f"v3/bench-app@ttn/devices/{device_id}/up", json.dumps(uplink).encode()
+            )
+            # Yield so the ingest gets to read between publishes
+            await asyncio.sleep(0)
+
+    publisher = asyncio.create_task(publish())
+    try:
+        duration = await invoke(BenchApp(config, store), "on_schedule", None)
+    finally:
+        publisher.cancel()
+        await asyncio.gather(publisher, return_exceptions=True)
+        await broker.stop()
+
+    result = summarise("mqtt", fleet, [duration], broker.acked, store.counters(), None)
+    result["uplinks"] = broker.acked
+    result["writes_per_uplink"] = round(store.writes / max(1, broker.acked), 3)
+    return result
+
+
+def print_table(results: list[dict]):
+    columns = [
+        ("scenario", "scenario"),
+        ("fleet", "fleet"),
+        ("per_second", "inv/s"),
+        ("units_per_second", "items/s"),
+        ("p50_ms", "p50 ms"),
+        ("p95_ms", "p95 ms"),
+        ("p99_ms", "p99 ms"),
+        ("reads_per_invocation", "reads"),
+        ("writes_per_invocation", "writes"),
+        ("pings_per_invocation", "pings"),
+        ("ttn_requests_per_invocation", "ttn req"),
+        ("peak_memory_kb", "peak KB"),
+    ]
+    rows = [[str(result.get(key, "-")) for key, _ in columns] for result in results]
+    widths = [
+        max(len(title), *(len(row[i]) for row in rows))
+        for i, (_, title) in enumerate(columns)
+    ]
+    print("  ".join(title.rjust(w) for (_, title), w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(cell.rjust(w) for cell, w in zip(row, widths)))
+    for result in results:
+        if result.get("ttn_statuses"):
+            print(
+                f"{result['scenario']} fleet={result['fleet']}: "
+                f"TTN statuses {result['ttn_statuses']}"
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario",
+        choices=("uplink", "sweep", "mqtt", "all"),
+        default="all",
+        help="'all' runs the uplink and sweep scenarios",
+    )
+    parser.add_argument(
+        "--fleet",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_FLEETS),
+        help="Mapped device counts to run each scenario with",
+    )
+    parser.add_argument("--invocations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+
+    uplink = parser.add_argument_group("uplink path")
+    uplink.add_argument(
+        "--gateways", type=int, default=3, help="rx_metadata entries per uplink"
+    )
+    uplink.add_argument("--payload-bytes", type=int, default=12)
+    uplink.add_argument(
+        "--batch", type=int, default=1, help="Uplinks per channel message"
+    )
+
+    sweep = parser.add_argument_group("downlink sweep")
+    sweep.add_argument(
+        "--pending",
+        type=float,
+        default=0.1,
+        help="Fraction of the fleet with queued downlinks on each run",
+    )
+    sweep.add_argument(
+        "--queue-depth", type=int, default=1, help="Downlinks queued per device"
+    )
+
+    mqtt = parser.add_argument_group("mqtt ingest")
+    mqtt.add_argument(
+        "--mqtt-seconds", type=int, default=2, help="Length of the ingest run"
+    )
+
+    stand_ins = parser.add_argument_group("stand-ins")
+    stand_ins.add_argument("--tag-latency-ms", type=float, default=0.0)
+    stand_ins.add_argument("--ttn-latency-ms", type=float, default=0.0)
+    stand_ins.add_argument(
+        "--ttn-429",
+        type=float,
+        default=0.0,
+        help="Fraction of TTN requests rate limited",
+    )
+    stand_ins.add_argument(
+        "--ttn-5xx", type=float, default=0.0, help="Fraction of TTN requests failing"
+    )
+    stand_ins.add_argument("--retry-after", type=float, default=0.05)
+
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="NAME=JSON",
+        help="Override a processor setting, e.g. --set use_pending_index=true",
+    )
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+
+    args = parser.parse_args(argv)
+    args.settings = {}
+    for item in args.set:
+        name, _, value = item.partition("=")
+        args.settings[name] = json.loads(value)
+    return args
+
+
+async def main(argv=None) -> list[dict]:
+    args = parse_args(argv)
+    server = FakeTtnServer(
+        latency=args.ttn_latency_ms / 1000,
+        rate_429=args.ttn_429,
+        rate_5xx=args.ttn_5xx,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    await server.start()
+
+    scenarios = []
+    if args.scenario in ("uplink", "all"):
+        scenarios.append(bench_uplinks)
+    if args.scenario in ("sweep", "all"):
+        scenarios.append(bench_sweep)
+    if args.scenario == "mqtt":
+        scenarios.append(bench_mqtt)
+
+    results = []
+    try:
+        for scenario in scenarios:
+            for fleet in args.fleet:
+                results.append(await scenario(args, fleet, server))
+    finally:
+        await WARM_STATE.close()
+        await server.stop()
+
+    print_table(results)
+    if args.json:
+        await asyncio.to_thread(
+            Path(args.json).write_text, json.dumps(results, indent=2)
+        )
+    return results
+
+
+if __name__ == "__main__":
+    # The processor logs every uplink and downlink at INFO
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(main())
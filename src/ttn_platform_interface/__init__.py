@@ -2,15 +2,27 @@ from typing import Any
 
 from pydoover.cloud.processor import run_app
 
-from .application import TtnPlatformInterface
 from .app_config import TtnPlatformInterfaceConfig
+from .application import TtnPlatformInterface
+
+# The config schema is built once per container. pydoover injects the
+# deployment config into it on every invocation, resetting any setting that
+# isn't present to its default, so reusing it doesn't carry values over.
+_config: TtnPlatformInterfaceConfig | None = None
+
+
+def get_config() -> TtnPlatformInterfaceConfig:
+    global _config
+    if _config is None:
+        TtnPlatformInterfaceConfig.clear_elements()
+        _config = TtnPlatformInterfaceConfig()
+    return _config
 
 
 def handler(event: dict[str, Any], context):
     """Lambda handler entry point."""
-    TtnPlatformInterfaceConfig.clear_elements()
     run_app(
-        TtnPlatformInterface(config=TtnPlatformInterfaceConfig()),
+        TtnPlatformInterface(config=get_config()),
         event,
         context,
     )
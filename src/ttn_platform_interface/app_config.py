@@ -37,6 +37,42 @@ class TtnPlatformInterfaceConfig(config.Schema):
             default="doover",
         )
 
+        # Additional TTN applications, possibly on other clusters, that
+        # mapping entries can be routed to
+        self.ttn_applications = config.Array(
+            "TTN Applications",
+            element=config.Object("TTN Application"),
+            description=(
+                "Additional TTN applications served by this processor. Mapping "
+                "entries are routed to one by its application ID"
+            ),
+            default=[],
+        )
+        self.ttn_applications.element.add_elements(
+            config.String(
+                "Application ID",
+                description="The TTN application ID",
+            ),
+            config.String(
+                "Cluster URL",
+                description=(
+                    "TTN cluster base URL (e.g., https://nam1.cloud.thethings.network). "
+                    "Defaults to the TTN Cluster URL"
+                ),
+                default=None,
+            ),
+            config.String(
+                "API Key",
+                description="API key for this application. Defaults to the TTN API Key",
+                default=None,
+            ),
+            config.String(
+                "Webhook ID",
+                description="Webhook ID for this application. Defaults to the TTN Webhook ID",
+                default=None,
+            ),
+        )
+
         # Tag name configuration
         self.uplink_tag_name = config.String(
             "Uplink Tag Name",
@@ -62,12 +98,37 @@ class TtnPlatformInterfaceConfig(config.Schema):
         self.device_mapping.element.add_elements(
             config.String(
                 "TTN Device ID",
-                description="The device_id in TTN (e.g., eui-0004a30b001c0530)",
+                description=(
+                    "The device_id in TTN (e.g., eui-0004a30b001c0530). "
+                    "Supports prefix (site-a-*) and glob (eui-70b3d5??????????) rules"
+                ),
             ),
             config.Application(
                 "Doover App Key",
                 description="The Doover app key (agent) to map this TTN device to",
             ),
+            config.String(
+                "TTN Dev EUI",
+                description="Optional DevEUI of the device, used to match uplinks by EUI",
+                default=None,
+            ),
+            config.Enum(
+                "LoRaWAN Class",
+                choices=["A", "B", "C"],
+                description=(
+                    "LoRaWAN class of the mapped devices; Class B and C devices "
+                    "are never held back by downlink scheduling"
+                ),
+                default="A",
+            ),
+            config.String(
+                "TTN Application ID",
+                description=(
+                    "Optional TTN application of the mapped devices, from TTN "
+                    "Applications. Defaults to the TTN Application ID"
+                ),
+                default=None,
+            ),
         )
 
         # Debug mode
@@ -77,6 +138,206 @@ class TtnPlatformInterfaceConfig(config.Schema):
             default=False,
         )
 
+        self.perf_metrics = config.Boolean(
+            "Perf Metrics",
+            description=(
+                "Time each processing stage and publish p50/p95/p99 latencies "
+                "to the perf tag (always on when Debug Enabled is set)"
+            ),
+            default=False,
+        )
+
+        # Downlink sweep tuning
+        self.downlink_concurrency = config.Integer(
+            "Downlink Concurrency",
+            description="Maximum number of devices processed in parallel during a downlink sweep",
+            default=8,
+        )
+
+        self.ttn_requests_per_second = config.Integer(
+            "TTN Requests Per Second",
+            description=(
+                "Maximum rate of downlink requests sent to the TTN API "
+                "(keep within your cluster's fair-use limits)"
+            ),
+            default=10,
+        )
+
+        self.use_pending_index = config.Boolean(
+            "Use Pending Index",
+            description=(
+                "Only check devices listed in the downlink_pending tag instead of "
+                "every mapped device (writers must mark devices they queue downlinks for)"
+            ),
+            default=False,
+        )
+
+        self.schedule_downlinks = config.Boolean(
+            "Schedule Class A Downlinks",
+            description=(
+                "Hold downlinks for Class A devices until their next uplink is "
+                "predicted within the lead time, instead of pushing them as soon "
+                "as they are queued"
+            ),
+            default=False,
+        )
+
+        self.downlink_lead_time = config.Integer(
+            "Downlink Lead Time",
+            description=(
+                "Seconds before a Class A device's predicted next uplink that its "
+                "downlinks are pushed (set at least to the schedule interval)"
+            ),
+            default=600,
+        )
+
+        self.downlink_spread = config.Integer(
+            "Downlink Spread",
+            description=(
+                "Spread each sweep's pushes over this many seconds, earliest "
+                "deadline first, instead of sending them in one burst "
+                "(0 disables, capped at 180)"
+            ),
+            default=0,
+        )
+
+        # Downlink delivery tracking
+        self.track_delivery = config.Boolean(
+            "Track Downlink Delivery",
+            description=(
+                "Report downlinks as queued, then sent, acked, nacked or failed "
+                "from TTN's downlink events (enable those message types on the "
+                "TTN webhook)"
+            ),
+            default=False,
+        )
+        self.delivery_ttl = config.Integer(
+            "Delivery Tracking TTL",
+            description=(
+                "Seconds to wait for a tracked downlink's delivery events before "
+                "marking it expired"
+            ),
+            default=86400,
+        )
+
+        # Uplink payload handling
+        self.decode_payload = config.Boolean(
+            "Decode Payload",
+            description=(
+                "Base64-decode frm_payload once at ingest (adds payload_hex) and "
+                "apply registered per-f_port decoders when TTN sends no decoded_payload"
+            ),
+            default=False,
+        )
+
+        self.deduplicate_uplinks = config.Boolean(
+            "Deduplicate Uplinks",
+            description=(
+                "Drop uplinks already processed (same device, f_cnt and received_at), "
+                "e.g. TTN webhook retries"
+            ),
+            default=True,
+        )
+
+        self.uplink_history_length = config.Integer(
+            "Uplink History Length",
+            description=(
+                "Number of recent uplinks kept per device in the "
+                "{uplink_tag_name}_history_{device_id} tag (0 disables history)"
+            ),
+            default=0,
+        )
+
+        # Change detection on uplink tag writes
+        self.change_detection = config.Boolean(
+            "Change Detection",
+            description=(
+                "Skip uplink tag writes for readings that haven't changed beyond "
+                "their deadbands since the device's last written uplink"
+            ),
+            default=False,
+        )
+        self.change_max_silence = config.Integer(
+            "Change Detection Max Silence",
+            description=(
+                "Seconds after which a device's uplink is written even if "
+                "unchanged (0 never forces a write)"
+            ),
+            default=3600,
+        )
+        self.change_deadbands = config.Array(
+            "Change Detection Deadbands",
+            element=config.Object("Deadband"),
+            description=(
+                "Per-field deadbands: a decoded_payload field, rssi or snr only "
+                "counts as changed once it moves further than this"
+            ),
+            default=[],
+        )
+        self.change_deadbands.element.add_elements(
+            config.String(
+                "Field",
+                description="A top-level decoded_payload field, rssi or snr",
+            ),
+            config.Number(
+                "Deadband",
+                description="Largest change that is ignored",
+                default=0,
+            ),
+        )
+
+        # MQTT streaming ingest
+        self.mqtt_ingest_seconds = config.Integer(
+            "MQTT Ingest Seconds",
+            description=(
+                "Seconds each scheduled run streams uplinks from the TTN MQTT "
+                "server, for every configured TTN application, in batches "
+                "(0 disables; capped at 240, and shortened to the time the "
+                "downlink sweep leaves in the run)"
+            ),
+            default=0,
+        )
+
+        self.mqtt_url = config.String(
+            "TTN MQTT URL",
+            description=(
+                "TTN MQTT server (e.g., mqtts://eu1.cloud.thethings.network:8883) "
+                "for applications on the default cluster. Defaults to the TTN "
+                "cluster host on port 8883; applications on other clusters "
+                "always use their cluster host"
+            ),
+            default=None,
+        )
+
+        self.mqtt_username = config.String(
+            "TTN MQTT Username",
+            description=(
+                "MQTT username of the default application. Defaults to "
+                "{TTN Application ID}@ttn. Other applications use their own "
+                "application ID with the same tenant"
+            ),
+            default=None,
+        )
+
+        self.mqtt_batch_window_ms = config.Integer(
+            "MQTT Batch Window",
+            description=(
+                "Milliseconds of MQTT uplinks collected into each batch "
+                "before it is processed and its tags written"
+            ),
+            default=1000,
+        )
+
+        # Connection status
+        self.connection_ping_interval = config.Integer(
+            "Connection Ping Interval",
+            description=(
+                "Minimum seconds between connection pings sent on uplinks "
+                "(0 pings on every uplink, capped at 1800)"
+            ),
+            default=300,
+        )
+
 
 def export():
     TtnPlatformInterfaceConfig().export(
@@ -8,11 +8,11 @@ Bidirectional bridge between the Doover tag system and The Things Network (TTN).
 """
 
 import asyncio
-import json
+import functools
 import logging
-from datetime import datetime, timezone, timedelta
-
-import aiohttp
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
 
 from pydoover.cloud.processor import (
     Application,
@@ -23,10 +23,51 @@ from pydoover.cloud.processor.types import (
     ScheduleEvent,
 )
 
+from . import (
+    change_detection,
+    dedup,
+    delivery,
+    downlink_queue,
+    downlink_schedule,
+    pending_index,
+    routing,
+    uplink_history,
+    uplinks,
+)
 from .app_config import TtnPlatformInterfaceConfig
+from .circuit_breaker import CIRCUIT_TAG, CircuitBreaker
+from .connection import DEFAULT_PING_INTERVAL_SECONDS, OFFLINE_AFTER
+from .counters import STATS_TAG, StatsShard, aggregate_stats, stats_stale
+from .device_index import get_device_index
+from .device_state import (
+    SUMMARY_TAG,
+    SUMMARY_UPDATED_TAG,
+    get_device_states,
+    record_devices,
+    refresh_summary,
+    registered_devices,
+    summary_stale,
+)
+from .perf import PERF, aggregate_perf
+from .rate_limit import SharedBackoff, TokenBucket
+from .tag_buffer import TagWriteBuffer
+from .ttn_client import DEFAULT_REQUESTS_PER_SECOND, TtnClient
+from .uplinks import (
+    UplinkRecord,
+    latest_per_device,
+    latest_record,
+    records_per_device,
+)
+from .warm_state import WARM_STATE
 
 log = logging.getLogger(__name__)
 
+DEFAULT_DOWNLINK_CONCURRENCY = 8
+
+# Aggregates written only by this processor, whose values may be reused from
+# the warm container instead of being re-read every invocation.
+SNAPSHOT_TAGS = frozenset({SUMMARY_UPDATED_TAG, CIRCUIT_TAG, STATS_TAG})
+
 
 class TtnPlatformInterface(Application):
     """TTN Platform Interface processor.
@@ -40,42 +81,77 @@ class TtnPlatformInterface(Application):
 
     Downlink requests are read from this processor's tags (keyed by TTN device
     ID using the configurable downlink request tag name). Other Doover apps
-    write to these tags to trigger downlinks.
+    write to these tags to trigger downlinks. Devices can be spread over
+    several TTN applications and clusters (see ``routing``).
     """
 
     config: TtnPlatformInterfaceConfig
 
     async def setup(self):
-        """Initialize HTTP client session and load configuration."""
-        self.http_session = aiohttp.ClientSession(
-            headers={
-                "User-Agent": "doover-ttn-platform-interface",
-            },
-            timeout=aiohttp.ClientTimeout(total=30),
+        """Load configuration and per-invocation state."""
+        # Start of the invocation, for budgeting the scheduled run's time
+        self.started_at = time.monotonic()
+
+        # Device mapping lookup, compiled once per container per config.
+        # device_map holds the exact ttn_device_id -> doover_app_key entries
+        # (the devices the downlink sweep visits); device_index additionally
+        # resolves uplinks by dev_eui and by prefix/glob rules.
+        self.device_index = get_device_index(self.config.device_mapping)
+        self.device_map = self.device_index.by_device_id
+
+        # TTN applications by ID (the default first) and the clusters they live on
+        self.applications = routing.applications_from_config(self.config)
+        self.default_cluster = routing.cluster_host(self.config.ttn_api_url.value)
+        circuit_tags = {
+            routing.circuit_tag(application.cluster, self.default_cluster)
+            for application in self.applications.values()
+        }
+
+        # Drop warm-container tag snapshots whenever the config changes
+        WARM_STATE.bind_config(
+            (
+                self.device_index.digest,
+                self.config.ttn_api_url.value,
+                self.config.ttn_application_id.value,
+                self.config.uplink_tag_name.value,
+                tuple(self.applications.values()),
+            ),
+            SNAPSHOT_TAGS | circuit_tags,
+        )
+        # Stage timings, collected only when perf metrics (or debug) are on
+        PERF.enabled = bool(
+            self.config.perf_metrics.value or self.config.debug_enabled.value
         )
+        self.tags = TagWriteBuffer(
+            self,
+            WARM_STATE.tag_snapshots,
+            PERF if PERF.enabled else None,
+        )
+
+        # Downlinks pushed with delivery tracking during this invocation
+        self.tracked = delivery.DeliveryIndex()
 
-        # Build device mapping lookup: ttn_device_id -> doover_app_key
-        self.device_map = {}
-        if self.config.device_mapping and self.config.device_mapping.elements:
-            for entry in self.config.device_mapping.elements:
-                elems = entry.elements
-                ttn_device_id = elems[0].value
-                doover_app_key = elems[1].value
-                if ttn_device_id and doover_app_key:
-                    self.device_map[ttn_device_id] = doover_app_key
+        # Stats counters live in a shard owned by this container
+        if WARM_STATE.stats_shard is None:
+            WARM_STATE.stats_shard = StatsShard()
+        self.counters = WARM_STATE.stats_shard
 
         log.info(
             "TTN Platform Interface setup complete. "
-            "Device mappings: %d, API URL: %s, App ID: %s",
-            len(self.device_map),
+            "Device mappings: %d, API URL: %s, App ID: %s, TTN applications: %d",
+            len(self.device_index),
             self.config.ttn_api_url.value,
             self.config.ttn_application_id.value or "(not set)",
+            len(self.applications),
         )
 
     async def close(self):
-        """Clean up HTTP client resources."""
-        if self.http_session and not self.http_session.closed:
-            await self.http_session.close()
+        """Flush any outstanding tag writes.
+
+        The HTTP session is pooled in the warm container state and deliberately
+        left open for the next invocation.
+        """
+        await self._flush_tags()
 
     # ── Uplink Processing ──────────────────────────────────────────────
 
@@ -84,121 +160,547 @@ class TtnPlatformInterface(Application):
 
         Parses the TTN uplink JSON, maps the device to a Doover agent,
         writes parsed data to processor tags, and updates connection status.
+        A message may also carry a micro-batch of uplinks (a JSON array, or an
+        object with an "uplinks" array), which are all processed in this one
+        invocation. TTN downlink events (sent, ack, nack, failed) arriving on the
+        same channels update delivery status instead (see ``_track_delivery``).
+        Tag writes are buffered and committed once at the end of the handler.
+
+        Scheduled runs normally keep the ``stats`` and ``device_mapping_state``
+        tags current; if they have gone stale (e.g. no schedule is configured),
+        the uplink path rebuilds them (the summary only under its lease).
+        """
+        records = []
+        with PERF.timer("uplink.total"):
+            try:
+                records = await self._process_uplink(event.message.data)
+                await self._refresh_stale_aggregates()
+            finally:
+                written = await self._flush_tags()
+        # Only once they are stored: a redelivery of uplinks whose writes
+        # failed must not be dropped as a duplicate
+        if written:
+            dedup.remember(WARM_STATE.seen_uplinks, records)
+
+    async def _process_uplink(self, data) -> list[UplinkRecord]:
+        """Parse, filter and buffer the tag writes for a channel message.
+
+        Returns the uplink records written. Callers remember them as seen
+        once the buffered writes have been flushed.
+        """
+        try:
+            with PERF.timer("uplink.parse"):
+                if isinstance(data, (str, bytes)):
+                    data = uplinks.loads(data)
+                # A message may carry a single uplink or a micro-batch of them,
+                # and TTN sends downlink events over the same webhook
+                messages = uplinks.split_batch(data)
+                events = [m for m in messages if delivery.is_event(m)]
+                if events:
+                    messages = [m for m in messages if not delivery.is_event(m)]
+                records, app_keys = await self._parse_uplinks(messages)
+
+            if events:
+                await self._track_delivery(events)
+
+            if records and self.config.deduplicate_uplinks.value:
+                with PERF.timer("uplink.dedup"):
+                    records = await self._drop_duplicates(records)
+
+            if records:
+                with PERF.timer("uplink.write"):
+                    await self._write_uplinks(records, app_keys)
+            return records
+
+        except Exception as e:
+            log.exception("Error processing uplink message")
+            await self._record_error(f"Uplink processing error: {e}")
+            return []
+
+    async def _refresh_stale_aggregates(self):
+        """Rebuild ``stats`` and the device summary if they have gone stale.
+
+        Both read tags across every container or device, so each is only
+        rebuilt by the invocation that claims its lease (see ``lease``).
         """
         try:
-            data = event.message.data
-            if isinstance(data, str):
-                data = json.loads(data)
-
-            # Extract TTN uplink fields
-            end_device_ids = data.get("end_device_ids", {})
-            ttn_device_id = end_device_ids.get("device_id")
-            dev_eui = end_device_ids.get("dev_eui")
-
-            uplink_message = data.get("uplink_message", {})
-            f_port = uplink_message.get("f_port")
-            f_cnt = uplink_message.get("f_cnt")
-            frm_payload = uplink_message.get("frm_payload")
-            decoded_payload = uplink_message.get("decoded_payload")
-            rx_metadata = uplink_message.get("rx_metadata", [])
-            received_at = uplink_message.get("received_at")
-
-            if not ttn_device_id:
+            with PERF.timer("uplink.aggregate"):
+                if await stats_stale(self.tags) and await WARM_STATE.leases.claim(
+                    self, STATS_TAG, self.counters.shard_id
+                ):
+                    await aggregate_stats(self.tags, self.counters)
+                if await summary_stale(self.tags) and await WARM_STATE.leases.claim(
+                    self, SUMMARY_TAG, self.counters.shard_id
+                ):
+                    await refresh_summary(self.tags, force=True)
+        except Exception as e:
+            log.warning(
+                "Error refreshing stale stats or device summary: %s", e, exc_info=True
+            )
+
+    async def _parse_uplinks(
+        self,
+        messages: list[dict],
+    ) -> tuple[list[UplinkRecord], dict[str, str]]:
+        """Parse TTN uplink messages into records for mapped devices.
+
+        Returns ``(records, app_keys)``, where ``app_keys`` maps each TTN
+        device ID to its resolved Doover app key.
+        """
+        decode_payload = bool(self.config.decode_payload.value)
+
+        records = []
+        app_keys = {}
+        for message in messages:
+            try:
+                record = uplinks.parse_uplink(message, decode_payload)
+            except Exception as e:
+                log.exception("Error parsing uplink message")
+                await self._record_error(f"Uplink parsing error: {e}")
+                continue
+
+            if record is None:
                 log.warning("Uplink message missing device_id, skipping")
-                return
+                continue
 
             # Check if device is in our mapping
-            doover_app_key = self.device_map.get(ttn_device_id)
+            doover_app_key = self.device_index.resolve(record.device_id, record.dev_eui)
             if not doover_app_key:
                 log.warning(
                     "No device mapping found for TTN device '%s', skipping",
-                    ttn_device_id,
+                    record.device_id,
                 )
                 if self.config.debug_enabled.value:
-                    await self.set_tag(
+                    self.tags.set(
                         "last_error",
-                        f"Unmapped TTN device: {ttn_device_id}",
+                        f"Unmapped TTN device: {record.device_id}",
                     )
-                return
-
-            # Extract best RSSI and SNR from rx_metadata
-            rssi = None
-            snr = None
-            if rx_metadata:
-                best_gw = max(rx_metadata, key=lambda g: g.get("rssi", -999))
-                rssi = best_gw.get("rssi")
-                snr = best_gw.get("snr")
-
-            # Build uplink tag data
-            uplink_tag_name = self.config.uplink_tag_name.value or "ttn_uplink"
-            now = datetime.now(timezone.utc)
-
-            uplink_data = {
-                "device_id": ttn_device_id,
-                "dev_eui": dev_eui,
-                "f_port": f_port,
-                "f_cnt": f_cnt,
-                "payload": frm_payload,
-                "decoded_payload": decoded_payload,
-                "rssi": rssi,
-                "snr": snr,
-                "timestamp": received_at or now.isoformat(),
-            }
+                continue
+
+            records.append(record)
+            app_keys[record.device_id] = doover_app_key
 
+        return records, app_keys
+
+    async def _drop_duplicates(
+        self,
+        records: list[UplinkRecord],
+    ) -> list[UplinkRecord]:
+        """Drop uplinks that have already been processed.
+
+        Uplinks seen by this warm container are dropped without any tag I/O;
+        the rest are checked against each device's recent frames, held in the
+        device state tags that ``_write_uplinks`` updates anyway.
+        """
+        records, duplicates = dedup.drop_seen(records, WARM_STATE.seen_uplinks)
+        if records:
+            states = await get_device_states(
+                self.tags, {record.device_id for record in records}
+            )
+            records, dropped = dedup.drop_recent(records, states)
+            # Remember them so further retries are caught without tag I/O
+            dedup.remember(WARM_STATE.seen_uplinks, dropped)
+            duplicates += len(dropped)
+
+        if duplicates:
+            log.info("Dropped %d duplicate uplink(s)", duplicates)
+            self.counters.add("uplinks_duplicate", duplicates, defer=True)
+        return records
+
+    async def _write_uplinks(
+        self,
+        records: list[UplinkRecord],
+        app_keys: dict[str, str],
+    ):
+        """Write a batch of parsed uplinks to tags.
+
+        Only the most recent record per device is written to that device's
+        uplink tag (and the most recent overall to the summary tag); every
+        record counts towards the processor stats. With change detection on,
+        records that haven't changed since the last write are left out of
+        the uplink tags. ``app_keys`` maps each TTN device ID in the batch to
+        its resolved Doover app key.
+        """
+        uplink_tag_name = self.config.uplink_tag_name.value or "ttn_uplink"
+        now = datetime.now(UTC)
+
+        latest = latest_per_device(records)
+        device_records = records_per_device(records)
+        states = await get_device_states(self.tags, latest)
+
+        fingerprints = None
+        changed = latest
+        if self.config.change_detection.value:
+            fingerprints, changed = self._detect_changes(latest, states, now)
+
+        for ttn_device_id, record in changed.items():
             # Write uplink data to processor's own tags, keyed by device ID
             # Other apps read this processor's tags using its app_key
-            tag_key = f"{uplink_tag_name}_{ttn_device_id}"
-            await self.set_tag(tag_key, uplink_data)
+            self.tags.set(
+                f"{uplink_tag_name}_{ttn_device_id}",
+                record.to_tag(now.isoformat()),
+            )
 
-            # Also write a "latest uplink" summary without device-specific key
-            # for quick access to most recent data
-            await self.set_tag(uplink_tag_name, uplink_data)
+        # Also write a "latest uplink" summary without device-specific key
+        # for quick access to most recent data
+        if changed:
+            self.tags.set(
+                uplink_tag_name,
+                latest_record(changed.values()).to_tag(now.isoformat()),
+            )
 
-            # Update connection status for this processor's agent
-            await self.ping_connection(
-                online_at=now,
-                connection_status=ConnectionStatus.periodic_unknown,
-                offline_at=now + timedelta(hours=1),
+        # Append every record (not just the latest) to the per-device history
+        history_length = self.config.uplink_history_length.value or 0
+        if history_length > 0:
+            await uplink_history.append_history(
+                self.tags,
+                uplink_tag_name,
+                device_records,
+                history_length,
+                now.isoformat(),
             )
 
-            # Update processor-level stats
-            stats = await self.get_tag("stats") or {}
-            stats["uplinks_processed"] = stats.get("uplinks_processed", 0) + 1
-            await self.set_tag("stats", stats)
-            await self.set_tag("last_uplink_at", now.isoformat())
-
-            # Update device mapping state with last-seen timestamp
-            mapping_state = await self.get_tag("device_mapping_state") or {}
-            mapping_state[ttn_device_id] = {
-                "doover_app_key": doover_app_key,
-                "last_seen": now.isoformat(),
-                "rssi": rssi,
-                "snr": snr,
-            }
-            await self.set_tag("device_mapping_state", mapping_state)
+        # Update connection status for this processor's agent
+        await self._ping_connection(now)
 
+        # Update processor-level stats
+        self.counters.add("uplinks_processed", len(records))
+        self.tags.set("last_uplink_at", now.isoformat())
+
+        # Update device mapping state with last-seen timestamp, the uplink
+        # interval used for downlink scheduling, the recent frames used for
+        # duplicate filtering and the fingerprint of the last written record
+        # used for change detection. Each device has a state tag of its own,
+        # so only the devices in this batch are written.
+        record_devices(
+            self.tags,
+            {
+                ttn_device_id: {
+                    "doover_app_key": app_keys[ttn_device_id],
+                    "last_seen": now.isoformat(),
+                    "rssi": record.rssi,
+                    "snr": record.snr,
+                    "uplink_interval": downlink_schedule.update_interval(
+                        states.get(ttn_device_id), now
+                    ),
+                    "recent_frames": dedup.recent_frames(
+                        states.get(ttn_device_id, {}).get("recent_frames"),
+                        device_records[ttn_device_id],
+                    ),
+                    **(
+                        {"written": fingerprints[ttn_device_id]} if fingerprints else {}
+                    ),
+                }
+                for ttn_device_id, record in latest.items()
+            },
+            states,
+        )
+
+        newest = latest_record(latest.values())
+        if len(records) == 1:
             log.info(
                 "Processed uplink from TTN device '%s' (app_key=%s)",
-                ttn_device_id,
-                doover_app_key,
+                newest.device_id,
+                app_keys[newest.device_id],
+            )
+        else:
+            log.info(
+                "Processed batch of %d uplinks from %d TTN devices",
+                len(records),
+                len(latest),
             )
 
-        except Exception as e:
-            log.error("Error processing uplink message: %s", e, exc_info=True)
-            await self._record_error(f"Uplink processing error: {e}")
+    def _detect_changes(
+        self,
+        latest: dict[str, UplinkRecord],
+        states: dict[str, dict],
+        now: datetime,
+    ) -> tuple[dict[str, dict], dict[str, UplinkRecord]]:
+        """Split out the records that changed since each device's last write.
+
+        Returns ``(fingerprints, changed)``: the fingerprint of the last
+        written record for every device (new for changed devices, carried
+        over for the rest) and the changed records.
+        """
+        with PERF.timer("uplink.changes"):
+            deadbands = change_detection.deadbands_from_config(
+                self.config.change_deadbands
+            )
+            max_silence = self.config.change_max_silence.value
+            if max_silence is None:
+                max_silence = change_detection.DEFAULT_MAX_SILENCE_SECONDS
+
+            fingerprints = {}
+            changed = {}
+            for ttn_device_id, record in latest.items():
+                previous = states.get(ttn_device_id, {}).get("written")
+                current = change_detection.fingerprint(
+                    record, deadbands, now.isoformat()
+                )
+                if change_detection.changed(
+                    previous, current, deadbands, now, max_silence
+                ):
+                    fingerprints[ttn_device_id] = current
+                    changed[ttn_device_id] = record
+                else:
+                    fingerprints[ttn_device_id] = previous
+
+        unchanged = len(latest) - len(changed)
+        if unchanged:
+            log.debug("Skipped uplink tag writes for %d unchanged device(s)", unchanged)
+            self.counters.add("uplinks_unchanged", unchanged, defer=True)
+        return fingerprints, changed
+
+    async def _ping_connection(self, now: datetime):
+        """Mark this processor's agent online, coalescing repeated pings.
+
+        A ping is skipped if this container already sent one with the same
+        status within the ping interval.
+        """
+        status = ConnectionStatus.periodic_unknown
+        interval = self.config.connection_ping_interval.value
+        if interval is None:
+            interval = DEFAULT_PING_INTERVAL_SECONDS
+        if not WARM_STATE.pings.due(status, now, interval):
+            return
+
+        with PERF.timer("ping_connection"):
+            await self.ping_connection(
+                online_at=now,
+                connection_status=status,
+                offline_at=now + OFFLINE_AFTER,
+            )
+        WARM_STATE.pings.record(status, now)
+
+    async def _track_delivery(self, messages: list[dict]):
+        """Apply TTN downlink events to the status tags of tracked downlinks.
+
+        Each event is matched to its device's status tag through the
+        correlation IDs of the downlinks tracked there, including those of
+        earlier pushes, and only moves a downlink's status forward.
+        """
+        if not self.config.track_delivery.value:
+            log.debug(
+                "Ignoring %d TTN downlink event(s), delivery tracking is off",
+                len(messages),
+            )
+            return
+
+        events = [
+            event for message in messages if (event := delivery.parse_event(message))
+        ]
+        if not events:
+            return
+
+        with PERF.timer("downlink.track"):
+            status_tag = self.config.downlink_status_tag.value or "ttn_downlink_status"
+            for event in events:
+                if not event.device_id:
+                    log.debug("Ignoring TTN downlink event without a device ID")
+                    continue
+                await self._update_delivery_status(
+                    f"{status_tag}_{event.device_id}",
+                    event.correlation_ids,
+                    event.status,
+                    event.at,
+                    event.error,
+                )
+
+    async def _update_delivery_status(
+        self,
+        status_key: str,
+        correlation_ids: list[str],
+        status: str,
+        at: str | None = None,
+        error: str | None = None,
+    ) -> bool:
+        """Move the tracked downlinks in ``correlation_ids`` to ``status``.
+
+        The tag's top-level status only moves for the latest push's downlinks.
+        Returns True if the tag was updated.
+        """
+        current = await self.tags.get(status_key)
+        tracked = delivery.deliveries(current)
+        moved = [
+            correlation_id
+            for correlation_id in correlation_ids
+            if correlation_id in tracked
+            and delivery.advances(tracked[correlation_id], status)
+        ]
+        if not moved:
+            return False
+
+        updated = {**current, "deliveries": {**tracked, **dict.fromkeys(moved, status)}}
+        latest = not set(current.get("correlation_ids") or ()).isdisjoint(moved)
+        if latest and delivery.advances(current.get("status"), status):
+            updated["status"] = status
+            updated[f"{status}_at"] = at or datetime.now(UTC).isoformat()
+            if error:
+                updated["error"] = error
+        self.tags.set(status_key, updated)
+        log.info("Downlink to '%s' %s", status_key, status)
+        return True
 
     # ── Downlink Processing ────────────────────────────────────────────
 
     async def on_schedule(self, event: ScheduleEvent):
         """Check for pending downlink requests and send to TTN.
 
-        Iterates through configured device mappings, reads the downlink request
-        tag from this processor's own tags, sends pending requests to TTN
-        via the HTTP API, and updates status tags.
+        Processes configured device mappings concurrently (bounded by the
+        downlink concurrency setting): reads each downlink request tag from this
+        processor's own tags, sends pending requests to TTN via the HTTP API,
+        and updates status tags.
 
         Other Doover apps write downlink requests by setting a tag on this
-        processor (e.g., ttn_downlink_request_{device_id}).
+        processor (e.g., ttn_downlink_request_{device_id}), either as a single
+        request or as a list of queued requests. Devices on different TTN
+        clusters are swept concurrently.
+
+        With MQTT ingest enabled, the run then streams uplinks from the TTN
+        MQTT server for the configured duration (see ``_ingest_mqtt``).
+
+        Each run also aggregates the sharded processor stats into the
+        ``stats`` tag and, when stale, rebuilds the ``device_mapping_state``
+        summary from the per-device state tags.
+        """
+        with PERF.timer("schedule.total"):
+            try:
+                with PERF.timer("downlink.sweep"):
+                    await self._send_pending_downlinks()
+                # Then stream uplinks from TTN MQTT for the rest of the run
+                if self.config.mqtt_ingest_seconds.value:
+                    await self._ingest_mqtt()
+            finally:
+                with PERF.timer("schedule.aggregate"):
+                    if PERF.enabled:
+                        await aggregate_perf(self.tags, PERF, self.counters.shard_id)
+                    await aggregate_stats(self.tags, self.counters)
+                    await refresh_summary(self.tags)
+                await self._flush_tags()
+
+    async def _ingest_mqtt(self):
+        """Stream uplinks from the TTN MQTT server in windowed batches.
+
+        Every configured TTN application gets its own subscription, on its
+        own cluster, for the same duration. Each window goes through the same
+        parsing, duplicate filtering and tag writes as a channel message, and
+        its tag writes are committed before the next window starts.
+        """
+        # Imported here so webhook-only deployments never load it
+        from . import mqtt_ingest
+
+        if not self.applications:
+            log.warning(
+                "TTN Application ID or API Key not configured, skipping MQTT ingest"
+            )
+            return
+
+        # Only what the sweep has left of the run, so the final flush still
+        # happens inside the Lambda timeout
+        requested = min(
+            self.config.mqtt_ingest_seconds.value, mqtt_ingest.MAX_INGEST_SECONDS
+        )
+        seconds = mqtt_ingest.ingest_budget(
+            requested, time.monotonic() - self.started_at
+        )
+        if seconds <= 0:
+            log.warning("No time left in this run for MQTT ingest, skipping")
+            return
+        if seconds < requested:
+            log.info(
+                "MQTT ingest shortened to %.1fs by the time left in this run",
+                seconds,
+            )
+
+        # Subscriptions share this invocation's tag buffer, so their batches
+        # are handled one at a time
+        lock = asyncio.Lock()
+
+        async def handle_batch(payloads: list[bytes]):
+            async with lock:
+                await self._ingest_batch(payloads)
+
+        await asyncio.gather(
+            *(
+                self._ingest_application(application, seconds, handle_batch)
+                for application in self.applications.values()
+            )
+        )
+
+    async def _ingest_application(
+        self,
+        application: routing.TtnApplication,
+        seconds: float,
+        handle_batch: Callable[[list[bytes]], Awaitable[None]],
+    ):
+        """Stream one TTN application's uplinks for ``seconds``.
+
+        **TTN MQTT URL** applies to applications on the default cluster;
+        others connect to their own cluster host. **TTN MQTT Username** is
+        the default application's username, and its tenant (the part after
+        ``@``) is used for the other applications.
+        """
+        from . import mqtt, mqtt_ingest
+
+        default_username = (
+            self.config.mqtt_username.value
+            or f"{self.config.ttn_application_id.value}@ttn"
+        )
+        if application.app_id == self.config.ttn_application_id.value:
+            username = default_username
+        else:
+            tenant = default_username.partition("@")[2] or "ttn"
+            username = f"{application.app_id}@{tenant}"
+        url = application.api_url
+        if application.cluster == self.default_cluster and self.config.mqtt_url.value:
+            url = self.config.mqtt_url.value
+
+        host, port, tls = mqtt.parse_url(url)
+        api_key = application.api_key
+        ingest = mqtt_ingest.MqttIngest(
+            lambda: mqtt.MqttClient(host, port, username, api_key, tls=tls),
+            mqtt_ingest.uplink_topic(username),
+            handle_batch,
+            window=(
+                self.config.mqtt_batch_window_ms.value
+                or mqtt_ingest.DEFAULT_WINDOW_SECONDS * 1000
+            )
+            / 1000,
+        )
+        stats = await ingest.run(seconds)
+
+        log.info(
+            "MQTT ingest for '%s': %d uplink(s) in %d batch(es) over %d connection(s)",
+            application.app_id,
+            stats.messages,
+            stats.batches,
+            stats.connections,
+        )
+        if not stats.connections:
+            await self._record_error(
+                f"Could not connect to the TTN MQTT server at {host}:{port} "
+                f"for application {application.app_id}"
+            )
+
+    async def _ingest_batch(self, payloads: list[bytes]):
+        """Process one window of MQTT uplinks as a micro-batch.
+
+        A payload that can't be decoded is skipped on its own, so it doesn't
+        take the rest of the window down with it.
         """
+        with PERF.timer("mqtt.batch"):
+            messages = []
+            for payload in payloads:
+                try:
+                    messages.append(uplinks.loads(payload))
+                except Exception as e:
+                    log.exception("Skipping malformed MQTT uplink")
+                    await self._record_error(f"Malformed MQTT uplink: {e}")
+            records = await self._process_uplink(messages) if messages else []
+            if await self._flush_tags():
+                dedup.remember(WARM_STATE.seen_uplinks, records)
+
+    async def _send_pending_downlinks(self):
         if not self.config.ttn_application_id.value:
             log.warning("TTN Application ID not configured, skipping downlink check")
             return
@@ -213,243 +715,442 @@ class TtnPlatformInterface(Application):
         downlink_status_tag = (
             self.config.downlink_status_tag.value or "ttn_downlink_status"
         )
+        await self._sweep_devices(downlink_request_tag, downlink_status_tag)
+        if self.config.track_delivery.value:
+            await self._save_delivery_index(downlink_status_tag)
 
-        downlinks_sent = 0
-        errors = 0
+    async def _save_delivery_index(self, downlink_status_tag: str):
+        """Record the downlinks tracked by this sweep and expire stale entries.
 
-        for ttn_device_id, doover_app_key in self.device_map.items():
-            try:
-                # Check for pending downlink request for this device
-                request_key = f"{downlink_request_tag}_{ttn_device_id}"
-                request = await self.get_tag(request_key)
+        Expired downlinks still waiting on TTN are marked ``expired``.
+        """
+        ttl = self.config.delivery_ttl.value or delivery.DEFAULT_TTL_SECONDS
+        self.tracked.record(self.tags)
+        expired = await delivery.expire(self.tags, ttl)
+        for correlation_id, device_id, confirmed in expired:
+            status_key = f"{downlink_status_tag}_{device_id}"
+            tracked = delivery.deliveries(await self.tags.get(status_key))
+            if not delivery.awaiting(tracked.get(correlation_id), confirmed):
+                continue
+            await self._update_delivery_status(
+                status_key,
+                [correlation_id],
+                "expired",
+                error=f"No delivery report from TTN within {ttl:.0f}s",
+            )
 
-                if not request:
-                    continue
+    async def _sweep_devices(
+        self,
+        downlink_request_tag: str,
+        downlink_status_tag: str,
+    ):
+        # With the pending index enabled, only devices marked as having
+        # queued work are visited, apart from a periodic full sweep that
+        # catches marks lost to concurrent index writes; otherwise every
+        # mapped device is checked.
+        marked = unmapped = None
+        full_sweep = False
+        if self.config.use_pending_index.value:
+            marked, unmapped = await self._read_pending_index()
+            full_sweep = marked is not None and pending_index.full_sweep_due(
+                await self.tags.get(pending_index.FULL_SWEEP_TAG)
+            )
+        if marked is None:
+            device_ids = list(self.device_map)
+        elif full_sweep:
+            log.info("Checking all mapped devices as a periodic full sweep")
+            device_ids = await self._known_devices(marked)
+        else:
+            device_ids = list(marked)
+        # Class A devices whose next uplink isn't due yet are left for a later
+        # sweep (and stay marked in the pending index)
+        if self.config.schedule_downlinks.value:
+            device_ids = await self._plan_downlinks(device_ids)
+
+        routes = routing.route(
+            device_ids, self.device_index.application_id, self.applications
+        )
+        if routes.unrouted:
+            log.warning(
+                "No TTN application configured for %d mapped device(s), skipping: %s",
+                len(routes.unrouted),
+                ", ".join(routes.unrouted[:10]),
+            )
+            await self._record_error(
+                f"No TTN application configured for {len(routes.unrouted)} mapped device(s)"
+            )
+
+        # Devices without a result (unrouted, or on a cluster whose circuit
+        # breaker is open) were not attempted and stay marked as pending
+        results: dict[str, tuple[int, bool]] = {}
+        await asyncio.gather(
+            *(
+                self._sweep_cluster(
+                    cluster,
+                    cluster_device_ids,
+                    routes.applications,
+                    results,
+                    downlink_request_tag,
+                    downlink_status_tag,
+                )
+                for cluster, cluster_device_ids in routes.by_cluster.items()
+            )
+        )
 
-                # Parse downlink request fields
-                f_port = request.get("f_port", 1)
-                frm_payload = request.get("frm_payload")
-                decoded_payload = request.get("decoded_payload")
-                priority = request.get("priority", "NORMAL")
-                confirmed = request.get("confirmed", False)
+        downlinks_sent = sum(sent for sent, _ in results.values())
+        errors = sum(failed for _, failed in results.values())
+
+        # A full sweep only counts once every routed device was checked, so
+        # one skipped for an open circuit breaker gets another next run
+        if full_sweep and all(
+            device_id in results
+            for cluster_device_ids in routes.by_cluster.values()
+            for device_id in cluster_device_ids
+        ):
+            self.tags.set(pending_index.FULL_SWEEP_TAG, datetime.now(UTC).isoformat())
+
+        if marked is not None:
+            await self._unmark_pending(
+                {
+                    **unmapped,
+                    **{
+                        device_id: marked[device_id]
+                        for device_id, (_, failed) in results.items()
+                        if not failed and device_id in marked
+                    },
+                }
+            )
 
-                if not frm_payload and not decoded_payload:
-                    log.warning(
-                        "Downlink request for device '%s' has no payload, skipping",
+        # Update processor-level stats
+        self.counters.add("downlinks_sent", downlinks_sent)
+        self.counters.add("errors", errors)
+        if downlinks_sent > 0:
+            self.tags.set(
+                "last_downlink_at",
+                datetime.now(UTC).isoformat(),
+            )
+
+    async def _sweep_cluster(
+        self,
+        cluster: str,
+        device_ids: list[str],
+        applications: dict[str, routing.TtnApplication],
+        results: dict[str, tuple[int, bool]],
+        downlink_request_tag: str,
+        downlink_status_tag: str,
+    ):
+        """Send queued downlinks for the devices on one TTN cluster.
+
+        The cluster's applications share one pooled HTTP session, rate
+        limiter, 429 backoff and circuit breaker. ``results`` is filled in
+        with ``(downlinks_sent, failed)`` for each device attempted.
+        """
+        breaker_tag = routing.circuit_tag(cluster, self.default_cluster)
+        breaker = CircuitBreaker.from_dict(await self.tags.get(breaker_tag))
+        if breaker.is_open():
+            log.warning(
+                "TTN circuit breaker for %s open until %s, skipping %d device(s)",
+                cluster,
+                datetime.fromtimestamp(breaker.open_until, UTC).isoformat(),
+                len(device_ids),
+            )
+            return
+
+        limiter = TokenBucket(
+            self.config.ttn_requests_per_second.value or DEFAULT_REQUESTS_PER_SECOND
+        )
+        backoff = SharedBackoff()
+        clients = {
+            application.app_id: TtnClient(
+                # Pooled keep-alive session per cluster, reused across warm
+                # invocations and only created once a downlink is pushed
+                functools.partial(WARM_STATE.get_http_session, cluster),
+                api_url=application.api_url,
+                app_id=application.app_id,
+                webhook_id=application.webhook_id,
+                api_key=application.api_key,
+                breaker=breaker,
+                limiter=limiter,
+                backoff=backoff,
+            )
+            for application in {applications[device_id] for device_id in device_ids}
+        }
+
+        concurrency = max(
+            1, self.config.downlink_concurrency.value or DEFAULT_DOWNLINK_CONCURRENCY
+        )
+        pending = iter(enumerate(device_ids))
+        pacer = downlink_schedule.Pacer(
+            len(device_ids), self.config.downlink_spread.value or 0
+        )
+
+        # Bounded worker pool: each worker pulls the next device off a shared
+        # iterator, so at most `concurrency` devices are in flight at once and
+        # each device's read -> send -> clear -> status sequence stays ordered.
+        async def worker():
+            for index, ttn_device_id in pending:
+                await pacer.wait(index)
+                with PERF.timer("downlink.device"):
+                    results[ttn_device_id] = await self._process_device_downlink(
+                        clients[applications[ttn_device_id].app_id],
                         ttn_device_id,
+                        downlink_request_tag,
+                        downlink_status_tag,
                     )
-                    continue
 
-                # Build TTN downlink request body
-                downlink_body = {
-                    "f_port": f_port,
-                    "priority": priority,
-                }
-                if confirmed:
-                    downlink_body["confirmed"] = True
+        try:
+            await asyncio.gather(
+                *(worker() for _ in range(min(concurrency, len(device_ids))))
+            )
+        finally:
+            if breaker.changed:
+                self.tags.set(breaker_tag, breaker.to_dict())
+                if breaker.is_open():
+                    await self._record_error(
+                        f"TTN circuit breaker for {cluster} opened after repeated "
+                        f"failures, pausing sends for {breaker.cooldown:.0f}s"
+                    )
 
-                if frm_payload:
-                    downlink_body["frm_payload"] = frm_payload
-                elif decoded_payload:
-                    downlink_body["decoded_payload"] = decoded_payload
+    async def _plan_downlinks(self, device_ids: list[str]) -> list[str]:
+        """Return the devices to push to now, earliest predicted uplink first."""
+        with PERF.timer("downlink.plan"):
+            schedule = downlink_schedule.plan(
+                device_ids,
+                self.device_index.device_class,
+                await get_device_states(self.tags, device_ids),
+                lead=(
+                    self.config.downlink_lead_time.value
+                    or downlink_schedule.DEFAULT_LEAD_SECONDS
+                ),
+            )
+        if schedule.deferred:
+            log.info(
+                "Holding downlinks for %d Class A device(s) until their next uplink",
+                len(schedule.deferred),
+            )
+        return schedule.due
 
-                payload_preview = frm_payload or json.dumps(decoded_payload)[:50]
+    async def _read_pending_index(
+        self,
+    ) -> tuple[dict[str, str] | None, dict[str, str] | None]:
+        """Read the pending-device index, split into mapped and unmapped devices.
 
-                # Send downlink to TTN API
-                success = await self._send_ttn_downlink(
-                    ttn_device_id,
-                    {"downlinks": [downlink_body]},
+        Returns ``(None, None)`` if the index has never been written, in which
+        case the sweep falls back to checking every mapped device.
+        """
+        value = await self.get_tag(pending_index.PENDING_TAG)
+        if value is None:
+            log.info("Pending index not found, checking all mapped devices")
+            return None, None
+
+        marked = {}
+        unmapped = {}
+        for device_id, marked_at in pending_index.pending_devices(value).items():
+            if self.device_index.resolve(device_id):
+                marked[device_id] = marked_at
+            else:
+                log.warning(
+                    "Pending downlink for unmapped TTN device '%s', skipping",
+                    device_id,
                 )
+                unmapped[device_id] = marked_at
+        return marked, unmapped
 
-                now = datetime.now(timezone.utc).isoformat()
-                status_key = f"{downlink_status_tag}_{ttn_device_id}"
+    async def _known_devices(self, marked: dict[str, str]) -> list[str]:
+        """Return every device the processor knows of, for a full sweep.
 
-                if success:
-                    # Clear the downlink request tag
-                    await self.set_tag(request_key, None)
-
-                    # Write success status
-                    await self.set_tag(status_key, {
-                        "status": "sent",
-                        "sent_at": now,
-                        "error": None,
-                        "f_port": f_port,
-                        "payload_preview": payload_preview,
-                    })
-                    downlinks_sent += 1
-
-                    log.info(
-                        "Sent downlink to TTN device '%s' (f_port=%d)",
-                        ttn_device_id,
-                        f_port,
-                    )
-                else:
-                    errors += 1
+        That is the exact device mappings, devices matched by prefix and glob
+        rules that have sent an uplink (from the device registry), and any
+        other marked devices.
+        """
+        device_ids = dict.fromkeys(self.device_map)
+        for device_id in await registered_devices(self.tags):
+            if self.device_index.resolve(device_id):
+                device_ids[device_id] = None
+        device_ids.update(dict.fromkeys(marked))
+        return list(device_ids)
+
+    async def _unmark_pending(self, done: dict[str, str]):
+        """Remove devices whose queue was fully sent from the pending index."""
+        if not done:
+            return
+        # Re-read so devices marked during the sweep are preserved
+        value = await self.get_tag(pending_index.PENDING_TAG)
+        await self.set_tag(
+            pending_index.PENDING_TAG,
+            pending_index.unmark(value, done),
+        )
 
-            except Exception as e:
-                log.error(
-                    "Error processing downlink for device '%s': %s",
+    async def _process_device_downlink(
+        self,
+        ttn: TtnClient,
+        ttn_device_id: str,
+        downlink_request_tag: str,
+        downlink_status_tag: str,
+    ) -> tuple[int, bool]:
+        """Send all queued downlink requests for a single device.
+
+        The queue is deduplicated, ordered by priority, and pushed to TTN in
+        as few requests as possible. Returns ``(downlinks_sent, failed)``.
+        """
+        try:
+            # Check for pending downlink requests for this device
+            request_key = f"{downlink_request_tag}_{ttn_device_id}"
+            request = await self.get_tag(request_key)
+
+            queue, invalid = downlink_queue.prepare(downlink_queue.normalise(request))
+            if invalid:
+                log.warning(
+                    "%d downlink request(s) for device '%s' have no payload, skipping",
+                    len(invalid),
                     ttn_device_id,
-                    e,
-                    exc_info=True,
                 )
-                errors += 1
-                await self._record_error(
-                    f"Downlink error for {ttn_device_id}: {e}"
+            if not queue:
+                return 0, False
+
+            # Send the whole queue, one TTN push per chunk
+            sent = []
+            correlation_ids = []
+            failed = False
+            track = bool(self.config.track_delivery.value)
+            for chunk in downlink_queue.chunks(queue):
+                downlinks = [downlink_queue.to_ttn_downlink(i) for i in chunk]
+                if track:
+                    # Echoed back by TTN in the downlink's delivery events
+                    for downlink in downlinks:
+                        downlink["correlation_ids"] = [delivery.new_correlation_id()]
+                success = await self._send_ttn_downlink(
+                    ttn,
+                    ttn_device_id,
+                    {"downlinks": downlinks},
                 )
+                if not success:
+                    failed = True
+                    break
+                sent.extend(chunk)
+                if track:
+                    for downlink in downlinks:
+                        self.tracked.add(
+                            downlink["correlation_ids"][0],
+                            ttn_device_id,
+                            downlink.get("confirmed", False),
+                        )
+                        correlation_ids.append(downlink["correlation_ids"][0])
 
-                # Write error status for the device
-                try:
-                    status_key = f"{downlink_status_tag}_{ttn_device_id}"
-                    await self.set_tag(status_key, {
-                        "status": "error",
-                        "sent_at": None,
-                        "error": str(e),
-                        "f_port": None,
-                        "payload_preview": None,
-                    })
-                except Exception:
-                    pass
+            if not sent:
+                return 0, failed
 
-        # Update processor-level stats
-        if downlinks_sent > 0 or errors > 0:
-            stats = await self.get_tag("stats") or {}
-            stats["downlinks_sent"] = stats.get("downlinks_sent", 0) + downlinks_sent
-            stats["errors"] = stats.get("errors", 0) + errors
-            await self.set_tag("stats", stats)
-
-            if downlinks_sent > 0:
-                await self.set_tag(
-                    "last_downlink_at",
-                    datetime.now(timezone.utc).isoformat(),
+            # Remove the sent items, keeping anything queued while we were
+            # sending (the tag is re-read rather than blindly cleared)
+            remaining = downlink_queue.remaining_after(
+                await self.get_tag(request_key), sent
+            )
+            await self.set_tag(request_key, remaining)
+
+            # Write success status
+            first = sent[0]
+            now = datetime.now(UTC).isoformat()
+            status_key = f"{downlink_status_tag}_{ttn_device_id}"
+            status = {
+                "status": "sent",
+                "sent_at": now,
+                "error": None,
+                "f_port": first.get("f_port", 1),
+                "payload_preview": downlink_queue.payload_preview(first),
+                "downlinks": len(sent),
+                "pending": len(remaining or ()),
+            }
+            if track:
+                # Only queued so far: TTN's delivery events move it on.
+                # Earlier pushes' downlinks are carried over, as TTN may
+                # still report on them
+                status.update(
+                    status="queued",
+                    sent_at=None,
+                    queued_at=now,
+                    correlation_ids=correlation_ids,
+                    deliveries=delivery.track(
+                        await self.get_tag(status_key), correlation_ids
+                    ),
+                )
+            await self.set_tag(status_key, status)
+
+            log.info(
+                "Sent %d downlink(s) to TTN device '%s'",
+                len(sent),
+                ttn_device_id,
+            )
+            return len(sent), failed
+
+        except Exception as e:
+            log.exception("Error processing downlink for device '%s'", ttn_device_id)
+            await self._record_error(f"Downlink error for {ttn_device_id}: {e}")
+
+            # Write error status for the device
+            try:
+                status_key = f"{downlink_status_tag}_{ttn_device_id}"
+                status = {
+                    "status": "error",
+                    "sent_at": None,
+                    "error": str(e),
+                    "f_port": None,
+                    "payload_preview": None,
+                }
+                if self.config.track_delivery.value:
+                    status["deliveries"] = delivery.track(
+                        await self.get_tag(status_key), ()
+                    )
+                await self.set_tag(status_key, status)
+            except Exception:
+                log.warning(
+                    "Could not write error status for device '%s'",
+                    ttn_device_id,
+                    exc_info=True,
                 )
+            return 0, True
 
     # ── TTN API Methods ────────────────────────────────────────────────
 
     async def _send_ttn_downlink(
         self,
+        ttn: TtnClient,
         device_id: str,
         body: dict,
-        max_retries: int = 3,
     ) -> bool:
         """Send a downlink push request to the TTN Application Server API.
 
-        Uses exponential backoff for transient failures (429, 5xx, network errors).
-
-        Returns True if the downlink was sent successfully.
+        Rate limiting, retries and the circuit breaker are handled by the TTN
+        client; this records the outcome. Returns True if the downlink was sent.
         """
-        api_url = self.config.ttn_api_url.value.rstrip("/")
-        app_id = self.config.ttn_application_id.value
-        webhook_id = self.config.ttn_webhook_id.value or "doover"
-        api_key = self.config.ttn_api_key.value
-
-        url = (
-            f"{api_url}/api/v3/as/applications/{app_id}"
-            f"/webhooks/{webhook_id}/devices/{device_id}/down/push"
-        )
-
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        }
-
-        last_error = None
-
-        for attempt in range(max_retries):
-            try:
-                async with self.http_session.post(
-                    url,
-                    json=body,
-                    headers=headers,
-                ) as response:
-                    if response.status == 200:
-                        return True
-
-                    response_text = await response.text()
-
-                    if response.status == 401:
-                        log.error(
-                            "TTN API authentication failed (401). Check API key."
-                        )
-                        await self._record_error(
-                            "TTN API authentication failed (401). Check API key."
-                        )
-                        return False
-
-                    if response.status == 404:
-                        log.error(
-                            "TTN device or webhook not found (404) for device '%s'.",
-                            device_id,
-                        )
-                        await self._record_error(
-                            f"TTN API 404: device '{device_id}' or webhook not found."
-                        )
-                        return False
-
-                    if response.status == 429:
-                        wait_time = 2 ** (attempt + 1)
-                        log.warning(
-                            "TTN API rate limit (429), retrying in %ds...",
-                            wait_time,
-                        )
-                        await asyncio.sleep(wait_time)
-                        last_error = f"Rate limited (429): {response_text}"
-                        continue
-
-                    if response.status >= 500:
-                        wait_time = 2 ** (attempt + 1)
-                        log.warning(
-                            "TTN API server error (%d), retrying in %ds...",
-                            response.status,
-                            wait_time,
-                        )
-                        await asyncio.sleep(wait_time)
-                        last_error = (
-                            f"Server error ({response.status}): {response_text}"
-                        )
-                        continue
-
-                    # Other client errors - don't retry
-                    log.error(
-                        "TTN API error (%d) for device '%s': %s",
-                        response.status,
-                        device_id,
-                        response_text,
-                    )
-                    await self._record_error(
-                        f"TTN API error ({response.status}) for "
-                        f"{device_id}: {response_text}"
-                    )
-                    return False
-
-            except aiohttp.ClientError as e:
-                wait_time = 2 ** (attempt + 1)
-                log.warning(
-                    "HTTP error sending downlink (attempt %d/%d): %s",
-                    attempt + 1,
-                    max_retries,
-                    e,
-                )
-                last_error = str(e)
-                await asyncio.sleep(wait_time)
-
-        log.error(
-            "Failed to send downlink to device '%s' after %d retries: %s",
-            device_id,
-            max_retries,
-            last_error,
-        )
-        await self._record_error(
-            f"Downlink failed for {device_id} after "
-            f"{max_retries} retries: {last_error}"
-        )
+        with PERF.timer("ttn.push"):
+            result = await ttn.push_downlinks(device_id, body)
+        if result.ok:
+            return True
+        if result.skipped:
+            # The breaker opened mid-sweep; the opening is recorded once
+            log.debug("TTN circuit breaker open, skipping device '%s'", device_id)
+            return False
+
+        log.error("%s", result.error)
+        await self._record_error(result.error)
         return False
 
     # ── Helpers ─────────────────────────────────────────────────────────
 
     async def _record_error(self, message: str):
-        """Record an error to the last_error tag and increment error count."""
-        await self.set_tag("last_error", message)
-        stats = await self.get_tag("stats") or {}
-        stats["errors"] = stats.get("errors", 0) + 1
-        await self.set_tag("stats", stats)
+        """Record an error to the last_error tag and increment error count.
+
+        Both writes are committed with the rest of the invocation's tag writes.
+        """
+        self.tags.set("last_error", message)
+        self.counters.add("errors")
+
+    async def _flush_tags(self) -> bool:
+        """Stage this container's stats and perf shards and commit all buffered tag writes.
+
+        Returns True if every write succeeded.
+        """
+        self.counters.stage(self.tags)
+        PERF.stage(self.tags, self.counters.shard_id)
+        with PERF.timer("tags.flush"):
+            return await self.tags.flush()
@@ -0,0 +1,102 @@
+"""Change detection for uplink tag writes.
+
+Meters and other chatty devices often report the same reading over and over
+(heartbeats). Writing each one to the device's uplink tag costs a tag write
+and wakes every subscriber for no new information.
+
+With change detection on, each device's latest uplink is compared with a
+fingerprint of the record last written to its uplink tag, kept in the
+device's state tag (which the uplink path reads and writes anyway):
+
+- fields with a deadband (``decoded_payload`` keys, ``rssi`` or ``snr``)
+  count as changed once they move further than the deadband from the last
+  written value, so slow drift is still written eventually
+- the f_port and every other decoded field (or the raw payload, if nothing
+  was decoded) must match exactly; they are compared by digest
+- ``rssi`` and ``snr`` are ignored unless they have a deadband
+- a record is always written once ``max_silence`` has passed since the last
+  write, so subscribers can tell a quiet device from a dead one
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any
+
+from .uplinks import UplinkRecord
+
+DEFAULT_MAX_SILENCE_SECONDS = 3600
+
+SIGNAL_FIELDS = ("rssi", "snr")
+
+
+def deadbands_from_config(deadbands) -> dict[str, float]:
+    """Extract ``{field: deadband}`` from the deadband config array."""
+    result = {}
+    for entry in deadbands.elements or []:
+        elems = entry.elements
+        field = elems[0].value
+        deadband = elems[1].value if len(elems) > 1 else None
+        if field:
+            result[field] = abs(deadband or 0)
+    return result
+
+
+def _number(value: Any) -> float | None:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def fingerprint(record: UplinkRecord, deadbands: dict[str, float], at: str) -> dict:
+    """Summarise what change detection compares for ``record``, written at ``at``."""
+    decoded = record.decoded_payload
+    values = {}
+    for field in deadbands:
+        if field in SIGNAL_FIELDS:
+            value = _number(getattr(record, field))
+        elif isinstance(decoded, dict):
+            value = _number(decoded.get(field))
+        else:
+            value = None
+        if value is not None:
+            values[field] = value
+
+    if isinstance(decoded, dict):
+        exact = {k: v for k, v in decoded.items() if k not in values}
+    elif decoded is not None:
+        exact = decoded
+    else:
+        exact = record.frm_payload
+    digest = hashlib.blake2b(
+        json.dumps([record.f_port, exact], sort_keys=True, default=str).encode(),
+        digest_size=8,
+    ).hexdigest()
+    return {"at": at, "digest": digest, "values": values}
+
+
+def changed(
+    previous: dict | None,
+    current: dict,
+    deadbands: dict[str, float],
+    now: datetime,
+    max_silence: float = DEFAULT_MAX_SILENCE_SECONDS,
+) -> bool:
+    """True if the record fingerprinted as ``current`` should be written."""
+    if not previous or previous.get("digest") != current["digest"]:
+        return True
+    if (
+        max_silence
+        and (now - datetime.fromisoformat(previous["at"])).total_seconds()
+        >= max_silence
+    ):
+        return True
+
+    last_values = previous.get("values") or {}
+    values = current["values"]
+    if last_values.keys() != values.keys():
+        return True
+    return any(
+        abs(value - last_values[field]) > deadbands.get(field, 0)
+        for field, value in values.items()
+    )
@@ -0,0 +1,111 @@
+"""Circuit breaker for the TTN cluster, persisted between invocations.
+
+After ``FAILURE_THRESHOLD`` consecutive failures (5xx responses, timeouts,
+connection errors) the breaker opens and sends are skipped outright until the
+cooldown expires. It then lets a single probe request through (half-open):
+success closes the breaker, failure re-opens it with a doubled cooldown.
+
+The breaker state is stored in the ``ttn_circuit`` tag so a cluster outage
+seen by one invocation is respected by the next, rather than every sweep
+timing out device by device.
+"""
+
+import time
+
+CIRCUIT_TAG = "ttn_circuit"
+
+FAILURE_THRESHOLD = 5
+BASE_COOLDOWN_SECONDS = 60.0
+MAX_COOLDOWN_SECONDS = 900.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        state: str = CLOSED,
+        failures: int = 0,
+        open_until: float = 0.0,
+        cooldown: float = BASE_COOLDOWN_SECONDS,
+    ):
+        self.state = state
+        self.failures = failures
+        self.open_until = open_until
+        self.cooldown = cooldown
+        self.changed = False
+        self._probing = False
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "CircuitBreaker":
+        if not isinstance(data, dict):
+            return cls()
+        return cls(
+            state=data.get("state", CLOSED),
+            failures=data.get("failures", 0),
+            open_until=data.get("open_until", 0.0),
+            cooldown=data.get("cooldown", BASE_COOLDOWN_SECONDS),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "open_until": self.open_until,
+            "cooldown": self.cooldown,
+        }
+
+    def is_open(self, now: float | None = None) -> bool:
+        """True while the breaker is open and its cooldown has not expired."""
+        now = time.time() if now is None else now
+        return self.state == OPEN and now < self.open_until
+
+    def allow(self, now: float | None = None) -> bool:
+        """Return True if a request may be sent now.
+
+        Once the cooldown has expired only one probe request is allowed until
+        its result is recorded.
+        """
+        if self.state == CLOSED:
+            return True
+        if self.is_open(now):
+            return False
+        if self._probing:
+            return False
+        self._set(state=HALF_OPEN)
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self._probing = False
+        if self.state != CLOSED or self.failures:
+            self._set(
+                state=CLOSED,
+                failures=0,
+                open_until=0.0,
+                cooldown=BASE_COOLDOWN_SECONDS,
+            )
+
+    def record_failure(self, now: float | None = None):
+        now = time.time() if now is None else now
+        if self.state == HALF_OPEN:
+            self._probing = False
+            cooldown = min(self.cooldown * 2, MAX_COOLDOWN_SECONDS)
+            self._set(state=OPEN, open_until=now + cooldown, cooldown=cooldown)
+        elif self.state == CLOSED:
+            failures = self.failures + 1
+            if failures >= FAILURE_THRESHOLD:
+                self._set(
+                    state=OPEN,
+                    failures=failures,
+                    open_until=now + self.cooldown,
+                )
+            else:
+                self._set(failures=failures)
+
+    def _set(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.changed = True
@@ -0,0 +1,36 @@
+"""Coalesced connection pings.
+
+Every processed uplink marks the processor's agent online until
+``OFFLINE_AFTER`` from now. Pinging on every uplink costs one API call per
+message although the status rarely changes, so pings are coalesced: a ping
+is only sent when the status changes or the last one is older than the ping
+interval. The last ping is remembered in the warm container (see
+``warm_state``), so a cold container always pings on its first uplink.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any
+
+OFFLINE_AFTER = timedelta(hours=1)
+
+DEFAULT_PING_INTERVAL_SECONDS = 300
+
+# Leave headroom so the agent never goes offline between two coalesced pings
+MAX_PING_INTERVAL_SECONDS = OFFLINE_AFTER.total_seconds() / 2
+
+
+class PingCoalescer:
+    def __init__(self):
+        self.last_ping_at: datetime | None = None
+        self.last_status: Any = None
+
+    def due(self, status: Any, now: datetime, interval: float) -> bool:
+        """True if a ping with ``status`` should be sent at ``now``."""
+        if self.last_ping_at is None or status != self.last_status:
+            return True
+        interval = min(max(interval, 0), MAX_PING_INTERVAL_SECONDS)
+        return (now - self.last_ping_at).total_seconds() >= interval
+
+    def record(self, status: Any, now: datetime):
+        self.last_ping_at = now
+        self.last_status = status
@@ -0,0 +1,223 @@
+"""Sharded processor statistics.
+
+Updating a single ``stats`` tag with ``get_tag``/``set_tag`` loses increments
+when invocations run concurrently, and costs a read on every uplink. Instead,
+each warm container owns a stats shard (``stats_shard_{id}``) that only it
+writes. The shard holds the container's cumulative totals plus per-minute
+counts for a short window, so writing it never needs a read.
+
+The schedule handler aggregates every registered shard into the ``stats`` tag,
+adding per-minute rates. Once ``stats`` is older than
+``STATS_MAX_AGE_SECONDS``, an uplink invocation that claims its lease (see
+``lease``) re-aggregates it too, so deployments without a schedule keep it
+current without every warm container reading every shard at once. Shards that have not been written for a while belong
+to containers Lambda has recycled; their totals are folded into
+``stats_retired`` and the shard is removed.
+
+Tags:
+
+- ``stats_shard_{id}`` -- one container's counters (single writer)
+- ``stats_shards`` -- registry of live shard IDs -> last registration time
+- ``stats_retired`` -- totals from retired shards (and pre-sharding stats)
+- ``stats`` -- aggregated view: totals, ``{counter}_per_minute`` rates
+"""
+
+import asyncio
+import os
+import time
+from datetime import UTC, datetime
+
+from .tag_buffer import TagWriteBuffer
+
+SHARD_PREFIX = "stats_shard_"
+REGISTRY_TAG = "stats_shards"
+RETIRED_TAG = "stats_retired"
+STATS_TAG = "stats"
+
+COUNTERS = (
+    "uplinks_processed",
+    "uplinks_duplicate",
+    "uplinks_unchanged",
+    "downlinks_sent",
+    "errors",
+)
+
+# Rates are averaged over this many whole minutes
+RATE_WINDOW_MINUTES = 15
+
+# Containers re-register their shard this often, so a registration lost to a
+# concurrent registry write heals itself
+REGISTRATION_INTERVAL_SECONDS = 600
+
+# Shards not written for this long are retired into stats_retired
+SHARD_RETENTION_SECONDS = 24 * 3600
+
+# Uplink invocations re-aggregate ``stats`` once it is this old
+STATS_MAX_AGE_SECONDS = 300
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, UTC).isoformat()
+
+
+class StatsShard:
+    """Counters owned by a single warm container."""
+
+    def __init__(self, shard_id: str | None = None):
+        # os.urandom rather than uuid, which is slow to import
+        self.shard_id = shard_id or os.urandom(6).hex()
+        self.totals: dict[str, int] = {}
+        self.minutes: dict[int, dict[str, int]] = {}
+        self.dirty = False
+        self._registered_at: float | None = None
+
+    @property
+    def tag_key(self) -> str:
+        return f"{SHARD_PREFIX}{self.shard_id}"
+
+    def add(
+        self,
+        name: str,
+        amount: int = 1,
+        now: float | None = None,
+        defer: bool = False,
+    ):
+        """Add ``amount`` to counter ``name``.
+
+        With ``defer``, the count doesn't by itself cause the shard to be
+        written; it goes out with the shard's next write.
+        """
+        if not amount:
+            return
+        now = time.time() if now is None else now
+        self.totals[name] = self.totals.get(name, 0) + amount
+        bucket = self.minutes.setdefault(int(now // 60), {})
+        bucket[name] = bucket.get(name, 0) + amount
+        self.dirty = self.dirty or not defer
+
+    def to_tag(self, now: float | None = None) -> dict:
+        now = time.time() if now is None else now
+        oldest = int(now // 60) - RATE_WINDOW_MINUTES
+        self.minutes = {m: c for m, c in self.minutes.items() if m >= oldest}
+        return {
+            "totals": dict(self.totals),
+            "minutes": {str(m): c for m, c in self.minutes.items()},
+            "updated_at": _iso(now),
+        }
+
+    def stage(self, tags: TagWriteBuffer, now: float | None = None):
+        """Queue the shard (and its registration, if due) on the tag buffer."""
+        if not self.dirty:
+            return
+        now = time.time() if now is None else now
+        tags.set(self.tag_key, self.to_tag(now))
+        if (
+            self._registered_at is None
+            or now - self._registered_at > REGISTRATION_INTERVAL_SECONDS
+        ):
+            tags.merge(REGISTRY_TAG, {self.shard_id: _iso(now)})
+            self._registered_at = now
+        self.dirty = False
+
+
+async def stats_stale(
+    tags: TagWriteBuffer,
+    now: float | None = None,
+    max_age: float = STATS_MAX_AGE_SECONDS,
+) -> bool:
+    """True if the ``stats`` tag is older than ``max_age``."""
+    now = time.time() if now is None else now
+    current = await tags.get(STATS_TAG)
+    updated_at = current.get("updated_at") if isinstance(current, dict) else None
+    if not updated_at:
+        return True
+    return now - datetime.fromisoformat(updated_at).timestamp() >= max_age
+
+
+async def aggregate_stats(
+    tags: TagWriteBuffer,
+    local: StatsShard | None = None,
+    now: float | None = None,
+    max_age: float | None = None,
+) -> dict | None:
+    """Aggregate all registered shards into the ``stats`` tag.
+
+    ``local`` is this container's shard; its in-memory counters are used in
+    place of the (possibly older) copy in the tag store. With ``max_age``,
+    ``stats`` is only rebuilt if it is older than that; returns None if it
+    was left as is.
+    """
+    now = time.time() if now is None else now
+    if max_age is not None and not await stats_stale(tags, now, max_age):
+        return None
+
+    registry = dict(await tags.get(REGISTRY_TAG, {}))
+
+    retired = await tags.get(RETIRED_TAG)
+    if retired is None:
+        # First aggregation since sharding: carry over the legacy totals
+        legacy = await tags.get(STATS_TAG, {})
+        retired = {name: legacy[name] for name in COUNTERS if legacy.get(name)}
+        tags.set(RETIRED_TAG, retired)
+    retired = dict(retired)
+
+    if local is not None:
+        registry.setdefault(local.shard_id, _iso(now))
+    shard_ids = list(registry)
+    shards = await asyncio.gather(
+        *(_local_or_remote(tags, shard_id, local, now) for shard_id in shard_ids)
+    )
+
+    totals = dict(retired)
+    window: dict[str, int] = {}
+    oldest_minute = int(now // 60) - RATE_WINDOW_MINUTES
+    current_minute = int(now // 60)
+    retiring = []
+
+    for shard_id, shard in zip(shard_ids, shards):
+        if not shard:
+            continue
+        for name, count in shard.get("totals", {}).items():
+            totals[name] = totals.get(name, 0) + count
+
+        updated_at = datetime.fromisoformat(shard["updated_at"]).timestamp()
+        if now - updated_at > SHARD_RETENTION_SECONDS:
+            retiring.append((shard_id, shard))
+            continue
+
+        # Only whole minutes count towards rates
+        for minute, counts in shard.get("minutes", {}).items():
+            if oldest_minute <= int(minute) < current_minute:
+                for name, count in counts.items():
+                    window[name] = window.get(name, 0) + count
+
+    if retiring:
+        for shard_id, shard in retiring:
+            for name, count in shard.get("totals", {}).items():
+                retired[name] = retired.get(name, 0) + count
+            registry.pop(shard_id, None)
+            tags.set(f"{SHARD_PREFIX}{shard_id}", None)
+        tags.set(RETIRED_TAG, retired)
+        tags.set(REGISTRY_TAG, registry)
+
+    stats = {name: totals.get(name, 0) for name in (*COUNTERS, *totals)}
+    for name in stats.copy():
+        stats[f"{name}_per_minute"] = round(
+            window.get(name, 0) / RATE_WINDOW_MINUTES, 3
+        )
+    stats["shards"] = len(shard_ids) - len(retiring)
+    stats["updated_at"] = _iso(now)
+
+    tags.set(STATS_TAG, stats)
+    return stats
+
+
+async def _local_or_remote(
+    tags: TagWriteBuffer,
+    shard_id: str,
+    local: StatsShard | None,
+    now: float,
+) -> dict | None:
+    if local is not None and shard_id == local.shard_id:
+        return local.to_tag(now)
+    return await tags.get(f"{SHARD_PREFIX}{shard_id}")
@@ -0,0 +1,50 @@
+"""Registry of per-f_port binary payload decoders.
+
+When payload decoding is enabled, ``frm_payload`` is base64-decoded once at
+ingest. If TTN did not already supply a ``decoded_payload`` (i.e. no payload
+formatter is configured in the TTN application), the decoder registered for
+the uplink's f_port is run on the raw bytes and its result is written as the
+``decoded_payload``.
+
+Decoders are plain callables taking ``bytes`` and returning a JSON-serialisable
+value::
+
+    from ttn_platform_interface.decoders import register_decoder
+
+    @register_decoder(2)
+    def decode_temperature(payload: bytes) -> dict:
+        return {"temperature": int.from_bytes(payload[:2], "big", signed=True) / 100}
+"""
+
+from collections.abc import Callable
+from typing import Any
+
+Decoder = Callable[[bytes], Any]
+
+_DECODERS: dict[int, Decoder] = {}
+
+
+def register_decoder(f_port: int, decoder: Decoder | None = None):
+    """Register ``decoder`` for ``f_port``. Usable directly or as a decorator."""
+    if decoder is None:
+
+        def wrapper(func: Decoder) -> Decoder:
+            _DECODERS[f_port] = func
+            return func
+
+        return wrapper
+
+    _DECODERS[f_port] = decoder
+    return decoder
+
+
+def unregister_decoder(f_port: int):
+    """Remove the decoder registered for ``f_port``, if any."""
+    _DECODERS.pop(f_port, None)
+
+
+def get_decoder(f_port: int | None) -> Decoder | None:
+    """Return the decoder registered for ``f_port``, or None."""
+    if f_port is None:
+        return None
+    return _DECODERS.get(f_port)
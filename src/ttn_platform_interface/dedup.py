@@ -0,0 +1,136 @@
+"""Duplicate uplink filter.
+
+TTN retries webhook deliveries it thinks have failed, and a channel message
+can be reprocessed; either way the same uplink arrives again. An uplink is a
+duplicate if its ``(device_id, f_cnt, received_at)`` has been seen before —
+``received_at`` is part of the key because ``f_cnt`` restarts when a device
+rejoins.
+
+Two layers keep the filter cheap:
+
+- ``SeenUplinks``, a bounded LRU kept in the warm container, catches
+  duplicates without any tag I/O.
+- Each device's state entry (see ``device_state``) keeps digests of its last
+  ``RECENT_FRAMES`` frames, so duplicates delivered to a different or cold
+  container are still caught. That tag is read anyway to record the
+  device's state, so the check adds no round trip. A digest is a CRC32 of
+  the frame identity, 8 hex characters rather than the ~40 of the frame
+  itself, and retries arrive within a few frames of the original.
+"""
+
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+from .uplinks import UplinkRecord
+
+# Frames remembered per device in its state entry
+RECENT_FRAMES = 8
+
+# Uplink keys remembered by the warm container
+SEEN_CAPACITY = 10_000
+
+
+def frame_of(record: UplinkRecord) -> list | None:
+    """The ``[f_cnt, received_at]`` frame identity, or None if unknown."""
+    if record.f_cnt is None and record.received_at is None:
+        return None
+    return [record.f_cnt, record.received_at]
+
+
+def frame_digest(record: UplinkRecord) -> str | None:
+    """A short digest of the frame identity, as kept in ``recent_frames``."""
+    frame = frame_of(record)
+    if frame is None:
+        return None
+    return f"{zlib.crc32(f'{frame[0]}|{frame[1]}'.encode()):08x}"
+
+
+class SeenUplinks:
+    """Bounded LRU of ``(device_id, f_cnt, received_at)`` keys."""
+
+    def __init__(self, capacity: int = SEEN_CAPACITY):
+        self.capacity = capacity
+        self._keys: OrderedDict[tuple, None] = OrderedDict()
+
+    def __contains__(self, key: tuple) -> bool:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return True
+        return False
+
+    def add(self, key: tuple):
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.capacity:
+            self._keys.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def _key(record: UplinkRecord) -> tuple | None:
+    frame = frame_of(record)
+    return None if frame is None else (record.device_id, *frame)
+
+
+def drop_seen(
+    records: Iterable[UplinkRecord],
+    seen: SeenUplinks,
+) -> tuple[list[UplinkRecord], int]:
+    """Drop records already seen by this container or repeated in the batch.
+
+    Returns ``(records, duplicates)``.
+    """
+    kept = []
+    batch_keys = set()
+    duplicates = 0
+    for record in records:
+        key = _key(record)
+        if key is not None and (key in seen or key in batch_keys):
+            duplicates += 1
+            continue
+        if key is not None:
+            batch_keys.add(key)
+        kept.append(record)
+    return kept, duplicates
+
+
+def drop_recent(
+    records: Iterable[UplinkRecord],
+    states: dict[str, Any],
+) -> tuple[list[UplinkRecord], list[UplinkRecord]]:
+    """Drop records whose frame digest is in the device's stored ``recent_frames``.
+
+    ``states`` maps device IDs to their stored state entries. Returns
+    ``(records, dropped)``.
+    """
+    kept = []
+    dropped = []
+    for record in records:
+        state = states.get(record.device_id) or {}
+        digest = frame_digest(record)
+        if digest is not None and digest in (state.get("recent_frames") or ()):
+            dropped.append(record)
+            continue
+        kept.append(record)
+    return kept, dropped
+
+
+def remember(seen: SeenUplinks, records: Iterable[UplinkRecord]):
+    for record in records:
+        key = _key(record)
+        if key is not None:
+            seen.add(key)
+
+
+def recent_frames(previous: Any, records: Iterable[UplinkRecord]) -> list[str]:
+    """Return a device's ``recent_frames`` with the digests of ``records`` appended."""
+    # Drops anything that isn't a digest, e.g. frames stored in full
+    frames = [frame for frame in previous or () if isinstance(frame, str)]
+    for record in records:
+        digest = frame_digest(record)
+        if digest is not None:
+            frames.append(digest)
+    return frames[-RECENT_FRAMES:]
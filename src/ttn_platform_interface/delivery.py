@@ -0,0 +1,241 @@
+"""Downlink delivery tracking from TTN webhook events.
+
+A 200 from the TTN ``down/push`` endpoint only means the downlink was
+queued. TTN reports what happens next as webhook messages on the same
+channels as uplinks: ``downlink_sent`` once it is transmitted, then
+``downlink_ack`` or ``downlink_nack`` for confirmed downlinks, or
+``downlink_failed``.
+
+With tracking on, every pushed downlink carries a correlation ID of ours
+(``doover:dl:...``), which TTN echoes in those events. The sweep writes the
+device's status as ``queued`` with the push's correlation IDs, and events
+for that device move it forward: queued -> sent -> acked / nacked, or
+failed. An event only touches the status tag of its own device, so events
+never contend over a shared tag.
+
+A device can be pushed to again before TTN has reported on its previous
+downlinks, so the status tag also keeps the status of each of the device's
+last ``MAX_DELIVERIES`` downlinks (``deliveries``, ``{id: status}``),
+carried over by every sweep that writes it. Events and expiry are matched
+against those; the top-level ``status`` follows the latest push only.
+
+To expire downlinks that hear nothing for ``ttl`` seconds, the sweep also
+records each one in a bucket tag (``downlink_tracking_{bucket:02x}``,
+``{id: [device_id, queued_at, confirmed]}``), sharded by device with the
+same hashing as the device registry buckets. Only sweeps write the buckets, and
+each sweep merges its new entries into the buckets they hash to and drops
+the entries that are past ``ttl`` or beyond the bucket's share of
+``MAX_TRACKED``.
+"""
+
+import asyncio
+import os
+import time
+from collections.abc import Iterable
+from typing import Any, NamedTuple
+
+from .device_state import BUCKET_COUNT, bucket_key
+from .tag_buffer import TagWriteBuffer
+
+TRACKING_PREFIX = "downlink_tracking_"
+CORRELATION_PREFIX = "doover:dl:"
+
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+# Hard cap on outstanding entries, shared evenly between the buckets; the
+# oldest in a bucket are dropped first
+MAX_TRACKED = 5000
+
+# Buckets read concurrently while expiring entries
+EXPIRE_READ_CONCURRENCY = 8
+
+# Downlinks whose status is kept on a device's status tag, newest last
+MAX_DELIVERIES = 16
+
+# Webhook message keys TTN uses for downlink events, and the status each sets
+EVENT_STATUSES = {
+    "downlink_sent": "sent",
+    "downlink_ack": "acked",
+    "downlink_nack": "nacked",
+    "downlink_failed": "failed",
+}
+# Downlink events that carry nothing to track, but aren't uplinks either
+_OTHER_EVENTS = ("downlink_queued", "downlink_queue_invalidated")
+
+# Statuses only ever move forward, so a late or retried event can't undo a
+# later one
+STATUS_RANK = {
+    "queued": 0,
+    "sent": 1,
+    "acked": 2,
+    "nacked": 2,
+    "failed": 2,
+    "expired": 2,
+}
+
+
+class DeliveryEvent(NamedTuple):
+    device_id: str | None
+    status: str
+    # Our correlation IDs found in the event
+    correlation_ids: list[str]
+    at: str | None
+    error: str | None = None
+
+
+def new_correlation_id() -> str:
+    return f"{CORRELATION_PREFIX}{os.urandom(8).hex()}"
+
+
+def is_event(message: dict) -> bool:
+    """True for downlink event messages, which must not be read as uplinks."""
+    return any(key in message for key in (*EVENT_STATUSES, *_OTHER_EVENTS))
+
+
+def parse_event(message: dict) -> DeliveryEvent | None:
+    """Extract a tracked downlink event, or None if there is nothing to match."""
+    for key, status in EVENT_STATUSES.items():
+        body = message.get(key)
+        if isinstance(body, dict):
+            break
+    else:
+        return None
+
+    error = None
+    downlink = body
+    if key == "downlink_failed":
+        downlink = body.get("downlink") or {}
+        details = body.get("error") or {}
+        error = (
+            details.get("message_format") or details.get("name") or "Downlink failed"
+        )
+
+    correlation_ids = [
+        correlation_id
+        for correlation_id in dict.fromkeys(
+            [
+                *(message.get("correlation_ids") or ()),
+                *(downlink.get("correlation_ids") or ()),
+            ]
+        )
+        if isinstance(correlation_id, str)
+        and correlation_id.startswith(CORRELATION_PREFIX)
+    ]
+    if not correlation_ids:
+        return None
+    return DeliveryEvent(
+        (message.get("end_device_ids") or {}).get("device_id"),
+        status,
+        correlation_ids,
+        message.get("received_at"),
+        error,
+    )
+
+
+def advances(current: str | None, status: str) -> bool:
+    """True if ``status`` is a step forward from ``current``."""
+    return STATUS_RANK.get(status, 0) > STATUS_RANK.get(current, -1)
+
+
+def awaiting(status: str | None, confirmed: bool) -> bool:
+    """True if TTN still has events to report for a downlink in ``status``."""
+    return status == "queued" or (confirmed and status == "sent")
+
+
+class DeliveryIndex:
+    """Downlinks tracked during one sweep, keyed by correlation ID."""
+
+    def __init__(self):
+        # Stored without the prefix: {hex: [device_id, queued_at, confirmed]}
+        self.entries: dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(
+        self,
+        correlation_id: str,
+        device_id: str,
+        confirmed: bool,
+        now: float | None = None,
+    ):
+        now = time.time() if now is None else now
+        self.entries[correlation_id.removeprefix(CORRELATION_PREFIX)] = [
+            device_id,
+            int(now),
+            int(confirmed),
+        ]
+
+    def record(self, tags: TagWriteBuffer):
+        """Queue the entries for writing, one merge per touched bucket."""
+        by_bucket: dict[str, dict[str, list]] = {}
+        for key, entry in self.entries.items():
+            by_bucket.setdefault(bucket_key(entry[0], TRACKING_PREFIX), {})[key] = entry
+        for bucket, updates in by_bucket.items():
+            tags.merge(bucket, updates)
+
+
+async def expire(
+    tags: TagWriteBuffer,
+    ttl: float,
+    now: float | None = None,
+) -> list[tuple[str, str, bool]]:
+    """Drop entries older than ``ttl``, and the oldest beyond each bucket's share
+    of ``MAX_TRACKED``.
+
+    Returns the dropped entries as ``(correlation_id, device_id, confirmed)``.
+    """
+    now = time.time() if now is None else now
+    limit = max(1, MAX_TRACKED // BUCKET_COUNT)
+    expired = []
+    # Buckets are read a few at a time and not held, like the device state
+    # summary rebuild
+    for start in range(0, BUCKET_COUNT, EXPIRE_READ_CONCURRENCY):
+        keys = [
+            f"{TRACKING_PREFIX}{i:02x}"
+            for i in range(start, min(start + EXPIRE_READ_CONCURRENCY, BUCKET_COUNT))
+        ]
+        buckets = await asyncio.gather(*(tags.get(key, {}, keep=False) for key in keys))
+        for key, bucket in zip(keys, buckets):
+            if not isinstance(bucket, dict) or not bucket:
+                continue
+            entries = {
+                k: entry
+                for k, entry in bucket.items()
+                if isinstance(entry, list) and len(entry) == 3
+            }
+            live = sorted(
+                (k for k, entry in entries.items() if now - entry[1] < ttl),
+                key=lambda k: entries[k][1],
+            )[-limit:]
+            if len(live) == len(bucket):
+                continue
+            kept = set(live)
+            expired.extend(
+                (CORRELATION_PREFIX + k, entry[0], bool(entry[2]))
+                for k, entry in entries.items()
+                if k not in kept
+            )
+            tags.set(key, {k: entries[k] for k in live})
+    return expired
+
+
+def deliveries(status: Any) -> dict[str, str]:
+    """Return the ``{correlation_id: status}`` of the downlinks a status tag tracks."""
+    if not isinstance(status, dict):
+        return {}
+    tracked = status.get("deliveries")
+    if isinstance(tracked, dict):
+        return dict(tracked)
+    # Written before per-downlink statuses were kept: only the latest push
+    return dict.fromkeys(status.get("correlation_ids") or (), status.get("status"))
+
+
+def track(previous: Any, correlation_ids: Iterable[str]) -> dict[str, str]:
+    """Return the ``deliveries`` of a new status, with a push's downlinks queued.
+
+    ``previous`` is the status tag value being replaced; its oldest downlinks
+    are dropped beyond ``MAX_DELIVERIES``.
+    """
+    tracked = {**deliveries(previous), **dict.fromkeys(correlation_ids, "queued")}
+    return dict(list(tracked.items())[-MAX_DELIVERIES:])
@@ -0,0 +1,190 @@
+"""Compiled TTN device -> Doover app key mapping index.
+
+The device mapping config can hold thousands of entries. Rather than
+rebuilding a lookup dict on every invocation, the index is compiled once per
+container and cached, keyed by a digest of the raw mapping config values.
+The digest is a single pass over the config, with no entries built, so a
+cache hit costs about as much as reading the config once.
+
+Lookups are resolved in this order:
+
+1. Exact TTN ``device_id``
+2. ``dev_eui`` (case-insensitive)
+3. Prefix rules (``"site-a-*"``), longest prefix first
+4. Glob rules (``"eui-70b3d57ed00?????"``, ``"*-meter"``), in config order
+
+Each entry also carries the LoRaWAN class of the devices it maps, which the
+downlink scheduler uses (see ``downlink_schedule``), and optionally the TTN
+application they belong to (see ``routing``).
+"""
+
+import fnmatch
+import re
+from collections.abc import Iterable
+from typing import NamedTuple
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+# Wildcard lookups are memoised per index; cap the memo so an unbounded
+# stream of unmapped device IDs can't grow it forever.
+_MAX_RESOLVED = 10_000
+
+# Only a handful of configs are ever live in one container.
+_MAX_CACHED_INDEXES = 4
+
+# Every LoRaWAN device supports Class A
+DEFAULT_DEVICE_CLASS = "A"
+_INDEX_CACHE: dict[tuple[int, int], "DeviceIndex"] = {}
+
+
+class MappingEntry(NamedTuple):
+    ttn_device_id: str
+    doover_app_key: str
+    dev_eui: str | None = None
+    device_class: str = DEFAULT_DEVICE_CLASS
+    # None routes the devices to the default TTN application
+    application_id: str | None = None
+
+
+class DeviceIndex:
+    """Resolves TTN devices to Doover app keys."""
+
+    def __init__(
+        self,
+        entries: Iterable[MappingEntry],
+        digest: tuple[int, int] | None = None,
+    ):
+        # Digest of the config the index was built from (see ``mapping_digest``)
+        self.digest = digest
+        self.by_device_id: dict[str, str] = {}
+        self.by_dev_eui: dict[str, str] = {}
+        self._exact: dict[str, MappingEntry] = {}
+        self._prefixes: list[tuple[str, MappingEntry]] = []
+        self._globs: list[tuple[re.Pattern, MappingEntry]] = []
+        self._resolved: dict[str, MappingEntry | None] = {}
+
+        for entry in entries:
+            pattern, app_key = entry.ttn_device_id, entry.doover_app_key
+            if entry.dev_eui:
+                self.by_dev_eui.setdefault(entry.dev_eui.upper(), app_key)
+
+            if not _GLOB_CHARS.search(pattern):
+                self.by_device_id[pattern] = app_key
+                self._exact[pattern] = entry
+            elif pattern.endswith("*") and not _GLOB_CHARS.search(pattern[:-1]):
+                self._prefixes.append((pattern[:-1], entry))
+            else:
+                self._globs.append((re.compile(fnmatch.translate(pattern)), entry))
+
+        self._prefixes.sort(key=lambda rule: len(rule[0]), reverse=True)
+
+    def __len__(self) -> int:
+        return len(self.by_device_id) + len(self._prefixes) + len(self._globs)
+
+    @property
+    def has_rules(self) -> bool:
+        """True if the index contains prefix or glob rules."""
+        return bool(self._prefixes or self._globs)
+
+    def resolve(self, device_id: str, dev_eui: str | None = None) -> str | None:
+        """Return the Doover app key for a TTN device, or None if unmapped."""
+        app_key = self.by_device_id.get(device_id)
+        if app_key:
+            return app_key
+
+        if dev_eui:
+            app_key = self.by_dev_eui.get(dev_eui.upper())
+            if app_key:
+                return app_key
+
+        entry = self._resolve_rule(device_id)
+        return entry.doover_app_key if entry else None
+
+    def device_class(self, device_id: str) -> str:
+        """Return the LoRaWAN class of a device (Class A if unmapped)."""
+        entry = self._entry(device_id)
+        return (entry and entry.device_class) or DEFAULT_DEVICE_CLASS
+
+    def application_id(self, device_id: str) -> str | None:
+        """Return the TTN application a device is routed to (None for the default)."""
+        entry = self._entry(device_id)
+        return entry.application_id if entry else None
+
+    def _entry(self, device_id: str) -> MappingEntry | None:
+        entry = self._exact.get(device_id)
+        return entry if entry is not None else self._resolve_rule(device_id)
+
+    def _resolve_rule(self, device_id: str) -> MappingEntry | None:
+        if not self.has_rules:
+            return None
+
+        try:
+            return self._resolved[device_id]
+        except KeyError:
+            pass
+
+        entry = self._match_rules(device_id)
+        if len(self._resolved) >= _MAX_RESOLVED:
+            self._resolved.clear()
+        self._resolved[device_id] = entry
+        return entry
+
+    def _match_rules(self, device_id: str) -> MappingEntry | None:
+        for prefix, entry in self._prefixes:
+            if device_id.startswith(prefix):
+                return entry
+        for pattern, entry in self._globs:
+            if pattern.match(device_id):
+                return entry
+        return None
+
+
+def mapping_digest(device_mapping) -> tuple[int, int]:
+    """Return a cheap digest of the raw ``device_mapping`` config values."""
+    values = tuple(
+        [
+            setting.value
+            for entry in (device_mapping.elements if device_mapping else None) or ()
+            for setting in entry.elements
+        ]
+    )
+    return len(values), hash(values)
+
+
+def entries_from_config(device_mapping) -> tuple[MappingEntry, ...]:
+    """Extract mapping entries from the ``device_mapping`` config array."""
+    entries = []
+    for entry in (device_mapping.elements if device_mapping else None) or ():
+        elems = entry.elements
+        ttn_device_id = elems[0].value
+        doover_app_key = elems[1].value
+        dev_eui = elems[2].value if len(elems) > 2 else None
+        device_class = elems[3].value if len(elems) > 3 else None
+        application_id = elems[4].value if len(elems) > 4 else None
+        if ttn_device_id and doover_app_key:
+            entries.append(
+                MappingEntry(
+                    ttn_device_id,
+                    doover_app_key,
+                    dev_eui,
+                    device_class or DEFAULT_DEVICE_CLASS,
+                    application_id or None,
+                )
+            )
+    return tuple(entries)
+
+
+def get_device_index(device_mapping) -> DeviceIndex:
+    """Return the compiled index for the ``device_mapping`` config.
+
+    The mapping entries are only extracted and compiled on a cache miss.
+    """
+    digest = mapping_digest(device_mapping)
+    index = _INDEX_CACHE.get(digest)
+    if index is None:
+        if len(_INDEX_CACHE) >= _MAX_CACHED_INDEXES:
+            _INDEX_CACHE.pop(next(iter(_INDEX_CACHE)))
+        index = _INDEX_CACHE[digest] = DeviceIndex(
+            entries_from_config(device_mapping), digest
+        )
+    return index
@@ -0,0 +1,183 @@
+"""Per-device mapping state, one tag per device.
+
+Each uplink records the device's last-seen time and signal quality, plus the
+bookkeeping used for duplicate filtering, change detection and downlink
+scheduling. Keeping that in a single ``device_mapping_state`` dict meant every
+uplink read and rewrote the whole fleet's state, and concurrent uplinks
+overwrote each other. Hashed bucket tags only narrowed that: a bucket still
+grows with the fleet, and two uplinks for devices in the same bucket still
+overwrote each other.
+
+All of it changes on every uplink, so each device's entry lives in a tag of
+its own (``device_state_{device_id}``). An uplink reads and writes only its
+devices' tags, and uplinks for different devices never touch the same tag.
+
+The summary rebuild needs to find every device, including those matched by
+prefix and glob rules, so devices are also listed in a registry sharded into
+``BUCKET_COUNT`` bucket tags (``device_registry_{bucket:02x}``) by a stable
+hash of the device ID. A device is only added to its bucket when first seen
+and re-registered every ``REGISTRATION_INTERVAL_SECONDS``, so a registration
+lost to a concurrent bucket write heals itself.
+
+The fleet-wide ``device_mapping_state`` tag is kept as a summary index that
+the schedule handler rebuilds from the per-device tags when it is older than
+``SUMMARY_MAX_AGE_SECONDS``. Without a schedule, an uplink invocation that
+claims the summary's lease (see ``lease``) rebuilds it instead, so only one
+invocation at a time pays for reading the whole fleet.
+"""
+
+import asyncio
+import time
+import zlib
+from collections.abc import Iterable
+from datetime import UTC, datetime
+
+from .tag_buffer import TagWriteBuffer
+
+STATE_PREFIX = "device_state_"
+BUCKET_COUNT = 64
+REGISTRY_PREFIX = "device_registry_"
+SUMMARY_TAG = "device_mapping_state"
+SUMMARY_UPDATED_TAG = "device_mapping_state_updated_at"
+SUMMARY_MAX_AGE_SECONDS = 300
+
+# Devices re-register this often, like the stats shards
+REGISTRATION_INTERVAL_SECONDS = 24 * 3600
+
+# Tags read concurrently while reading device states or rebuilding the summary
+READ_CONCURRENCY = 16
+
+# Per-device bookkeeping that is left out of the summary
+SUMMARY_EXCLUDED_FIELDS = frozenset({"recent_frames", "written", "registered_at"})
+
+
+def state_key(device_id: str) -> str:
+    """Return the tag holding ``device_id``'s state."""
+    return f"{STATE_PREFIX}{device_id}"
+
+
+def bucket_key(device_id: str, prefix: str = REGISTRY_PREFIX) -> str:
+    """Return the registry bucket tag listing ``device_id``.
+
+    Other per-device indexes pass their own ``prefix`` to share the hashing.
+    """
+    return f"{prefix}{zlib.crc32(device_id.encode()) % BUCKET_COUNT:02x}"
+
+
+def record_devices(
+    tags: TagWriteBuffer,
+    entries: dict[str, dict],
+    previous: dict[str, dict] | None = None,
+    now: float | None = None,
+):
+    """Queue state updates for several devices, one write per device.
+
+    ``previous`` holds the devices' stored states; devices without one, or
+    whose registration is due, are (re-)registered, one merge per touched
+    registry bucket.
+    """
+    now = time.time() if now is None else now
+    previous = previous or {}
+    registrations: dict[str, dict[str, str]] = {}
+    for device_id, entry in entries.items():
+        registered_at = (previous.get(device_id) or {}).get("registered_at")
+        if (
+            not registered_at
+            or now - datetime.fromisoformat(registered_at).timestamp()
+            > REGISTRATION_INTERVAL_SECONDS
+        ):
+            registered_at = datetime.fromtimestamp(now, UTC).isoformat()
+            registrations.setdefault(bucket_key(device_id), {})[device_id] = (
+                registered_at
+            )
+        tags.set(state_key(device_id), {**entry, "registered_at": registered_at})
+    for key, updates in registrations.items():
+        tags.merge(key, updates)
+
+
+async def get_device_state(tags: TagWriteBuffer, device_id: str) -> dict | None:
+    """Return the stored state for one device (including pending updates)."""
+    return await tags.get(state_key(device_id))
+
+
+async def get_device_states(
+    tags: TagWriteBuffer,
+    device_ids: Iterable[str],
+    keep: bool = True,
+) -> dict[str, dict]:
+    """Return the stored state of several devices, a few reads at a time."""
+    device_ids = list(dict.fromkeys(device_ids))
+    states = {}
+    for start in range(0, len(device_ids), READ_CONCURRENCY):
+        chunk = device_ids[start : start + READ_CONCURRENCY]
+        values = await asyncio.gather(
+            *(tags.get(state_key(device_id), keep=keep) for device_id in chunk)
+        )
+        states.update(
+            (device_id, state)
+            for device_id, state in zip(chunk, values)
+            if isinstance(state, dict)
+        )
+    return states
+
+
+async def registered_devices(tags: TagWriteBuffer) -> list[str]:
+    """Return the ID of every registered device."""
+    device_ids = []
+    for start in range(0, BUCKET_COUNT, READ_CONCURRENCY):
+        buckets = await asyncio.gather(
+            *(
+                tags.get(f"{REGISTRY_PREFIX}{i:02x}", {}, keep=False)
+                for i in range(start, min(start + READ_CONCURRENCY, BUCKET_COUNT))
+            )
+        )
+        for bucket in buckets:
+            device_ids.extend(bucket)
+    return device_ids
+
+
+async def summary_stale(tags: TagWriteBuffer, now: float | None = None) -> bool:
+    """True if the ``device_mapping_state`` summary is due a rebuild."""
+    now = time.time() if now is None else now
+    updated_at = await tags.get(SUMMARY_UPDATED_TAG)
+    if not updated_at:
+        return True
+    return (
+        now - datetime.fromisoformat(updated_at).timestamp() >= SUMMARY_MAX_AGE_SECONDS
+    )
+
+
+async def refresh_summary(
+    tags: TagWriteBuffer,
+    now: float | None = None,
+    force: bool = False,
+) -> bool:
+    """Rebuild the ``device_mapping_state`` summary if it is stale.
+
+    Returns True if the summary was rebuilt.
+    """
+    now = time.time() if now is None else now
+    if not force and not await summary_stale(tags, now):
+        return False
+
+    # States are read a few at a time and dropped once summarised, so only
+    # the summary itself grows with the fleet
+    device_ids = sorted(await registered_devices(tags))
+    summary = {}
+    for start in range(0, len(device_ids), READ_CONCURRENCY):
+        states = await get_device_states(
+            tags, device_ids[start : start + READ_CONCURRENCY], keep=False
+        )
+        for device_id, entry in states.items():
+            # Keep the fleet-wide summary compact
+            summary[device_id] = {
+                k: v for k, v in entry.items() if k not in SUMMARY_EXCLUDED_FIELDS
+            }
+        del states
+
+    tags.set(SUMMARY_TAG, summary)
+    tags.set(
+        SUMMARY_UPDATED_TAG,
+        datetime.fromtimestamp(now, UTC).isoformat(),
+    )
+    return True
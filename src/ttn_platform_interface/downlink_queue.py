@@ -0,0 +1,135 @@
+"""Per-device downlink queue.
+
+The ``{downlink_request_tag}_{device_id}`` tag may hold either a single
+downlink request (the original protocol) or a list of them, so writers can
+queue several commands between schedule runs without overwriting each other.
+
+Each queued item accepts the same fields as a single request (``f_port``,
+``frm_payload`` or ``decoded_payload``, ``priority``, ``confirmed``) plus an
+optional ``id`` used for deduplication. Items without an ``id`` are
+deduplicated by their content.
+
+The whole queue for a device is pushed to TTN in one ``down/push`` call (split
+into chunks of ``MAX_DOWNLINKS_PER_PUSH``), highest priority first and FIFO
+within a priority.
+"""
+
+import hashlib
+import json
+from typing import Any
+
+# TTN's default per-device downlink queue limit
+MAX_DOWNLINKS_PER_PUSH = 16
+
+PRIORITIES = (
+    "LOWEST",
+    "LOW",
+    "BELOW_NORMAL",
+    "NORMAL",
+    "ABOVE_NORMAL",
+    "HIGH",
+    "HIGHEST",
+)
+_PRIORITY_RANK = {name: rank for rank, name in enumerate(PRIORITIES)}
+
+
+def normalise(value: Any) -> list[dict]:
+    """Return the queued items held by a downlink request tag value."""
+    if isinstance(value, dict):
+        return [value]
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    return []
+
+
+def item_key(item: dict) -> str:
+    """Deduplication key: the item's ``id``, or a digest of its content."""
+    if item.get("id") is not None:
+        return f"id:{item['id']}"
+    content = json.dumps(
+        [
+            item.get("f_port", 1),
+            item.get("frm_payload"),
+            item.get("decoded_payload"),
+            bool(item.get("confirmed", False)),
+        ],
+        sort_keys=True,
+    )
+    return "sha1:" + hashlib.sha1(content.encode()).hexdigest()
+
+
+def has_payload(item: dict) -> bool:
+    return bool(item.get("frm_payload") or item.get("decoded_payload"))
+
+
+def prepare(items: list[dict]) -> tuple[list[dict], list[dict]]:
+    """Deduplicate and order queued items.
+
+    Returns ``(queue, invalid)``: the sendable items ordered highest priority
+    first (FIFO within a priority), and the items that carry no payload.
+    """
+    seen = set()
+    queue = []
+    invalid = []
+    for item in items:
+        if not has_payload(item):
+            invalid.append(item)
+            continue
+        key = item_key(item)
+        if key in seen:
+            continue
+        seen.add(key)
+        queue.append(item)
+
+    # sort is stable, so equal priorities keep their queue order
+    queue.sort(key=lambda item: -priority_rank(item))
+    return queue, invalid
+
+
+def priority_rank(item: dict) -> int:
+    return _PRIORITY_RANK.get(item.get("priority", "NORMAL"), _PRIORITY_RANK["NORMAL"])
+
+
+def to_ttn_downlink(item: dict) -> dict:
+    """Build the TTN ``downlinks[]`` entry for a queued item."""
+    downlink = {
+        "f_port": item.get("f_port", 1),
+        "priority": item.get("priority", "NORMAL"),
+    }
+    if item.get("confirmed", False):
+        downlink["confirmed"] = True
+
+    if item.get("frm_payload"):
+        downlink["frm_payload"] = item["frm_payload"]
+    else:
+        downlink["decoded_payload"] = item["decoded_payload"]
+    return downlink
+
+
+def payload_preview(item: dict) -> str:
+    return item.get("frm_payload") or json.dumps(item.get("decoded_payload"))[:50]
+
+
+def chunks(queue: list[dict], size: int = MAX_DOWNLINKS_PER_PUSH) -> list[list[dict]]:
+    return [queue[i : i + size] for i in range(0, len(queue), size)]
+
+
+def remaining_after(value: Any, sent: list[dict]) -> list[dict] | None:
+    """Return what is left of a request tag value once ``sent`` items are removed.
+
+    ``value`` should be freshly read, so items queued while the sweep was
+    sending are kept. Items without a payload are dropped. Returns None when
+    nothing is left, so the tag is cleared.
+    """
+    sent_keys = {item_key(item) for item in sent}
+    remaining = [
+        item
+        for item in normalise(value)
+        if has_payload(item) and item_key(item) not in sent_keys
+    ]
+    return remaining or None
+
+
+def enqueue(value: Any, item: dict) -> list[dict]:
+    """Append ``item`` to a request tag value (for writers using this module)."""
+    return [*normalise(value), item]
@@ -0,0 +1,108 @@
+"""Downlink scheduling around each device's next receive window.
+
+A Class A device only listens right after it sends an uplink, so TTN holds a
+pushed downlink until the device's next uplink. Pushing every queued request
+as soon as the sweep finds it just parks the work in TTN's queue, where it
+can be overwritten before the device ever hears it.
+
+Each uplink updates the device's ``uplink_interval`` in its state tag, an
+exponentially weighted average of the gaps between uplinks. From that and
+``last_seen`` the scheduler predicts the next uplink, and a sweep only pushes
+to Class A devices whose next uplink is due within the lead time; the rest
+stay queued for a later sweep. Class B and C devices (which listen on a
+schedule or continuously) and devices without enough history are always
+due. Due devices are ordered by predicted uplink, earliest first, and can be
+paced across a spread window rather than pushed in one burst.
+"""
+
+import asyncio
+import time
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from typing import NamedTuple
+
+# Weight of the newest gap in the uplink interval average
+INTERVAL_WEIGHT = 0.3
+
+# Gaps outside this range are bursts/retries or outages, not the device's
+# reporting interval, and are left out of the average
+MIN_INTERVAL_SECONDS = 10
+MAX_INTERVAL_SECONDS = 24 * 3600
+
+DEFAULT_LEAD_SECONDS = 600
+
+# Pacing has to finish well inside the 300 s Lambda timeout
+MAX_SPREAD_SECONDS = 180
+
+# Classes that receive without waiting for an uplink
+ALWAYS_LISTENING = frozenset({"B", "C"})
+
+
+class Plan(NamedTuple):
+    # Device IDs to push to now, earliest predicted uplink first
+    due: list[str]
+    # Device IDs held for a later sweep
+    deferred: list[str]
+
+
+def update_interval(previous: dict | None, now: datetime) -> float | None:
+    """Fold the gap since the device's last uplink into its interval average."""
+    if not previous or not previous.get("last_seen"):
+        return None
+    interval = previous.get("uplink_interval")
+    gap = (now - datetime.fromisoformat(previous["last_seen"])).total_seconds()
+    if not MIN_INTERVAL_SECONDS <= gap <= MAX_INTERVAL_SECONDS:
+        return interval
+    if interval is None:
+        return round(gap, 1)
+    return round(interval + INTERVAL_WEIGHT * (gap - interval), 1)
+
+
+def next_uplink_at(state: dict | None) -> float | None:
+    """Predicted time (epoch seconds) of the device's next uplink, if known."""
+    if not state or not state.get("last_seen") or not state.get("uplink_interval"):
+        return None
+    return (
+        datetime.fromisoformat(state["last_seen"]).timestamp()
+        + state["uplink_interval"]
+    )
+
+
+def plan(
+    device_ids: Iterable[str],
+    device_class: Callable[[str], str],
+    states: dict[str, dict],
+    lead: float = DEFAULT_LEAD_SECONDS,
+    now: float | None = None,
+) -> Plan:
+    """Split devices into those to push to now and those to hold back."""
+    now = time.time() if now is None else now
+    due: list[tuple[float, str]] = []
+    deferred = []
+    for device_id in device_ids:
+        predicted = None
+        if device_class(device_id) not in ALWAYS_LISTENING:
+            predicted = next_uplink_at(states.get(device_id))
+        if predicted is None:
+            due.append((now, device_id))
+        elif predicted <= now + lead:
+            # Overdue devices sort first; TTN holds the push until they're back
+            due.append((predicted, device_id))
+        else:
+            deferred.append(device_id)
+    due.sort()
+    return Plan([device_id for _, device_id in due], deferred)
+
+
+class Pacer:
+    """Releases ``count`` sends evenly over ``spread`` seconds, in order."""
+
+    def __init__(self, count: int, spread: float):
+        self.step = min(spread, MAX_SPREAD_SECONDS) / count if count else 0.0
+        self.start = time.monotonic()
+
+    async def wait(self, position: int):
+        """Sleep until the slot for the send at ``position`` opens."""
+        delay = self.start + position * self.step - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
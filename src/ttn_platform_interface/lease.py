@@ -0,0 +1,73 @@
+"""Leases for rebuilding processor-wide aggregates outside the schedule.
+
+Scheduled runs keep aggregates such as ``stats`` and ``device_mapping_state``
+current. Without a schedule, uplink invocations rebuild them once they go
+stale, but a rebuild reads tags across every container or device, and every
+warm container would otherwise start one on its next uplink. An invocation first claims the
+aggregate's lease (the ``{name}_lease`` tag); only the holder rebuilds, and
+the others carry on without it until the lease runs out.
+
+A claim is a read, a write and a read back, so two invocations racing for an
+expired lease rarely both win; if they do, the aggregate is rebuilt twice.
+A container that finds a lease held elsewhere remembers it until it expires,
+so further uplinks don't read the lease tag again.
+"""
+
+import time
+from typing import Any
+
+LEASE_SUFFIX = "_lease"
+
+# Long enough for a rebuild to finish, short enough that a holder that
+# crashed mid-rebuild doesn't hold things up for long
+LEASE_SECONDS = 120
+
+
+def lease_key(name: str) -> str:
+    return f"{name}{LEASE_SUFFIX}"
+
+
+def _held_elsewhere(value: Any, holder: str, now: float) -> bool:
+    return (
+        isinstance(value, dict)
+        and value.get("holder") != holder
+        and value.get("until", 0) > now
+    )
+
+
+class Leases:
+    """Claims aggregate leases, remembering those held by other containers."""
+
+    def __init__(self):
+        # Lease name -> expiry of a lease held by another container
+        self._elsewhere: dict[str, float] = {}
+
+    async def claim(
+        self,
+        app,
+        name: str,
+        holder: str,
+        now: float | None = None,
+        ttl: float = LEASE_SECONDS,
+    ) -> bool:
+        """Claim the lease on ``name`` for ``holder``.
+
+        Reads and writes the lease tag directly on ``app`` (rather than through
+        the tag buffer), so the claim is visible before the rebuild starts.
+        Returns True if ``holder`` now holds the lease.
+        """
+        now = time.time() if now is None else now
+        if self._elsewhere.get(name, 0) > now:
+            return False
+
+        key = lease_key(name)
+        current = await app.get_tag(key)
+        if not _held_elsewhere(current, holder, now):
+            await app.set_tag(key, {"holder": holder, "until": now + ttl})
+            # Read back: a concurrent claim may have overwritten ours
+            current = await app.get_tag(key)
+            if not _held_elsewhere(current, holder, now):
+                return True
+
+        self._elsewhere[name] = current["until"]
+        return False
@@ -0,0 +1,246 @@
+"""Minimal asyncio MQTT 3.1.1 client for subscribing to TTN uplinks.
+
+The Things Stack exposes application traffic over MQTT 3.1.1
+(``v3/{app_id}@{tenant}/devices/{device_id}/up``). Only what streaming
+ingest needs is implemented, on plain asyncio streams so no extra
+dependency is pulled in:
+
+- CONNECT with username/password (the TTN API key), over TLS or plain TCP
+- SUBSCRIBE at QoS 0 or 1
+- receiving PUBLISH packets; QoS 1 messages are acknowledged by the caller
+  (``ack``) once they have been handled, so the broker's in-flight limit
+  applies backpressure
+- clean sessions only, with a random client ID: a message left
+  unacknowledged when the connection closes is not redelivered
+- PINGREQ keep-alives and DISCONNECT
+
+Packet encoding helpers are shared with the broker stand-in used by tests
+and benchmarks.
+"""
+
+import asyncio
+import itertools
+import os
+import ssl
+import struct
+from collections.abc import AsyncIterator
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+SUBSCRIBE = 8
+SUBACK = 9
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+DEFAULT_KEEPALIVE_SECONDS = 60
+CONNECT_TIMEOUT_SECONDS = 10
+
+_CONNACK_ERRORS = {
+    1: "unacceptable protocol version",
+    2: "client identifier rejected",
+    3: "server unavailable",
+    4: "bad username or password",
+    5: "not authorised",
+}
+
+
+class MqttError(Exception):
+    """Protocol error or connection refused by the broker."""
+
+
+class Message(NamedTuple):
+    topic: str
+    payload: bytes
+    # Set for QoS 1 messages, which must be acknowledged with ``ack``
+    packet_id: int | None = None
+
+
+def encode_string(value: str) -> bytes:
+    data = value.encode()
+    return struct.pack("!H", len(data)) + data
+
+
+def encode_packet(packet_type: int, body: bytes = b"", flags: int = 0) -> bytes:
+    """Frame ``body`` with a fixed header (type, flags, remaining length)."""
+    header = bytearray([packet_type << 4 | flags])
+    length = len(body)
+    while True:
+        byte, length = length % 128, length // 128
+        header.append(byte | (0x80 if length else 0))
+        if not length:
+            break
+    return bytes(header) + body
+
+
+async def read_packet(reader: asyncio.StreamReader) -> tuple[int, int, bytes]:
+    """Read one packet, returning ``(packet_type, flags, body)``."""
+    first = (await reader.readexactly(1))[0]
+    length = 0
+    for shift in range(0, 28, 7):
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+    else:
+        raise MqttError("Malformed remaining length")
+    return first >> 4, first & 0x0F, await reader.readexactly(length)
+
+
+def encode_publish(topic: str, payload: bytes, packet_id: int | None = None) -> bytes:
+    body = encode_string(topic)
+    if packet_id is not None:
+        body += struct.pack("!H", packet_id)
+    return encode_packet(
+        PUBLISH, body + payload, flags=0x02 if packet_id is not None else 0
+    )
+
+
+def decode_publish(flags: int, body: bytes) -> Message:
+    (topic_length,) = struct.unpack_from("!H", body)
+    pos = 2 + topic_length
+    topic = body[2:pos].decode()
+    packet_id = None
+    if (flags >> 1) & 0x03:
+        (packet_id,) = struct.unpack_from("!H", body, pos)
+        pos += 2
+    return Message(topic, body[pos:], packet_id)
+
+
+def parse_url(url: str) -> tuple[str, int, bool]:
+    """Return ``(host, port, tls)`` for an ``mqtts://``/``mqtt://`` URL.
+
+    An ``https://`` cluster URL maps to TLS on 8883, as the TTN MQTT server
+    shares its host with the HTTP API.
+    """
+    parsed = urlparse(url)
+    tls = parsed.scheme in ("mqtts", "https")
+    port = parsed.port if parsed.scheme in ("mqtt", "mqtts") else None
+    return parsed.hostname, port or (8883 if tls else 1883), tls
+
+
+class MqttClient:
+    """One MQTT connection. Not reusable once closed; create a new one to reconnect."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        tls: bool = True,
+        client_id: str | None = None,
+        keepalive: int = DEFAULT_KEEPALIVE_SECONDS,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.tls = tls
+        self.client_id = client_id or f"doover-ttn-{os.urandom(6).hex()}"
+        self.keepalive = keepalive
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._pinger: asyncio.Task | None = None
+        self._packet_ids = itertools.count(1)
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self, timeout: float = CONNECT_TIMEOUT_SECONDS):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host,
+                self.port,
+                ssl=ssl.create_default_context() if self.tls else None,
+            ),
+            timeout,
+        )
+        flags = 0x02  # clean session
+        payload = encode_string(self.client_id)
+        if self.username is not None:
+            flags |= 0x80
+            payload += encode_string(self.username)
+        if self.password is not None:
+            flags |= 0x40
+            payload += encode_string(self.password)
+        body = (
+            encode_string("MQTT")
+            + bytes([4, flags])
+            + struct.pack("!H", self.keepalive)
+        )
+        self._writer.write(encode_packet(CONNECT, body + payload))
+
+        packet_type, _, body = await asyncio.wait_for(
+            read_packet(self._reader), timeout
+        )
+        if packet_type != CONNACK:
+            raise MqttError(f"Expected CONNACK, got packet type {packet_type}")
+        if body[1]:
+            raise MqttError(
+                f"Connection refused: {_CONNACK_ERRORS.get(body[1], body[1])}"
+            )
+        self._pinger = asyncio.create_task(self._ping())
+
+    async def subscribe(self, topic: str, qos: int = 1):
+        """Subscribe to ``topic``. SUBACK is consumed by ``messages``."""
+        body = (
+            struct.pack("!H", next(self._packet_ids))
+            + encode_string(topic)
+            + bytes([qos])
+        )
+        self._writer.write(encode_packet(SUBSCRIBE, body, flags=0x02))
+        await self._writer.drain()
+
+    async def messages(self) -> AsyncIterator[Message]:
+        """Yield PUBLISH messages until the connection drops.
+
+        Raises ``asyncio.TimeoutError`` if the broker goes silent for longer
+        than the keep-alive allows, and ``MqttError`` if it rejects the
+        subscription.
+        """
+        silence = self.keepalive * 1.5
+        while True:
+            # ``asyncio.timeout`` rather than ``wait_for``, which on 3.11 can
+            # swallow a cancellation that lands as a packet arrives
+            async with asyncio.timeout(silence):
+                packet_type, flags, body = await read_packet(self._reader)
+            if packet_type == PUBLISH:
+                yield decode_publish(flags, body)
+            elif packet_type == SUBACK and 0x80 in body[2:]:
+                raise MqttError("Subscription rejected")
+
+    async def ack(self, packet_id: int):
+        """Acknowledge a QoS 1 message."""
+        if self.connected:
+            self._writer.write(encode_packet(PUBACK, struct.pack("!H", packet_id)))
+            await self._writer.drain()
+
+    async def close(self):
+        if self._pinger is not None:
+            self._pinger.cancel()
+            self._pinger = None
+        if self._writer is None:
+            return
+        try:
+            if not self._writer.is_closing():
+                self._writer.write(encode_packet(DISCONNECT))
+            self._writer.close()
+            await self._writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+        self._writer = None
+
+    async def _ping(self):
+        while self.connected:
+            await asyncio.sleep(self.keepalive / 2)
+            try:
+                self._writer.write(encode_packet(PINGREQ))
+                await self._writer.drain()
+            except (ConnectionError, OSError):
+                return
@@ -0,0 +1,178 @@
+"""Streaming uplink ingest from the TTN MQTT server.
+
+Instead of one processor invocation per uplink (the webhook -> channel
+path), ``MqttIngest`` holds a subscription open for a fixed duration and
+hands uplinks to ``handle_batch`` in windows: everything received within
+``window`` seconds (up to ``max_batch`` messages) is processed, and its tag
+writes committed, together.
+
+- Backpressure: received messages wait in a bounded queue. When the batch
+  handler falls behind the queue fills, the reader stops reading the socket
+  and the broker's TCP send window (and, for QoS 1, its in-flight limit)
+  holds further messages back.
+- QoS 1 messages are only acknowledged once their batch has been handled.
+  Sessions are clean, so the broker never redelivers: a batch that fails is
+  logged, counted in ``errors`` and dropped, and acknowledged like any other
+  so it doesn't hold the broker's in-flight window. The webhook path, which
+  deployments keep alongside the ingest, still delivers those uplinks.
+- Dropped connections are re-established with jittered exponential
+  backoff until the duration is up. So are connections the reader gave up
+  on because of an unexpected error, such as a malformed packet.
+
+The duration is bounded by what is left of the scheduled run (see
+``ingest_budget``), so the run's final aggregation and tag flush still
+happen inside the Lambda timeout.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from .mqtt import Message, MqttClient, MqttError
+from .ttn_client import backoff_delay
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_SECONDS = 1.0
+DEFAULT_MAX_BATCH = 500
+DEFAULT_QUEUE_SIZE = 2000
+
+# A scheduled run has to finish, sweep included, inside the 300 s Lambda timeout
+INVOCATION_TIMEOUT_SECONDS = 300
+MAX_INGEST_SECONDS = 240
+
+# Kept free at the end of a run for draining the last batches, aggregation
+# and the final tag flush
+FLUSH_MARGIN_SECONDS = 30
+
+
+def ingest_budget(requested: float, elapsed: float) -> float:
+    """Seconds to ingest for, ``elapsed`` seconds into the invocation.
+
+    Capped at ``MAX_INGEST_SECONDS`` and at what is left of the invocation
+    timeout once ``FLUSH_MARGIN_SECONDS`` is set aside.
+    """
+    remaining = INVOCATION_TIMEOUT_SECONDS - FLUSH_MARGIN_SECONDS - elapsed
+    return max(0.0, min(requested, MAX_INGEST_SECONDS, remaining))
+
+
+def uplink_topic(username: str) -> str:
+    """The TTN topic carrying uplinks for every device of an application."""
+    return f"v3/{username}/devices/+/up"
+
+
+@dataclass
+class IngestStats:
+    messages: int = 0
+    batches: int = 0
+    connections: int = 0
+    errors: int = 0
+
+
+class MqttIngest:
+    def __init__(
+        self,
+        connect: Callable[[], MqttClient],
+        topic: str,
+        handle_batch: Callable[[list[bytes]], Awaitable[None]],
+        window: float = DEFAULT_WINDOW_SECONDS,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        self.connect = connect
+        self.topic = topic
+        self.handle_batch = handle_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue[tuple[MqttClient, Message]] = asyncio.Queue(
+            queue_size
+        )
+        self.stats = IngestStats()
+
+    async def run(self, duration: float) -> IngestStats:
+        """Ingest for ``duration`` seconds, then drain what was received."""
+        deadline = time.monotonic() + duration
+        reader = asyncio.create_task(self._read(deadline))
+        try:
+            while time.monotonic() < deadline and not reader.done():
+                await self._next_batch(deadline)
+        finally:
+            reader.cancel()
+            (result,) = await asyncio.gather(reader, return_exceptions=True)
+            if isinstance(result, Exception):
+                log.error("TTN MQTT reader stopped", exc_info=result)
+
+        while not self.queue.empty():
+            await self._next_batch(time.monotonic())
+        return self.stats
+
+    async def _read(self, deadline: float):
+        attempt = 0
+        while time.monotonic() < deadline:
+            client = self.connect()
+            try:
+                await client.connect()
+                await client.subscribe(self.topic)
+                self.stats.connections += 1
+                attempt = 0
+                async for message in client.messages():
+                    # Blocks while the queue is full: backpressure
+                    await self.queue.put((client, message))
+            except asyncio.CancelledError:
+                await client.close()
+                raise
+            except (TimeoutError, MqttError, OSError, asyncio.IncompleteReadError) as e:
+                self.stats.errors += 1
+                log.warning("TTN MQTT connection lost: %s", str(e) or type(e).__name__)
+            except Exception:
+                # e.g. a malformed packet; the stream is out of sync, so start over
+                self.stats.errors += 1
+                log.exception("Unexpected error reading from TTN MQTT, reconnecting")
+            await client.close()
+
+            delay = min(backoff_delay(attempt), max(0.0, deadline - time.monotonic()))
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _next_batch(self, deadline: float):
+        """Collect one window of messages and hand it to ``handle_batch``."""
+        try:
+            first = await asyncio.wait_for(
+                self.queue.get(), max(0.01, deadline - time.monotonic())
+            )
+        except TimeoutError:
+            return
+        batch = [first]
+        window_end = min(time.monotonic() + self.window, deadline)
+        while len(batch) < self.max_batch:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = window_end - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except TimeoutError:
+                break
+
+        try:
+            await self.handle_batch([message.payload for _, message in batch])
+        except Exception:
+            # Dropped: a clean session won't redeliver it, and the rest of
+            # the stream carries on
+            self.stats.errors += 1
+            log.exception("Error handling MQTT uplink batch, dropping %d", len(batch))
+        else:
+            self.stats.messages += len(batch)
+            self.stats.batches += 1
+
+        for client, message in batch:
+            if message.packet_id is not None:
+                try:
+                    await client.ack(message.packet_id)
+                except (ConnectionError, OSError):
+                    # The connection has gone; the batch is written regardless
+                    pass
@@ -0,0 +1,67 @@
+"""Dirty-device index for the downlink sweep.
+
+Checking every mapped device's request tag on every schedule run costs one
+tag read per device per run, even though almost no device has anything
+queued. Writers that queue a downlink can also mark the device in the
+``downlink_pending`` tag (``{device_id: marked_at}``), and the sweep then
+reads that one tag and only visits the devices it lists.
+
+After the sweep, devices whose queue was fully sent are unmarked, unless a
+writer re-marked them (with a newer ``marked_at``) while the sweep ran.
+
+The index is a single tag rewritten by every writer, so a mark can be lost to
+a concurrent write, and a device whose mark was lost would otherwise never be
+visited again. As a safety net, the sweep still checks every device once every
+``FULL_SWEEP_INTERVAL_SECONDS``, recording when it last did so in the
+``downlink_pending_full_sweep_at`` tag.
+"""
+
+from datetime import UTC, datetime
+from typing import Any
+
+PENDING_TAG = "downlink_pending"
+FULL_SWEEP_TAG = "downlink_pending_full_sweep_at"
+FULL_SWEEP_INTERVAL_SECONDS = 3600
+
+
+def pending_devices(value: Any) -> dict[str, str]:
+    """Return the ``{device_id: marked_at}`` entries held by the index tag."""
+    if isinstance(value, dict):
+        return {str(k): v for k, v in value.items()}
+    if isinstance(value, list):
+        # Tolerate writers that keep a plain list of device IDs
+        return {str(device_id): "" for device_id in value}
+    return {}
+
+
+def full_sweep_due(
+    last_full_sweep: Any,
+    now: datetime | None = None,
+    interval: float = FULL_SWEEP_INTERVAL_SECONDS,
+) -> bool:
+    """True if every device is due a check, given the last full sweep's time."""
+    now = now or datetime.now(UTC)
+    try:
+        last = datetime.fromisoformat(last_full_sweep)
+    except (TypeError, ValueError):
+        return True
+    return (now - last).total_seconds() >= interval
+
+
+def mark(value: Any, device_id: str, now: datetime | None = None) -> dict[str, str]:
+    """Return the index tag value with ``device_id`` marked as pending."""
+    now = now or datetime.now(UTC)
+    return {**pending_devices(value), device_id: now.isoformat()}
+
+
+def unmark(value: Any, done: dict[str, str]) -> dict[str, str]:
+    """Return the index tag value with finished devices removed.
+
+    ``done`` maps each finished device to the ``marked_at`` seen at the start
+    of the sweep; devices marked again since then stay pending.
+    """
+    entries = pending_devices(value)
+    for device_id, marked_at in done.items():
+        if entries.get(device_id) == marked_at:
+            del entries[device_id]
+    return entries
@@ -0,0 +1,232 @@
+"""Per-stage timing histograms.
+
+Hot paths are wrapped in ``PERF.timer(stage)`` blocks. While instrumentation
+is disabled a timer is a shared no-op context manager, so the cost is one
+attribute check per stage.
+
+When enabled (the **Perf Metrics** or **Debug Enabled** setting), each
+stage's durations go into a log-bucketed ``Histogram`` held in the warm
+container. Like the stats counters (see ``counters``), each container writes
+its histograms to its own ``perf_shard_{id}`` tag, at most every
+``WRITE_INTERVAL_SECONDS``, and the schedule handler merges the shards
+written in the last ``WINDOW_SECONDS`` into the ``perf`` tag::
+
+    {"stages": {"uplink.total": {"count": 812, "mean_ms": 41.2,
+                                 "p50_ms": 35.4, "p95_ms": 88.1,
+                                 "p99_ms": 140.6, "max_ms": 210.3}, ...},
+     "shards": 2, "updated_at": "..."}
+
+Histograms are cumulative for the life of a container.
+"""
+
+import asyncio
+import math
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from datetime import UTC, datetime
+
+from .counters import REGISTRY_TAG, SHARD_RETENTION_SECONDS
+from .tag_buffer import TagWriteBuffer
+
+PERF_TAG = "perf"
+SHARD_PREFIX = "perf_shard_"
+
+WRITE_INTERVAL_SECONDS = 60
+WINDOW_SECONDS = 3600
+
+# Bucket i covers durations up to MIN_SECONDS * GROWTH ** i: ~10% wide buckets
+# from 10µs to a few minutes, so percentiles are accurate to within ~10%.
+MIN_SECONDS = 1e-5
+GROWTH = 1.1
+MAX_BUCKET = 200
+
+PERCENTILES = (50, 95, 99)
+
+_NULL_TIMER = nullcontext()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, UTC).isoformat()
+
+
+def bucket_index(seconds: float) -> int:
+    if seconds <= MIN_SECONDS:
+        return 0
+    return min(MAX_BUCKET, math.ceil(math.log(seconds / MIN_SECONDS, GROWTH)))
+
+
+def bucket_upper(index: int) -> float:
+    return MIN_SECONDS * GROWTH**index
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        index = bucket_index(seconds)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "Histogram"):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q``th percentile, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * q / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(bucket_upper(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        summary = {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+        }
+        for q in PERCENTILES:
+            summary[f"p{q}_ms"] = round(self.percentile(q) * 1000, 3)
+        summary["max_ms"] = round(self.max * 1000, 3)
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "buckets": {str(i): n for i, n in self.buckets.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls()
+        histogram.buckets = {int(i): n for i, n in data.get("buckets", {}).items()}
+        histogram.count = data.get("count", 0)
+        histogram.total = data.get("sum", 0.0)
+        histogram.max = data.get("max", 0.0)
+        return histogram
+
+
+class PerfRecorder:
+    """Stage timers for one warm container."""
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms: dict[str, Histogram] = {}
+        self._written_at: float | None = None
+
+    def timer(self, stage: str):
+        """Context manager timing the enclosed block as ``stage``."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(stage)
+
+    @contextmanager
+    def _timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.record(seconds)
+
+    def to_tag(self, now: float) -> dict:
+        return {
+            "stages": {
+                stage: histogram.to_dict()
+                for stage, histogram in self.histograms.items()
+            },
+            "updated_at": _iso(now),
+        }
+
+    def stage(
+        self,
+        tags: TagWriteBuffer,
+        shard_id: str,
+        now: float | None = None,
+        force: bool = False,
+    ):
+        """Queue this container's histograms if the write interval has passed."""
+        if not self.enabled or not self.histograms:
+            return
+        now = time.time() if now is None else now
+        if (
+            not force
+            and self._written_at is not None
+            and now - self._written_at < WRITE_INTERVAL_SECONDS
+        ):
+            return
+        tags.set(f"{SHARD_PREFIX}{shard_id}", self.to_tag(now))
+        self._written_at = now
+
+
+async def aggregate_perf(
+    tags: TagWriteBuffer,
+    local: PerfRecorder,
+    shard_id: str,
+    now: float | None = None,
+) -> dict:
+    """Merge the recent perf shards of every container into the ``perf`` tag.
+
+    Shards are found through the stats shard registry, so this should run
+    before ``aggregate_stats`` retires any of them; perf shards of containers
+    about to be retired are deleted. This container's in-memory histograms
+    are used in place of its shard tag.
+    """
+    now = time.time() if now is None else now
+    shard_ids = [i for i in await tags.get(REGISTRY_TAG, {}) if i != shard_id]
+    shards = await asyncio.gather(*(tags.get(f"{SHARD_PREFIX}{i}") for i in shard_ids))
+
+    recent = []
+    for other_id, shard in zip(shard_ids, shards):
+        if not shard:
+            continue
+        age = now - datetime.fromisoformat(shard["updated_at"]).timestamp()
+        if age > SHARD_RETENTION_SECONDS:
+            tags.set(f"{SHARD_PREFIX}{other_id}", None)
+        elif age <= WINDOW_SECONDS:
+            recent.append(
+                {
+                    stage: Histogram.from_dict(data)
+                    for stage, data in shard.get("stages", {}).items()
+                }
+            )
+
+    merged: dict[str, Histogram] = {}
+    live = 0
+    for histograms in (local.histograms, *recent):
+        if not histograms:
+            continue
+        live += 1
+        for stage, histogram in histograms.items():
+            merged.setdefault(stage, Histogram()).merge(histogram)
+
+    perf = {
+        "stages": {stage: merged[stage].summary() for stage in sorted(merged)},
+        "shards": live,
+        "updated_at": _iso(now),
+    }
+    tags.set(PERF_TAG, perf)
+    return perf
+
+
+PERF = PerfRecorder()
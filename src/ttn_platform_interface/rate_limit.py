@@ -0,0 +1,69 @@
+"""Rate limiting for concurrent TTN API requests.
+
+``TokenBucket`` paces outgoing requests so a sweep stays inside TTN's
+fair-use limits in the first place.
+
+``SharedBackoff`` handles the 429s that still happen: when several downlinks
+are in flight and TTN rate limits one of them, every other request will be
+rate limited too. Rather than each task sleeping on its own schedule (and
+retrying in lockstep), all tasks wait on a single shared pause window.
+"""
+
+import asyncio
+
+
+class SharedBackoff:
+    """A pause window shared by all tasks talking to the same TTN cluster."""
+
+    def __init__(self):
+        self._resume_at = 0.0
+
+    @property
+    def active(self) -> bool:
+        """True while the shared pause window is still open."""
+        return self._resume_at > asyncio.get_running_loop().time()
+
+    def trigger(self, delay: float):
+        """Open (or extend) the pause window for ``delay`` seconds from now.
+
+        Overlapping triggers never shorten an existing window, so concurrent
+        429 responses collapse into a single backoff.
+        """
+        resume_at = asyncio.get_running_loop().time() + delay
+        self._resume_at = max(self._resume_at, resume_at)
+
+    async def wait(self):
+        """Sleep until the pause window (if any) has closed."""
+        loop = asyncio.get_running_loop()
+        while (remaining := self._resume_at - loop.time()) > 0:
+            await asyncio.sleep(remaining)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter for outgoing TTN API requests.
+
+    Allows bursts of up to ``capacity`` requests, refilled at ``rate`` tokens
+    per second.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at: float | None = None
+
+    def _refill(self, now: float):
+        if self._updated_at is not None:
+            elapsed = now - self._updated_at
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """Wait until a token is available, then take it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._refill(loop.time())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -0,0 +1,107 @@
+"""Routing downlinks to TTN applications and clusters.
+
+One processor can serve devices spread over several TTN applications and
+regional clusters (eu1, nam1, au1, ...). The top-level TTN settings describe
+the default application; the ``TTN Applications`` config adds more, and a
+mapping entry's ``TTN Application ID`` routes its devices to one of them.
+
+Requests are grouped by cluster host. Each cluster gets its own pooled HTTP
+session, rate limiter, 429 backoff and circuit breaker, as fair-use limits
+and outages are per cluster, and clusters are swept concurrently.
+"""
+
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+from .circuit_breaker import CIRCUIT_TAG
+
+DEFAULT_WEBHOOK_ID = "doover"
+
+
+class TtnApplication(NamedTuple):
+    app_id: str
+    api_url: str
+    api_key: str
+    webhook_id: str = DEFAULT_WEBHOOK_ID
+
+    @property
+    def cluster(self) -> str:
+        return cluster_host(self.api_url)
+
+
+class Routes(NamedTuple):
+    # Cluster host -> device IDs to sweep on that cluster
+    by_cluster: dict[str, list[str]]
+    # Device ID -> the application its downlinks are pushed to
+    applications: dict[str, TtnApplication]
+    # Device IDs mapped to an application that isn't configured
+    unrouted: list[str]
+
+
+def cluster_host(api_url: str) -> str:
+    """The host (and port, if any) identifying a TTN cluster."""
+    return (urlparse(api_url).netloc or api_url).lower()
+
+
+def circuit_tag(cluster: str, default_cluster: str) -> str:
+    """The breaker tag for a cluster; the default cluster keeps ``ttn_circuit``."""
+    if cluster == default_cluster:
+        return CIRCUIT_TAG
+    return f"{CIRCUIT_TAG}_{cluster}"
+
+
+def applications_from_config(config) -> dict[str, TtnApplication]:
+    """Return the configured applications by ID, the default application first.
+
+    Additional applications fall back to the default cluster URL, API key and
+    webhook ID for any field left empty. Returns an empty dict if the default
+    application isn't configured.
+    """
+    app_id = config.ttn_application_id.value
+    api_key = config.ttn_api_key.value
+    if not app_id or not api_key:
+        return {}
+
+    default = TtnApplication(
+        app_id,
+        config.ttn_api_url.value.rstrip("/"),
+        api_key,
+        config.ttn_webhook_id.value or DEFAULT_WEBHOOK_ID,
+    )
+    applications = {app_id: default}
+    for entry in config.ttn_applications.elements or []:
+        elems = entry.elements
+        app_id = elems[0].value
+        api_url = elems[1].value if len(elems) > 1 else None
+        api_key = elems[2].value if len(elems) > 2 else None
+        webhook_id = elems[3].value if len(elems) > 3 else None
+        if app_id and app_id not in applications:
+            applications[app_id] = TtnApplication(
+                app_id,
+                (api_url or default.api_url).rstrip("/"),
+                api_key or default.api_key,
+                webhook_id or default.webhook_id,
+            )
+    return applications
+
+
+def route(
+    device_ids: Iterable[str],
+    application_id: Callable[[str], str | None],
+    applications: dict[str, TtnApplication],
+) -> Routes:
+    """Group devices by the cluster of the application each is mapped to."""
+    default = next(iter(applications.values()))
+    by_cluster: dict[str, list[str]] = {}
+    routed = {}
+    unrouted = []
+    for device_id in device_ids:
+        app_id = application_id(device_id)
+        application = applications.get(app_id) if app_id else default
+        if application is None:
+            unrouted.append(device_id)
+            continue
+        routed[device_id] = application
+        by_cluster.setdefault(application.cluster, []).append(device_id)
+    return Routes(by_cluster, routed, unrouted)
@@ -0,0 +1,144 @@
+"""Per-invocation tag write-back buffer.
+
+Handlers used to call ``get_tag``/``set_tag`` directly for every field they
+touched, including read-modify-write cycles on shared dict tags such as
+``stats`` and ``device_mapping_state``. The buffer collects every mutation made
+during an invocation, merges counter increments and dict updates in memory,
+and commits each touched tag exactly once when flushed.
+"""
+
+import asyncio
+import logging
+from typing import Any
+
+from .warm_state import TagSnapshotCache
+
+log = logging.getLogger(__name__)
+
+
+class TagWriteBuffer:
+    """Collects tag mutations for one invocation and commits them in one go.
+
+    - ``set`` replaces a tag value outright.
+    - ``increment`` accumulates a numeric delta for a field of a dict tag.
+    - ``merge`` accumulates key updates for a dict tag.
+
+    Dict tags with pending increments or merges are read once, at flush time,
+    so the read-modify-write window is as short as possible. If a
+    ``TagSnapshotCache`` is given, fresh snapshots of the keys it tracks are
+    used instead of reading the tag store at all.
+
+    If a ``perf.PerfRecorder`` is given, tag store reads and writes are timed
+    as the ``tag.read`` and ``tag.write`` stages.
+    """
+
+    def __init__(self, app, snapshots: TagSnapshotCache | None = None, perf=None):
+        self._app = app
+        self._snapshots = snapshots
+        self._perf = perf
+        self._cache: dict[str, Any] = {}
+        self._values: dict[str, Any] = {}
+        self._increments: dict[str, dict[str, int | float]] = {}
+        self._merges: dict[str, dict[str, Any]] = {}
+
+    @property
+    def pending(self) -> bool:
+        """True if there are mutations that have not been flushed yet."""
+        return bool(self._values or self._increments or self._merges)
+
+    async def get(self, key: str, default: Any = None, keep: bool = True) -> Any:
+        """Read a tag, returning the buffered value if one is pending.
+
+        Pending increments and merges are applied to the returned value so
+        callers see the state the tag will have after the flush. With
+        ``keep=False`` a value read from the tag store isn't held for the rest
+        of the invocation, for one-off reads of large tags.
+        """
+        if key in self._values:
+            value = self._values[key]
+        elif key in self._cache:
+            value = self._cache[key]
+        else:
+            value = await self._read(key)
+            if keep:
+                self._cache[key] = value
+
+        if key in self._increments or key in self._merges:
+            value = self._apply_pending(key, value)
+
+        return default if value is None else value
+
+    def set(self, key: str, value: Any):
+        """Replace a tag value. Discards any pending increments or merges."""
+        self._values[key] = value
+        self._increments.pop(key, None)
+        self._merges.pop(key, None)
+
+    def increment(self, key: str, field: str, amount: float = 1):
+        """Add ``amount`` to ``field`` of the dict tag ``key``."""
+        fields = self._increments.setdefault(key, {})
+        fields[field] = fields.get(field, 0) + amount
+
+    def merge(self, key: str, updates: dict[str, Any]):
+        """Shallow-merge ``updates`` into the dict tag ``key``."""
+        self._merges.setdefault(key, {}).update(updates)
+
+    async def flush(self) -> bool:
+        """Commit every pending mutation, one write per touched tag.
+
+        Writes are issued concurrently. Tags that fail to write stay pending
+        so a later flush can retry them. Returns True if every write succeeded.
+        """
+        if not self.pending:
+            return True
+
+        keys = list(dict.fromkeys([*self._values, *self._increments, *self._merges]))
+        values = [await self.get(key) for key in keys]
+
+        results = await asyncio.gather(
+            *(self._write(key, value) for key, value in zip(keys, values)),
+            return_exceptions=True,
+        )
+
+        ok = True
+        for key, value, result in zip(keys, values, results):
+            if isinstance(result, Exception):
+                log.error("Failed to write tag '%s': %s", key, result)
+                ok = False
+                continue
+            self._cache[key] = value
+            if self._snapshots is not None:
+                self._snapshots.put(key, value)
+            self._values.pop(key, None)
+            self._increments.pop(key, None)
+            self._merges.pop(key, None)
+        return ok
+
+    async def _read(self, key: str) -> Any:
+        if self._snapshots is not None and self._snapshots.tracks(key):
+            hit, value = self._snapshots.get(key)
+            if hit:
+                return value
+            value = await self._get_tag(key)
+            self._snapshots.put(key, value)
+            return value
+        return await self._get_tag(key)
+
+    async def _get_tag(self, key: str) -> Any:
+        if self._perf is None:
+            return await self._app.get_tag(key)
+        with self._perf.timer("tag.read"):
+            return await self._app.get_tag(key)
+
+    async def _write(self, key: str, value: Any):
+        if self._perf is None:
+            return await self._app.set_tag(key, value)
+        with self._perf.timer("tag.write"):
+            return await self._app.set_tag(key, value)
+
+    def _apply_pending(self, key: str, value: Any) -> dict:
+        result = dict(value) if isinstance(value, dict) else {}
+        for field, amount in self._increments.get(key, {}).items():
+            result[field] = (result.get(field) or 0) + amount
+        result.update(self._merges.get(key, {}))
+        return result
@@ -0,0 +1,208 @@
+"""TTN Application Server API client.
+
+Wraps the ``down/push`` webhook endpoint with:
+
+- a token-bucket limiter, so a sweep stays inside TTN's fair-use limits,
+- jittered exponential backoff that honours ``Retry-After``, with 429s
+  shared across all in-flight requests (see ``SharedBackoff``),
+- a circuit breaker (see ``CircuitBreaker``) so an unreachable cluster is
+  skipped immediately instead of timing out device by device.
+"""
+
+import asyncio
+import logging
+import random
+from collections.abc import Callable
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, NamedTuple
+
+from .circuit_breaker import CircuitBreaker
+from .rate_limit import SharedBackoff, TokenBucket
+
+if TYPE_CHECKING:
+    import aiohttp
+
+log = logging.getLogger(__name__)
+
+DEFAULT_REQUESTS_PER_SECOND = 10
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# Never wait longer than this on a Retry-After header; the invocation would
+# time out before the retry happened anyway.
+MAX_RETRY_AFTER_SECONDS = 60.0
+
+
+class PushResult(NamedTuple):
+    ok: bool
+    status: int | None = None
+    error: str | None = None
+    # True when the request was not attempted because the breaker is open
+    skipped: bool = False
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (zero-based) attempt."""
+    cap = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt + 1))
+    return random.uniform(0, cap)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a ``Retry-After`` header (delta seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        # Rare, and the email package is slow to import
+        from email.utils import parsedate_to_datetime
+
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=UTC)
+        delay = (retry_at - datetime.now(UTC)).total_seconds()
+    return min(max(delay, 0.0), MAX_RETRY_AFTER_SECONDS)
+
+
+class TtnClient:
+    """Client for one TTN application's webhook.
+
+    ``session`` may be a zero-argument callable returning the HTTP session;
+    it is then only called (and aiohttp only imported) on the first request.
+    Clients for applications on the same cluster share its ``breaker``,
+    ``limiter`` and ``backoff``.
+    """
+
+    def __init__(
+        self,
+        session: "aiohttp.ClientSession | Callable[[], aiohttp.ClientSession]",
+        api_url: str,
+        app_id: str,
+        webhook_id: str,
+        api_key: str,
+        breaker: CircuitBreaker | None = None,
+        requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+        max_retries: int = 3,
+        limiter: TokenBucket | None = None,
+        backoff: SharedBackoff | None = None,
+    ):
+        self._session = session
+        self.api_url = api_url.rstrip("/")
+        self.app_id = app_id
+        self.webhook_id = webhook_id
+        self.api_key = api_key
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or TokenBucket(requests_per_second)
+        self.backoff = backoff or SharedBackoff()
+        self.max_retries = max_retries
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        if callable(self._session):
+            self._session = self._session()
+        return self._session
+
+    def push_url(self, device_id: str) -> str:
+        return (
+            f"{self.api_url}/api/v3/as/applications/{self.app_id}"
+            f"/webhooks/{self.webhook_id}/devices/{device_id}/down/push"
+        )
+
+    @property
+    def headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    async def push_downlinks(self, device_id: str, body: dict) -> PushResult:
+        """Push downlinks to a device, retrying transient failures."""
+        # Deferred with the session (see WarmState.get_http_session)
+        import aiohttp
+
+        url = self.push_url(device_id)
+        error = None
+
+        for attempt in range(self.max_retries):
+            if not self.breaker.allow():
+                return PushResult(False, error="TTN circuit breaker open", skipped=True)
+
+            await self.backoff.wait()
+            await self.limiter.acquire()
+
+            try:
+                async with self.session.post(
+                    url, json=body, headers=self.headers
+                ) as response:
+                    if response.status == 200:
+                        self.breaker.record_success()
+                        return PushResult(True, status=200)
+
+                    if response.status == 429:
+                        # The cluster is up, just busy: not a breaker failure
+                        self.breaker.record_success()
+                        delay = parse_retry_after(response.headers.get("Retry-After"))
+                        if delay is None:
+                            delay = backoff_delay(attempt)
+                        log.warning(
+                            "TTN API rate limit (429), pausing all requests for %.1fs...",
+                            delay,
+                        )
+                        self.backoff.trigger(delay)
+                        error = f"Rate limited (429): {await response.text()}"
+                        continue
+
+                    if response.status >= 500:
+                        self.breaker.record_failure()
+                        delay = parse_retry_after(response.headers.get("Retry-After"))
+                        if delay is None:
+                            delay = backoff_delay(attempt)
+                        log.warning(
+                            "TTN API server error (%d), retrying in %.1fs...",
+                            response.status,
+                            delay,
+                        )
+                        error = (
+                            f"Server error ({response.status}): {await response.text()}"
+                        )
+                        await asyncio.sleep(delay)
+                        continue
+
+                    # Remaining 4xx errors won't succeed on retry
+                    self.breaker.record_success()
+                    if response.status == 401:
+                        return PushResult(
+                            False,
+                            status=401,
+                            error="TTN API authentication failed (401). Check API key.",
+                        )
+                    if response.status == 404:
+                        return PushResult(
+                            False,
+                            status=404,
+                            error=f"TTN API 404: device '{device_id}' or webhook not found.",
+                        )
+                    return PushResult(
+                        False,
+                        status=response.status,
+                        error=f"TTN API error ({response.status}) for {device_id}: {await response.text()}",
+                    )
+
+            except (TimeoutError, aiohttp.ClientError) as e:
+                self.breaker.record_failure()
+                delay = backoff_delay(attempt)
+                log.warning(
+                    "HTTP error sending downlink (attempt %d/%d): %s",
+                    attempt + 1,
+                    self.max_retries,
+                    e,
+                )
+                error = str(e) or type(e).__name__
+                await asyncio.sleep(delay)
+
+        return PushResult(
+            False,
+            error=f"Downlink failed for {device_id} after {self.max_retries} retries: {error}",
+        )
@@ -0,0 +1,167 @@
+"""Per-device uplink history, kept as a columnar ring buffer.
+
+The ``{uplink_tag_name}_{device_id}`` tag only holds a device's latest
+uplink. With **Uplink History Length** set, the last N uplinks of each device
+are also kept in ``{uplink_tag_name}_history_{device_id}``, so a dashboard
+can fetch a window of history in a single read.
+
+The tag stores one fixed-length array per column rather than a list of
+uplink dicts::
+
+    {
+        "size": 4, "head": 1, "count": 4,
+        "received_at": ["...", "...", "...", "..."],
+        "f_cnt": [13, 10, 11, 12],
+        "rssi": [...], "snr": [...],
+        "fields": {"temperature": [21.6, 20.9, 21.0, 21.3]},
+    }
+
+``head`` is the slot the next uplink is written to, so appending overwrites
+one slot per column instead of shifting the arrays; all uplinks for a device
+in an invocation are appended before the tag is written once. Scalar
+top-level ``decoded_payload`` values get a column each under ``fields``
+(up to ``MAX_FIELDS``). Use ``window`` to read the ring back in order.
+
+The ring is one tag so that a window is one read, and the price is paid on
+the write side: every uplink reads and rewrites the whole ring, about 70
+bytes per slot with a handful of fields (~7 KB at 100 slots), and two
+invocations handling the same device at once can lose one's append. Keep
+**Uplink History Length** to what a dashboard actually shows.
+"""
+
+import asyncio
+from collections.abc import Iterable
+from typing import Any
+
+from .tag_buffer import TagWriteBuffer
+from .uplinks import UplinkRecord
+
+COLUMNS = ("received_at", "f_cnt", "rssi", "snr")
+
+# Bounds the tag size for devices whose decoded payloads vary a lot
+MAX_FIELDS = 32
+
+_SCALARS = (str, int, float, bool)
+
+
+def history_key(uplink_tag_name: str, device_id: str) -> str:
+    return f"{uplink_tag_name}_history_{device_id}"
+
+
+def empty(size: int) -> dict:
+    return {
+        "size": size,
+        "head": 0,
+        "count": 0,
+        **{column: [None] * size for column in COLUMNS},
+        "fields": {},
+    }
+
+
+def _is_ring(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and isinstance(value.get("size"), int)
+        and all(len(value.get(column) or ()) == value["size"] for column in COLUMNS)
+    )
+
+
+def window(value: Any, limit: int | None = None) -> dict[str, Any]:
+    """Return the history as ordered columns, oldest first.
+
+    ``limit`` keeps only the most recent entries. The result has the same
+    column layout as the ring (``received_at``, ..., ``fields``) without the
+    ring bookkeeping.
+    """
+    if not _is_ring(value):
+        return {**{column: [] for column in COLUMNS}, "fields": {}}
+
+    size, head, count = value["size"], value["head"], value["count"]
+    if limit is not None:
+        count = min(count, max(limit, 0))
+    slots = [(head - count + i) % size for i in range(count)]
+    return {
+        **{column: [value[column][i] for i in slots] for column in COLUMNS},
+        "fields": {
+            name: [values[i] for i in slots]
+            for name, values in value.get("fields", {}).items()
+        },
+    }
+
+
+def _resize(value: Any, size: int) -> dict:
+    """Rebuild ``value`` as a ring of ``size`` slots, keeping the newest entries."""
+    ordered = window(value, size)
+    ring = empty(size)
+    count = len(ordered["received_at"])
+    for column in COLUMNS:
+        ring[column][:count] = ordered[column]
+    for name, values in ordered["fields"].items():
+        ring["fields"][name] = values + [None] * (size - count)
+    ring["head"] = count % size
+    ring["count"] = count
+    return ring
+
+
+def _scalar_fields(decoded_payload: Any) -> dict[str, Any]:
+    if not isinstance(decoded_payload, dict):
+        return {}
+    return {
+        str(name): value
+        for name, value in decoded_payload.items()
+        if isinstance(value, _SCALARS)
+    }
+
+
+def append(
+    value: Any,
+    records: Iterable[UplinkRecord],
+    size: int,
+    fallback_timestamp: str,
+) -> dict:
+    """Append ``records`` (oldest first) to a ring and return it.
+
+    ``value`` is the current tag value; a missing or differently-sized ring
+    is rebuilt first. The ring is updated in place where possible.
+    """
+    ring = value if _is_ring(value) and value["size"] == size else _resize(value, size)
+    fields = ring.setdefault("fields", {})
+
+    for record in records:
+        i = ring["head"]
+        ring["received_at"][i] = record.received_at or fallback_timestamp
+        ring["f_cnt"][i] = record.f_cnt
+        ring["rssi"][i] = record.rssi
+        ring["snr"][i] = record.snr
+
+        values = _scalar_fields(record.decoded_payload)
+        for name, column in fields.items():
+            column[i] = values.pop(name, None)
+        for name, field_value in values.items():
+            if len(fields) >= MAX_FIELDS:
+                break
+            column = [None] * size
+            column[i] = field_value
+            fields[name] = column
+
+        ring["head"] = (i + 1) % size
+        ring["count"] = min(ring["count"] + 1, size)
+
+    # Drop columns for fields that no longer appear anywhere in the window
+    for name in [n for n, column in fields.items() if all(v is None for v in column)]:
+        del fields[name]
+    return ring
+
+
+async def append_history(
+    tags: TagWriteBuffer,
+    uplink_tag_name: str,
+    device_records: dict[str, list[UplinkRecord]],
+    size: int,
+    fallback_timestamp: str,
+):
+    """Append each device's records to its history tag, one write per device."""
+    keys = [history_key(uplink_tag_name, device_id) for device_id in device_records]
+    values = await asyncio.gather(*(tags.get(key) for key in keys))
+    for key, value, records in zip(keys, values, device_records.values()):
+        tags.set(key, append(value, records, size, fallback_timestamp))
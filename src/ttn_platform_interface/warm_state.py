@@ -0,0 +1,155 @@
+"""State kept alive between invocations in a warm Lambda container.
+
+A processor instance only lives for one event, but the Python module (and the
+event loop pydoover drives it on) survives for as long as Lambda keeps the
+container warm. Anything expensive that doesn't depend on the event lives
+here instead of on the application instance:
+
+- a pooled keep-alive HTTP session per TTN cluster, so TCP/TLS connections
+  are reused rather than re-established on every invocation. Sessions are
+  created on first use, so aiohttp is only imported once a downlink is
+  actually sent.
+- snapshots of processor-owned tags, so read-modify-write cycles can skip the
+  read while the snapshot is fresh
+- this container's stats shard (see ``counters``)
+- recently seen uplink keys, for duplicate filtering (see ``dedup``)
+- the last connection ping, so pings can be coalesced (see ``connection``)
+- aggregate leases known to be held by other containers (see ``lease``)
+
+The compiled device index is cached alongside, in ``device_index``.
+"""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any
+
+from .connection import PingCoalescer
+from .dedup import SeenUplinks
+from .lease import Leases
+
+if TYPE_CHECKING:
+    import aiohttp
+
+HTTP_TIMEOUT_SECONDS = 30
+
+# Idle keep-alive connections are dropped after this long. Kept short because
+# a frozen container can come back with connections the server already closed.
+KEEPALIVE_TIMEOUT_SECONDS = 30
+
+# How long a tag snapshot may be used instead of reading the tag again.
+SNAPSHOT_TTL_SECONDS = 30.0
+
+
+class TagSnapshotCache:
+    """Short-lived copies of tag values written or read by this container.
+
+    Only keys listed in ``keys`` are cached; everything else is always read
+    from the tag store.
+    """
+
+    def __init__(
+        self, keys: frozenset[str] = frozenset(), ttl: float = SNAPSHOT_TTL_SECONDS
+    ):
+        self.keys = keys
+        self.ttl = ttl
+        self._entries: dict[str, tuple[float, Any]] = {}
+
+    def tracks(self, key: str) -> bool:
+        return key in self.keys
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """Return ``(hit, value)`` for a fresh snapshot of ``key``."""
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return False, None
+        return True, entry[1]
+
+    def put(self, key: str, value: Any):
+        if key in self.keys:
+            self._entries[key] = (time.monotonic(), value)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class WarmState:
+    """Container-wide state shared by every invocation in a warm container."""
+
+    def __init__(self):
+        # Cluster host -> session (see ``routing``)
+        self.http_sessions: dict[str, aiohttp.ClientSession] = {}
+        self._session_loop: asyncio.AbstractEventLoop | None = None
+        self.tag_snapshots = TagSnapshotCache()
+        # A counters.StatsShard, created by the application on first use
+        self.stats_shard = None
+        self.seen_uplinks = SeenUplinks()
+        self.pings = PingCoalescer()
+        self.leases = Leases()
+        self._config_fingerprint: Any = None
+
+    def get_http_session(self, cluster: str = "") -> "aiohttp.ClientSession":
+        """Return the pooled HTTP session for a TTN cluster, creating it on first use.
+
+        A session is bound to the event loop it was created on. pydoover's
+        Lambda runtime drives every invocation on one module-level loop, but
+        if the loop has changed since (e.g. a runtime that uses
+        ``asyncio.run`` per invocation), the old sessions are released and
+        new ones created.
+        """
+        # Imported here: uplink-only invocations never need the HTTP stack,
+        # though pydoover's runtime may already have loaded it
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if self._session_loop is not loop:
+            self._release_sessions()
+            self._session_loop = loop
+        session = self.http_sessions.get(cluster)
+        if session is None or session.closed:
+            session = self.http_sessions[cluster] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    keepalive_timeout=KEEPALIVE_TIMEOUT_SECONDS,
+                    ttl_dns_cache=300,
+                ),
+                headers={
+                    "User-Agent": "doover-ttn-platform-interface",
+                },
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS),
+            )
+        return session
+
+    def bind_config(self, fingerprint: Any, snapshot_keys: frozenset[str]):
+        """Invalidate config-dependent state if the config has changed."""
+        if fingerprint != self._config_fingerprint:
+            self._config_fingerprint = fingerprint
+            self.tag_snapshots = TagSnapshotCache(snapshot_keys)
+            self.pings = PingCoalescer()
+
+    def _release_sessions(self):
+        """Close sessions left over from an event loop that is no longer in use.
+
+        ``close()`` is a coroutine on the old loop, which can't be run from
+        this one. Instead each connector closes its pooled connections in
+        place (aiohttp's synchronous half of ``close()``, which also copes
+        with a loop that has since been closed) and is detached from its
+        session, so neither is reported as unclosed.
+        """
+        for session in self.http_sessions.values():
+            connector = session.connector
+            session.detach()
+            if connector is not None and not connector.closed:
+                connector._close()
+        self.http_sessions = {}
+
+    async def close(self):
+        """Close the pooled HTTP sessions (e.g. at interpreter shutdown or in tests)."""
+        if self._session_loop is not asyncio.get_running_loop():
+            self._release_sessions()
+        for session in self.http_sessions.values():
+            if not session.closed:
+                await session.close()
+        self.http_sessions = {}
+        self._session_loop = None
+
+
+WARM_STATE = WarmState()
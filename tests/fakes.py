@@ -0,0 +1,376 @@
+"""In-process stand-ins shared by the tests and the benchmarks.
+
+``FakeTagStore`` implements the processor's ``get_tag``/``set_tag``/
+``ping_connection`` calls. ``BenchApp`` runs the real
+``TtnPlatformInterface`` handlers against it, with HTTP calls sent to a
+``FakeTtnServer`` listening on localhost. ``FakeMqttBroker`` stands in for
+the TTN MQTT server.
+
+aiohttp is only imported when a ``FakeTtnServer`` is started, so the uplink
+path can be measured without it (see ``benchmarks.cold_start``).
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import struct
+from types import SimpleNamespace
+from typing import Any
+
+from ttn_platform_interface import mqtt
+from ttn_platform_interface.application import TtnPlatformInterface
+
+
+class FakeTagStore:
+    """Tag store with optional per-call latency and round-trip counters.
+
+    Values are JSON round-tripped on every read and write, as they would be
+    on the wire. Keyword arguments seed initial tag values.
+    """
+
+    def __init__(self, latency: float = 0.0, **tags: Any):
+        self.latency = latency
+        self.raw: dict[str, str] = {}
+        self.reads = 0
+        self.writes = 0
+        self.pings = 0
+        for key, value in tags.items():
+            self.put(key, value)
+
+    @property
+    def tags(self) -> dict[str, Any]:
+        """Decoded copy of every stored tag."""
+        return {key: json.loads(value) for key, value in self.raw.items()}
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_tag(self, key: str) -> Any:
+        self.reads += 1
+        await self._round_trip()
+        return self.peek(key)
+
+    async def set_tag(self, key: str, value: Any):
+        self.writes += 1
+        await self._round_trip()
+        self.put(key, value)
+
+    async def ping_connection(self, **kwargs):
+        self.pings += 1
+        await self._round_trip()
+
+    def put(self, key: str, value: Any):
+        """Seed a tag without counting a round trip."""
+        self.raw[key] = json.dumps(value)
+
+    def peek(self, key: str) -> Any:
+        value = self.raw.get(key)
+        return None if value is None else json.loads(value)
+
+    def counters(self) -> dict[str, int]:
+        return {"reads": self.reads, "writes": self.writes, "pings": self.pings}
+
+
+class FakeTtnServer:
+    """Local aiohttp server answering TTN ``down/push`` requests.
+
+    ``rate_429`` and ``rate_5xx`` are the fractions of requests answered
+    with a rate limit or a server error; both carry a ``Retry-After`` of
+    ``retry_after`` seconds so retries don't stall the benchmark. The first
+    ``rate_limit_first`` requests are always rate limited.
+
+    Each push's downlinks are kept in ``pushes``, and each request's arrival
+    time, response time (on the event loop's clock) and status in ``history``.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        retry_after: float = 0.05,
+        seed: int = 0,
+        rate_limit_first: int = 0,
+    ):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.rate_limit_first = rate_limit_first
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.pushes: list[list[dict]] = []
+        self.history: list[tuple[float, float, int]] = []
+        # Requests per TTN application ID in the push path
+        self.applications: dict[str, int] = {}
+        self.statuses: dict[int, int] = {}
+        self.downlinks = 0
+        self._runner = None
+        self.url = ""
+
+    async def start(self) -> str:
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post(
+            "/api/v3/as/applications/{app_id}/webhooks/{webhook_id}"
+            "/devices/{device_id}/down/push",
+            self._push,
+        )
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _push(self, request):
+        from aiohttp import web
+
+        loop = asyncio.get_running_loop()
+        arrived = loop.time()
+        self.requests += 1
+        number = self.requests
+        app_id = request.match_info["app_id"]
+        self.applications[app_id] = self.applications.get(app_id, 0) + 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            body = await request.json()
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+        roll = self.random.random()
+        if number <= self.rate_limit_first or roll < self.rate_429:
+            status = 429
+        elif roll < self.rate_429 + self.rate_5xx:
+            status = 503
+        else:
+            status = 200
+            self.downlinks += len(body.get("downlinks", []))
+            self.pushes.append(body.get("downlinks", []))
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.history.append((arrived, loop.time(), status))
+
+        headers = {"Retry-After": str(self.retry_after)} if status != 200 else {}
+        return web.json_response({}, status=status, headers=headers)
+
+    def counters(self) -> dict[str, Any]:
+        return {
+            "ttn_requests": self.requests,
+            "ttn_statuses": dict(sorted(self.statuses.items())),
+            "downlinks_delivered": self.downlinks,
+        }
+
+
+class FakeMqttBroker:
+    """Local MQTT 3.1.1 broker answering like the TTN MQTT server.
+
+    Checks the username and password if given, supports ``+``/``#``
+    subscription wildcards, delivers QoS 1 messages with packet IDs and
+    counts the acknowledgements. ``publish`` waits for each subscriber's
+    socket to drain, so a client that stops reading pushes back on the
+    publisher as a real broker would.
+    """
+
+    def __init__(self, username: str | None = None, password: str | None = None):
+        self.username = username
+        self.password = password
+        self.published = 0
+        self.acked = 0
+        self.connections = 0
+        self._subscribers: dict[asyncio.StreamWriter, list[tuple[str, int]]] = {}
+        self._packet_ids = itertools.count(1)
+        self._server: asyncio.Server | None = None
+        self.url = ""
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._session, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"mqtt://127.0.0.1:{port}"
+        return self.url
+
+    async def stop(self):
+        self.drop_connections()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def drop_connections(self):
+        """Close every client connection, as during a broker restart."""
+        for writer in list(self._subscribers):
+            writer.close()
+        self._subscribers.clear()
+
+    async def publish(self, topic: str, payload: bytes):
+        self.published += 1
+        for writer, filters in list(self._subscribers.items()):
+            qos = max((q for f, q in filters if _topic_matches(f, topic)), default=None)
+            if qos is None or writer.is_closing():
+                continue
+            packet_id = next(self._packet_ids) % 65535 + 1 if qos else None
+            writer.write(mqtt.encode_publish(topic, payload, packet_id))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                self._subscribers.pop(writer, None)
+
+    async def _session(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            packet_type, _, body = await mqtt.read_packet(reader)
+            if packet_type != mqtt.CONNECT or not self._authorised(body):
+                writer.write(mqtt.encode_packet(mqtt.CONNACK, bytes([0, 4])))
+                return
+            writer.write(mqtt.encode_packet(mqtt.CONNACK, bytes([0, 0])))
+            self.connections += 1
+            self._subscribers[writer] = []
+
+            while True:
+                packet_type, _, body = await mqtt.read_packet(reader)
+                if packet_type == mqtt.SUBSCRIBE:
+                    granted = bytearray()
+                    pos = 2
+                    while pos < len(body):
+                        (length,) = struct.unpack_from("!H", body, pos)
+                        topic = body[pos + 2 : pos + 2 + length].decode()
+                        qos = min(body[pos + 2 + length], 1)
+                        self._subscribers[writer].append((topic, qos))
+                        granted.append(qos)
+                        pos += 3 + length
+                    writer.write(
+                        mqtt.encode_packet(mqtt.SUBACK, body[:2] + bytes(granted))
+                    )
+                elif packet_type == mqtt.PUBACK:
+                    self.acked += 1
+                elif packet_type == mqtt.PINGREQ:
+                    writer.write(mqtt.encode_packet(mqtt.PINGRESP))
+                elif packet_type == mqtt.DISCONNECT:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._subscribers.pop(writer, None)
+            writer.close()
+
+    def _authorised(self, body: bytes) -> bool:
+        if self.username is None:
+            return True
+        flags = body[7]
+        fields = []
+        pos = 10
+        while pos < len(body):
+            (length,) = struct.unpack_from("!H", body, pos)
+            fields.append(body[pos + 2 : pos + 2 + length].decode())
+            pos += 2 + length
+        # Client ID first, then the username and password when flagged
+        username = fields[1] if flags & 0x80 else None
+        password = fields[2] if flags & 0x40 else None
+        return username == self.username and password == self.password
+
+
+def _topic_matches(topic_filter: str, topic: str) -> bool:
+    filter_levels = topic_filter.split("/")
+    levels = topic.split("/")
+    for i, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if i >= len(levels) or level not in ("+", levels[i]):
+            return False
+    return len(filter_levels) == len(levels)
+
+
+def _setting(value: Any) -> SimpleNamespace:
+    return SimpleNamespace(value=value)
+
+
+def bench_config(device_ids: list[str], ttn_url: str, **overrides) -> SimpleNamespace:
+    """Build a processor config with ``.value`` settings, like the pydoover schema.
+
+    Every mapped device gets its own Doover app key. ``overrides`` set any
+    other setting by its config attribute name.
+    """
+    settings = {
+        "ttn_api_url": ttn_url,
+        "ttn_application_id": "bench-app",
+        "ttn_api_key": "bench-key",
+        "ttn_webhook_id": "doover",
+        "uplink_tag_name": "ttn_uplink",
+        "downlink_request_tag": "ttn_downlink_request",
+        "downlink_status_tag": "ttn_downlink_status",
+        "debug_enabled": False,
+        "perf_metrics": False,
+        "downlink_concurrency": 8,
+        "ttn_requests_per_second": 1000,
+        "use_pending_index": False,
+        "schedule_downlinks": False,
+        "downlink_lead_time": 600,
+        "downlink_spread": 0,
+        "track_delivery": False,
+        "delivery_ttl": 86400,
+        "decode_payload": False,
+        "deduplicate_uplinks": True,
+        "uplink_history_length": 0,
+        "change_detection": False,
+        "change_max_silence": 3600,
+        "connection_ping_interval": 300,
+        "mqtt_ingest_seconds": 0,
+        "mqtt_url": None,
+        "mqtt_username": None,
+        "mqtt_batch_window_ms": 1000,
+        **overrides,
+    }
+    config = SimpleNamespace(**{name: _setting(v) for name, v in settings.items()})
+    config.device_mapping = SimpleNamespace(
+        elements=[
+            SimpleNamespace(
+                elements=[
+                    _setting(device_id),
+                    _setting(f"agent-{device_id}"),
+                    _setting(None),
+                    _setting("A"),
+                    _setting(None),
+                ]
+            )
+            for device_id in device_ids
+        ]
+    )
+    config.ttn_applications = SimpleNamespace(elements=[])
+    config.change_deadbands = SimpleNamespace(elements=[])
+    return config
+
+
+class BenchApp(TtnPlatformInterface):
+    """The processor application wired to the in-process stand-ins.
+
+    The pydoover runtime isn't involved: each benchmark invocation calls
+    ``setup``, the handler, and ``close`` the way ``run_app`` does.
+    """
+
+    def __init__(self, config: SimpleNamespace, store: FakeTagStore):
+        self.config = config
+        self.store = store
+
+    async def get_tag(self, key: str, default: Any = None) -> Any:
+        value = await self.store.get_tag(key)
+        return default if value is None else value
+
+    async def set_tag(self, key: str, value: Any):
+        await self.store.set_tag(key, value)
+
+    async def ping_connection(self, **kwargs):
+        await self.store.ping_connection(**kwargs)
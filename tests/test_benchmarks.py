@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from benchmarks import cold_start, memory, run
+
+
+@pytest.mark.asyncio
+async def test_benchmark_harness_runs(capsys):
+    results = await run.main(
+        [
+            "--fleet",
+            "5",
+            "--invocations",
+            "3",
+            "--ttn-429",
+            "0.2",
+            "--retry-after",
+            "0",
+        ]
+    )
+
+    uplink, sweep = results
+    assert uplink["scenario"] == "uplink"
+    assert uplink["writes_per_invocation"] > 0
+    assert sweep["scenario"] == "sweep"
+    assert sweep["ttn_requests_per_invocation"] >= 1
+    assert "inv/s" in capsys.readouterr().out
+
+
+def test_memory_child_reports_peak_rss(capsys):
+    memory.main(["--child", "--fleet", "20", "--batch", "8", "--gateways", "2"])
+
+    result = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert result["fleet"] == 20
+    assert result["peak_mb"] >= result["after_uplinks_mb"] >= result["baseline_mb"] > 0
+    assert result["tag_store_mb"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_cold_start_uplink_path_doesnt_load_http_stack(capsys):
+    results = await cold_start.main(["--runs", "1", "--fleet", "5", "--top", "3"])
+
+    assert results["import_ms"] > 0
+    assert results["first_sweep_ms"] > 0
+    # pydoover may import aiohttp itself; the uplink path must not add it
+    assert not results["aiohttp_loaded_by_uplink"]
+    assert len(results["slowest_imports"]) == 3
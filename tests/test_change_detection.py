@@ -0,0 +1,112 @@
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from ttn_platform_interface.change_detection import changed, fingerprint
+from ttn_platform_interface.uplinks import UplinkRecord
+
+from .fakes import BenchApp, FakeTagStore, bench_config
+
+NOW = datetime(2026, 1, 1, tzinfo=UTC)
+DEADBANDS = {"temperature": 0.5, "rssi": 5}
+
+
+def record(decoded=None, rssi=-80, snr=7.5, f_port=2, payload="AQID") -> UplinkRecord:
+    return UplinkRecord(
+        "meter-1", None, f_port, 1, payload, decoded, rssi, snr, NOW.isoformat()
+    )
+
+
+def written(rec: UplinkRecord, seconds_ago: float = 60) -> dict:
+    return fingerprint(
+        rec, DEADBANDS, (NOW - timedelta(seconds=seconds_ago)).isoformat()
+    )
+
+
+def check(previous: dict | None, rec: UplinkRecord, max_silence: float = 3600) -> bool:
+    current = fingerprint(rec, DEADBANDS, NOW.isoformat())
+    return changed(previous, current, DEADBANDS, NOW, max_silence)
+
+
+def test_deadbands_are_measured_from_the_last_write():
+    last = written(record({"temperature": 20.0, "valve": "open"}))
+
+    assert not check(last, record({"temperature": 20.4, "valve": "open"}))
+    assert check(last, record({"temperature": 20.6, "valve": "open"}))
+    # Other decoded fields must match exactly
+    assert check(last, record({"temperature": 20.0, "valve": "closed"}))
+    assert check(last, record({"temperature": 20.0}))
+    assert check(last, record({"temperature": 20.0, "valve": "open"}, f_port=3))
+
+
+def test_signal_fields_only_count_with_a_deadband():
+    last = written(record({"temperature": 20.0}, rssi=-80, snr=7.5))
+
+    assert not check(last, record({"temperature": 20.0}, rssi=-84, snr=-3))
+    assert check(last, record({"temperature": 20.0}, rssi=-90))
+
+
+def test_raw_payload_is_compared_when_nothing_is_decoded():
+    last = written(record(payload="AQID"))
+
+    assert not check(last, record(payload="AQID"))
+    assert check(last, record(payload="AQIE"))
+
+
+def test_max_silence_forces_a_write():
+    rec = record({"temperature": 20.0})
+
+    assert check(None, rec)
+    assert not check(written(rec, seconds_ago=3599), rec)
+    assert check(written(rec, seconds_ago=3600), rec)
+    assert not check(written(rec, seconds_ago=86400), rec, max_silence=0)
+
+
+def uplink(f_cnt: int, temperature: float) -> dict:
+    return {
+        "end_device_ids": {"device_id": "meter-1"},
+        "uplink_message": {
+            "f_port": 2,
+            "f_cnt": f_cnt,
+            "frm_payload": "AQID",
+            "decoded_payload": {"temperature": temperature},
+            "rx_metadata": [{"rssi": -80 - f_cnt, "snr": 7.5}],
+            "received_at": (NOW + timedelta(minutes=f_cnt)).isoformat(),
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_unchanged_uplinks_skip_the_uplink_tags():
+    config = bench_config(["meter-1"], "http://127.0.0.1:9", change_detection=True)
+    config.change_deadbands.elements = [
+        SimpleNamespace(
+            elements=[
+                SimpleNamespace(value="temperature"),
+                SimpleNamespace(value=0.5),
+            ]
+        )
+    ]
+    store = FakeTagStore()
+
+    async def send(f_cnt: int, temperature: float):
+        app = BenchApp(config, store)
+        await app.setup()
+        event = SimpleNamespace(
+            message=SimpleNamespace(data=uplink(f_cnt, temperature))
+        )
+        await app.on_message_create(event)
+        return app
+
+    await send(1, 20.0)
+    assert store.peek("ttn_uplink_meter-1")["f_cnt"] == 1
+
+    app = await send(2, 20.2)
+    assert store.peek("ttn_uplink_meter-1")["f_cnt"] == 1
+    assert store.peek("ttn_uplink")["f_cnt"] == 1
+    assert app.counters.totals["uplinks_unchanged"] >= 1
+
+    await send(3, 21.0)
+    assert store.peek("ttn_uplink_meter-1")["f_cnt"] == 3
+    assert store.peek("ttn_uplink")["f_cnt"] == 3
@@ -0,0 +1,61 @@
+from ttn_platform_interface.circuit_breaker import (
+    BASE_COOLDOWN_SECONDS,
+    CLOSED,
+    FAILURE_THRESHOLD,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+)
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker()
+    for _ in range(FAILURE_THRESHOLD - 1):
+        breaker.record_failure(now=1000)
+    assert breaker.allow(now=1000)
+
+    breaker.record_failure(now=1000)
+    assert breaker.state == OPEN
+    assert breaker.is_open(now=1000)
+    assert not breaker.allow(now=1000 + BASE_COOLDOWN_SECONDS - 1)
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker()
+    breaker.record_failure(now=1000)
+    breaker.record_success()
+    assert breaker.failures == 0
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker(state=OPEN, open_until=1000)
+    assert breaker.allow(now=1001)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow(now=1001)
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow(now=1001)
+
+
+def test_failed_probe_reopens_with_longer_cooldown():
+    breaker = CircuitBreaker(state=OPEN, open_until=1000)
+    assert breaker.allow(now=1001)
+    breaker.record_failure(now=1001)
+
+    assert breaker.state == OPEN
+    assert breaker.open_until == 1001 + 2 * BASE_COOLDOWN_SECONDS
+
+
+def test_state_round_trips_through_tag_value():
+    breaker = CircuitBreaker()
+    assert not breaker.changed
+    for _ in range(FAILURE_THRESHOLD):
+        breaker.record_failure(now=1000)
+    assert breaker.changed
+
+    restored = CircuitBreaker.from_dict(breaker.to_dict())
+    assert restored.is_open(now=1000)
+    assert not restored.changed
+    assert CircuitBreaker.from_dict(None).state == CLOSED
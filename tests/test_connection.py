@@ -0,0 +1,27 @@
+from datetime import UTC, datetime, timedelta
+
+from ttn_platform_interface.connection import MAX_PING_INTERVAL_SECONDS, PingCoalescer
+
+NOW = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+def test_pings_are_coalesced_within_the_interval():
+    pings = PingCoalescer()
+    assert pings.due("online", NOW, 300)
+    pings.record("online", NOW)
+
+    assert not pings.due("online", NOW + timedelta(seconds=299), 300)
+    assert pings.due("online", NOW + timedelta(seconds=300), 300)
+
+
+def test_status_change_pings_immediately():
+    pings = PingCoalescer()
+    pings.record("online", NOW)
+    assert pings.due("offline", NOW + timedelta(seconds=1), 300)
+
+
+def test_interval_is_capped_below_the_offline_timeout():
+    pings = PingCoalescer()
+    pings.record("online", NOW)
+    later = NOW + timedelta(seconds=MAX_PING_INTERVAL_SECONDS)
+    assert pings.due("online", later, 24 * 3600)
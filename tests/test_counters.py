@@ -0,0 +1,126 @@
+import time
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from ttn_platform_interface.counters import StatsShard, aggregate_stats
+from ttn_platform_interface.lease import Leases
+from ttn_platform_interface.tag_buffer import TagWriteBuffer
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from .fakes import BenchApp, FakeTagStore, bench_config
+
+NOW = 1_800_000_000.0
+
+
+@pytest.mark.asyncio
+async def test_shards_aggregate_with_legacy_totals_and_rates():
+    store = FakeTagStore(stats={"uplinks_processed": 100, "errors": 2})
+
+    # Two containers, each writing only its own shard
+    for shard_id, uplinks in (("a", 30), ("b", 15)):
+        shard = StatsShard(shard_id)
+        shard.add("uplinks_processed", uplinks, now=NOW - 120)
+        buffer = TagWriteBuffer(store)
+        shard.stage(buffer, now=NOW - 120)
+        await buffer.flush()
+
+    assert set(store.tags["stats_shards"]) == {"a", "b"}
+
+    stats = await _aggregate(store)
+    assert stats["uplinks_processed"] == 145
+    assert stats["errors"] == 2
+    assert stats["uplinks_processed_per_minute"] == 3.0
+    assert stats["shards"] == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_shards_are_retired():
+    store = FakeTagStore()
+    shard = StatsShard("old")
+    shard.add("errors", 4, now=NOW - 3 * 24 * 3600)
+    buffer = TagWriteBuffer(store)
+    shard.stage(buffer, now=NOW - 3 * 24 * 3600)
+    await buffer.flush()
+
+    stats = await _aggregate(store)
+    assert stats["errors"] == 4
+    assert stats["shards"] == 0
+    assert store.tags["stats_retired"] == {"errors": 4}
+    assert store.tags["stats_shards"] == {}
+    assert store.tags["stats_shard_old"] is None
+
+
+async def _aggregate(store):
+    buffer = TagWriteBuffer(store)
+    stats = await aggregate_stats(buffer, now=NOW)
+    await buffer.flush()
+    return stats
+
+
+@pytest.mark.asyncio
+async def test_deferred_counts_ride_along_with_the_next_write():
+    store = FakeTagStore()
+    shard = StatsShard("a")
+
+    shard.add("uplinks_duplicate", 3, now=NOW, defer=True)
+    buffer = TagWriteBuffer(store)
+    shard.stage(buffer, now=NOW)
+    await buffer.flush()
+    assert store.writes == 0
+
+    shard.add("uplinks_processed", now=NOW)
+    shard.stage(buffer, now=NOW)
+    await buffer.flush()
+    assert store.tags["stats_shard_a"]["totals"] == {
+        "uplinks_duplicate": 3,
+        "uplinks_processed": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_fresh_stats_are_left_alone():
+    updated_at = datetime.fromtimestamp(NOW - 60, UTC).isoformat()
+    store = FakeTagStore(stats={"errors": 1, "updated_at": updated_at})
+    buffer = TagWriteBuffer(store)
+
+    assert await aggregate_stats(buffer, now=NOW, max_age=300) is None
+    assert await aggregate_stats(buffer, now=NOW + 300, max_age=300) is not None
+
+
+STALE = "2026-01-01T00:00:00+00:00"
+UPLINK = {
+    "end_device_ids": {"device_id": "stats-1"},
+    "received_at": "2026-01-01T00:00:00Z",
+    "uplink_message": {"f_port": 1, "f_cnt": 1, "frm_payload": "AQ=="},
+}
+
+
+@pytest.mark.asyncio
+async def test_uplinks_refresh_stale_stats(monkeypatch):
+    monkeypatch.setattr(WARM_STATE, "leases", Leases())
+    # Last aggregated by a schedule that has since been removed
+    store = FakeTagStore(stats={"uplinks_processed": 7, "updated_at": STALE})
+    app = BenchApp(bench_config(["stats-1"], "http://127.0.0.1:9"), store)
+    await app.setup()
+    await app.on_message_create(SimpleNamespace(message=SimpleNamespace(data=UPLINK)))
+
+    stats = store.peek("stats")
+    assert stats["updated_at"] > STALE
+    assert stats["uplinks_processed"] >= 8
+    assert store.peek("stats_lease")["holder"] == app.counters.shard_id
+
+
+@pytest.mark.asyncio
+async def test_only_the_lease_holder_refreshes_stale_stats(monkeypatch):
+    monkeypatch.setattr(WARM_STATE, "leases", Leases())
+    store = FakeTagStore(
+        stats={"uplinks_processed": 7, "updated_at": STALE},
+        stats_lease={"holder": "other", "until": time.time() + 60},
+    )
+    app = BenchApp(bench_config(["stats-1"], "http://127.0.0.1:9"), store)
+    await app.setup()
+    await app.on_message_create(SimpleNamespace(message=SimpleNamespace(data=UPLINK)))
+
+    assert store.peek("stats")["updated_at"] == STALE
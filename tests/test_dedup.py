@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+
+from ttn_platform_interface.dedup import (
+    RECENT_FRAMES,
+    SeenUplinks,
+    drop_recent,
+    drop_seen,
+    frame_digest,
+    recent_frames,
+    remember,
+)
+from ttn_platform_interface.device_state import get_device_states, record_devices
+from ttn_platform_interface.tag_buffer import TagWriteBuffer
+from ttn_platform_interface.uplinks import UplinkRecord
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from .fakes import BenchApp, FakeTagStore, bench_config
+
+
+def record(f_cnt, received_at="2026-01-01T00:00:00Z", device_id="dev-1"):
+    return UplinkRecord(device_id, None, 1, f_cnt, None, None, None, None, received_at)
+
+
+def test_drop_seen_catches_warm_and_in_batch_duplicates():
+    seen = SeenUplinks()
+    remember(seen, [record(1)])
+
+    kept, duplicates = drop_seen([record(1), record(2), record(2)], seen)
+    assert [r.f_cnt for r in kept] == [2]
+    assert duplicates == 2
+
+
+def test_frame_counter_reset_is_not_a_duplicate():
+    seen = SeenUplinks()
+    remember(seen, [record(1)])
+
+    kept, duplicates = drop_seen([record(1, "2026-01-02T00:00:00Z")], seen)
+    assert len(kept) == 1
+    assert duplicates == 0
+
+
+def test_seen_uplinks_is_bounded():
+    seen = SeenUplinks(capacity=2)
+    remember(seen, [record(1), record(2), record(3)])
+    assert len(seen) == 2
+    assert ("dev-1", 1, "2026-01-01T00:00:00Z") not in seen
+
+
+def test_recent_frames_are_bounded():
+    frames = recent_frames(None, [record(i) for i in range(RECENT_FRAMES + 4)])
+    assert len(frames) == RECENT_FRAMES
+    assert frames[-1] == frame_digest(record(RECENT_FRAMES + 3))
+    # Compact: a short digest per frame, and full frames from older entries
+    # are dropped
+    assert all(len(frame) == 8 for frame in frames)
+    assert recent_frames([[1, "2026-01-01T00:00:00Z"]], [record(2)]) == [
+        frame_digest(record(2))
+    ]
+
+
+@pytest.mark.asyncio
+async def test_drop_recent_uses_stored_device_state():
+    store = FakeTagStore()
+    buffer = TagWriteBuffer(store)
+    record_devices(
+        buffer, {"dev-1": {"recent_frames": recent_frames(None, [record(7)])}}
+    )
+    await buffer.flush()
+
+    states = await get_device_states(TagWriteBuffer(store), ["dev-1", "dev-2"])
+    kept, dropped = drop_recent(
+        [record(7), record(8), record(7, device_id="dev-2")], states
+    )
+    assert [(r.device_id, r.f_cnt) for r in kept] == [("dev-1", 8), ("dev-2", 7)]
+    assert [r.f_cnt for r in dropped] == [7]
+
+
+class FlakyTagStore(FakeTagStore):
+    """Fails every write while ``down`` is set."""
+
+    down = True
+
+    async def set_tag(self, key, value):
+        if self.down:
+            raise ConnectionError("tag store unavailable")
+        await super().set_tag(key, value)
+
+
+@pytest.mark.asyncio
+async def test_uplinks_are_only_remembered_once_written(monkeypatch):
+    monkeypatch.setattr(WARM_STATE, "seen_uplinks", SeenUplinks())
+    store = FlakyTagStore()
+    config = bench_config(["flaky-1"], "http://127.0.0.1:9")
+    uplink = {
+        "end_device_ids": {"device_id": "flaky-1"},
+        "received_at": "2026-01-01T00:00:00Z",
+        "uplink_message": {"f_port": 1, "f_cnt": 4, "frm_payload": "AQ=="},
+    }
+
+    async def deliver():
+        app = BenchApp(config, store)
+        await app.setup()
+        event = SimpleNamespace(message=SimpleNamespace(data=uplink))
+        await app.on_message_create(event)
+
+    await deliver()
+    assert store.peek("ttn_uplink_flaky-1") is None
+
+    # TTN retries the webhook once the tag store is back
+    store.down = False
+    await deliver()
+    assert store.peek("ttn_uplink_flaky-1")["f_cnt"] == 4
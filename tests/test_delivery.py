@@ -0,0 +1,245 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ttn_platform_interface import delivery
+from ttn_platform_interface.delivery import DeliveryIndex
+from ttn_platform_interface.device_state import BUCKET_COUNT, bucket_key
+from ttn_platform_interface.tag_buffer import TagWriteBuffer
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from .fakes import BenchApp, FakeTagStore, FakeTtnServer, bench_config
+
+OURS = delivery.CORRELATION_PREFIX + "00aa"
+
+
+def tracking_key(device_id: str) -> str:
+    return bucket_key(device_id, delivery.TRACKING_PREFIX)
+
+
+def event(
+    kind: str, correlation_ids: list[str], device_id: str = "valve-1", **body
+) -> dict:
+    message = {
+        "end_device_ids": {"device_id": device_id},
+        "correlation_ids": ["as:up:01H", *correlation_ids],
+        "received_at": "2026-01-01T00:00:00Z",
+    }
+    if kind == "downlink_failed":
+        message[kind] = {
+            "downlink": {"f_port": 1, "correlation_ids": correlation_ids},
+            "error": {"name": "no_rx_window", "message_format": "no RX window"},
+        }
+    else:
+        message[kind] = {"f_port": 1, "correlation_ids": correlation_ids, **body}
+    return message
+
+
+def test_parse_event():
+    sent = delivery.parse_event(event("downlink_sent", [OURS]))
+    assert sent == delivery.DeliveryEvent(
+        "valve-1", "sent", [OURS], "2026-01-01T00:00:00Z"
+    )
+    failed = delivery.parse_event(event("downlink_failed", [OURS]))
+    assert (failed.status, failed.error) == ("failed", "no RX window")
+
+    # Downlinks queued by something else aren't ours to track
+    assert delivery.parse_event(event("downlink_ack", ["as:downlink:01H"])) is None
+    assert delivery.is_event(event("downlink_ack", []))
+    assert delivery.is_event({"downlink_queued": {}})
+    assert not delivery.is_event({"uplink_message": {}})
+
+
+def test_deliveries_keep_the_latest_downlinks():
+    old = {"status": "sent", "correlation_ids": [OURS]}
+    assert delivery.deliveries(old) == {OURS: "sent"}
+
+    ids = [f"{delivery.CORRELATION_PREFIX}{i:04x}" for i in range(20)]
+    tracked = delivery.track(old, ids)
+    assert list(tracked) == ids[-delivery.MAX_DELIVERIES :]
+    assert set(tracked.values()) == {"queued"}
+
+
+def test_confirmed_downlinks_wait_for_the_ack():
+    assert delivery.awaiting("queued", confirmed=False)
+    assert delivery.awaiting("sent", confirmed=True)
+    assert not delivery.awaiting("sent", confirmed=False)
+    assert not delivery.awaiting("acked", confirmed=True)
+
+
+@pytest.mark.asyncio
+async def test_entries_are_sharded_by_device():
+    index = DeliveryIndex()
+    index.add(OURS, "valve-1", confirmed=True, now=100)
+    index.add(delivery.CORRELATION_PREFIX + "00bb", "valve-1", confirmed=False, now=100)
+    index.add(delivery.CORRELATION_PREFIX + "00cc", "valve-2", confirmed=False, now=100)
+    store = FakeTagStore()
+    buffer = TagWriteBuffer(store)
+
+    index.record(buffer)
+    await buffer.flush()
+
+    assert store.peek(tracking_key("valve-1")) == {
+        "00aa": ["valve-1", 100, 1],
+        "00bb": ["valve-1", 100, 0],
+    }
+    assert store.peek(tracking_key("valve-2")) == {"00cc": ["valve-2", 100, 0]}
+    assert store.writes == 2
+
+
+def test_status_only_moves_forward():
+    assert delivery.advances("queued", "sent")
+    assert delivery.advances("sent", "acked")
+    assert not delivery.advances("acked", "sent")
+    assert not delivery.advances("acked", "expired")
+
+
+@pytest.mark.asyncio
+async def test_expire_drops_stale_and_excess_entries(monkeypatch):
+    monkeypatch.setattr(delivery, "MAX_TRACKED", 2 * BUCKET_COUNT)
+    key = tracking_key("dev")
+    other = tracking_key("valve-1")
+    store = FakeTagStore()
+    store.put(
+        key,
+        {
+            str(n): ["dev", queued_at, 0]
+            for n, queued_at in enumerate((0, 500, 600, 700))
+        },
+    )
+    store.put(other, {"9": ["valve-1", 900, 1]})
+    buffer = TagWriteBuffer(store)
+
+    expired = await delivery.expire(buffer, ttl=1000, now=1000)
+
+    assert expired == [
+        (f"{delivery.CORRELATION_PREFIX}0", "dev", False),
+        (f"{delivery.CORRELATION_PREFIX}1", "dev", False),
+    ]
+    await buffer.flush()
+    assert sorted(store.peek(key)) == ["2", "3"]
+    # Buckets with nothing to drop aren't rewritten
+    assert store.writes == 1
+
+
+@pytest.mark.asyncio
+async def test_status_moves_from_queued_to_acked():
+    server = FakeTtnServer()
+    await server.start()
+    config = bench_config(["valve-1"], server.url, track_delivery=True)
+    store = FakeTagStore()
+    store.put(
+        "ttn_downlink_request_valve-1", {"frm_payload": "AQID", "confirmed": True}
+    )
+    # Left over from an earlier sweep and never reported on
+    stale = delivery.CORRELATION_PREFIX + "old"
+    store.put(
+        tracking_key("valve-2"), {"old": ["valve-2", int(time.time()) - 90000, 0]}
+    )
+    store.put(
+        "ttn_downlink_status_valve-2", {"status": "queued", "correlation_ids": [stale]}
+    )
+
+    async def invoke(handler: str, event=None):
+        app = BenchApp(config, store)
+        await app.setup()
+        try:
+            await getattr(app, handler)(event)
+        finally:
+            await app.close()
+
+    try:
+        await invoke("on_schedule")
+    finally:
+        await WARM_STATE.close()
+        await server.stop()
+
+    status = store.peek("ttn_downlink_status_valve-1")
+    assert status["status"] == "queued"
+    assert status["sent_at"] is None
+    (correlation_id,) = status["correlation_ids"]
+    tracked = store.peek(tracking_key("valve-1"))
+    assert list(tracked.values()) == [["valve-1", pytest.approx(time.time(), abs=5), 1]]
+    assert store.peek(tracking_key("valve-2")) == {}
+    assert store.peek("ttn_downlink_status_valve-2")["status"] == "expired"
+
+    def channel_message(data):
+        return SimpleNamespace(message=SimpleNamespace(data=data))
+
+    await invoke(
+        "on_message_create", channel_message(event("downlink_sent", [correlation_id]))
+    )
+    assert store.peek("ttn_downlink_status_valve-1")["status"] == "sent"
+
+    await invoke(
+        "on_message_create",
+        channel_message(
+            [
+                event("downlink_ack", [correlation_id]),
+                # A late retry of the sent event doesn't undo the ack
+                event("downlink_sent", [correlation_id]),
+            ]
+        ),
+    )
+    status = store.peek("ttn_downlink_status_valve-1")
+    assert status["status"] == "acked"
+    assert status["acked_at"] == "2026-01-01T00:00:00Z"
+    # Events only write the device's status tag, never the tracking buckets
+    assert store.peek(tracking_key("valve-1")) == tracked
+    # Downlink events are never written as uplinks
+    assert store.peek("ttn_uplink_valve-1") is None
+
+
+@pytest.mark.asyncio
+async def test_events_for_an_earlier_push_are_still_tracked():
+    server = FakeTtnServer()
+    await server.start()
+    config = bench_config(["valve-1"], server.url, track_delivery=True)
+    store = FakeTagStore()
+    status_key = "ttn_downlink_status_valve-1"
+
+    async def invoke(handler: str, event=None, **settings):
+        for name, value in settings.items():
+            getattr(config, name).value = value
+        app = BenchApp(config, store)
+        await app.setup()
+        try:
+            await getattr(app, handler)(event)
+        finally:
+            await app.close()
+
+    def channel_message(data):
+        return SimpleNamespace(message=SimpleNamespace(data=data))
+
+    # Two pushes before TTN reports on the first
+    pushed = []
+    try:
+        for payload in ("AQ==", "Ag=="):
+            store.put(
+                "ttn_downlink_request_valve-1",
+                {"frm_payload": payload, "confirmed": True},
+            )
+            await invoke("on_schedule")
+            pushed.extend(store.peek(status_key)["correlation_ids"])
+        first, second = pushed
+
+        await invoke(
+            "on_message_create",
+            channel_message(
+                [event("downlink_sent", [first]), event("downlink_ack", [second])]
+            ),
+        )
+        status = store.peek(status_key)
+        assert status["deliveries"] == {first: "sent", second: "acked"}
+        assert status["status"] == "acked"
+
+        # The first push never gets its ack and expires on its own
+        await invoke("on_schedule", delivery_ttl=1e-6)
+    finally:
+        await WARM_STATE.close()
+        await server.stop()
+
+    status = store.peek(status_key)
+    assert status["deliveries"] == {first: "expired", second: "acked"}
+    assert status["status"] == "acked"
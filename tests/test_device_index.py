@@ -0,0 +1,69 @@
+from ttn_platform_interface import device_index
+from ttn_platform_interface.device_index import (
+    DeviceIndex,
+    MappingEntry,
+    get_device_index,
+)
+
+from .fakes import bench_config
+
+
+def test_resolve_order():
+    index = DeviceIndex(
+        [
+            MappingEntry("eui-0004a30b001c0530", "exact-key", "0004A30B001C0530"),
+            MappingEntry("site-a-*", "site-a-key"),
+            MappingEntry("site-a-pumps-*", "pumps-key"),
+            MappingEntry("*-meter", "meter-key"),
+        ]
+    )
+
+    assert index.resolve("eui-0004a30b001c0530") == "exact-key"
+    assert index.resolve("renamed-device", "0004a30b001c0530") == "exact-key"
+    assert index.resolve("site-a-pumps-3") == "pumps-key"
+    assert index.resolve("site-a-tank-1") == "site-a-key"
+    assert index.resolve("water-meter") == "meter-key"
+    assert index.resolve("unknown") is None
+    assert index.by_device_id == {"eui-0004a30b001c0530": "exact-key"}
+
+
+def test_index_is_cached_per_config(monkeypatch):
+    index = get_device_index(bench_config(["dev-1"], "").device_mapping)
+    # Same values, fresh config objects: a cache hit, no entries built
+    monkeypatch.setattr(device_index, "entries_from_config", None)
+    assert get_device_index(bench_config(["dev-1"], "").device_mapping) is index
+    monkeypatch.undo()
+
+    other = get_device_index(bench_config(["dev-2"], "").device_mapping)
+    assert other is not index
+    assert other.resolve("dev-2") == "agent-dev-2"
+
+
+def test_device_class_follows_the_matching_entry():
+    index = DeviceIndex(
+        [
+            MappingEntry("valve-1", "valve-key", device_class="C"),
+            MappingEntry("site-a-*", "site-a-key", device_class="B"),
+            MappingEntry("sensor-1", "sensor-key"),
+        ]
+    )
+
+    assert index.device_class("valve-1") == "C"
+    assert index.device_class("site-a-tank-1") == "B"
+    assert index.device_class("sensor-1") == "A"
+    assert index.device_class("unknown") == "A"
+
+
+def test_application_follows_the_matching_entry():
+    index = DeviceIndex(
+        [
+            MappingEntry("tank-1", "tank-key", application_id="us-app"),
+            MappingEntry("site-a-*", "site-a-key", application_id="au-app"),
+            MappingEntry("sensor-1", "sensor-key"),
+        ]
+    )
+
+    assert index.application_id("tank-1") == "us-app"
+    assert index.application_id("site-a-pump") == "au-app"
+    assert index.application_id("sensor-1") is None
+    assert index.application_id("unknown") is None
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from ttn_platform_interface.device_state import (
+    bucket_key,
+    get_device_state,
+    get_device_states,
+    record_devices,
+    refresh_summary,
+    state_key,
+)
+from ttn_platform_interface.lease import Leases
+from ttn_platform_interface.tag_buffer import TagWriteBuffer
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from .fakes import BenchApp, FakeTagStore, bench_config
+
+NOW = 1_800_000_000.0
+
+
+@pytest.mark.asyncio
+async def test_uplink_touches_only_its_device():
+    store = FakeTagStore()
+    buffer = TagWriteBuffer(store)
+    record_devices(buffer, {"dev-1": {"last_seen": "t1"}}, now=NOW)
+    await buffer.flush()
+
+    # Registered when first seen
+    assert sorted(store.tags) == sorted([state_key("dev-1"), bucket_key("dev-1")])
+    state = await get_device_state(TagWriteBuffer(store), "dev-1")
+    assert state["last_seen"] == "t1"
+
+    buffer = TagWriteBuffer(store)
+    reads, writes = store.reads, store.writes
+    record_devices(buffer, {"dev-1": {"last_seen": "t2"}}, {"dev-1": state}, now=NOW)
+    await buffer.flush()
+    assert (store.reads, store.writes) == (reads, writes + 1)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_uplinks_keep_each_others_state():
+    store = FakeTagStore(latency=0.01)
+    # Known devices, so only their state tags are written
+    registered_at = datetime.fromtimestamp(NOW, UTC).isoformat()
+    states = {f"dev-{i}": {"registered_at": registered_at} for i in range(20)}
+
+    async def uplink(device_id):
+        buffer = TagWriteBuffer(store)
+        record_devices(buffer, {device_id: {"last_seen": "t1"}}, states, now=NOW)
+        await buffer.flush()
+
+    writes = store.writes
+    await asyncio.gather(*(uplink(device_id) for device_id in states))
+    assert store.writes == writes + 20
+
+    buffer = TagWriteBuffer(store)
+    assert len(await get_device_states(buffer, states)) == 20
+
+
+@pytest.mark.asyncio
+async def test_summary_is_rebuilt_lazily():
+    store = FakeTagStore()
+    buffer = TagWriteBuffer(store)
+    record_devices(buffer, {f"dev-{i}": {"last_seen": "t1"} for i in range(20)})
+    await buffer.flush()
+
+    buffer = TagWriteBuffer(store)
+    assert await refresh_summary(buffer, now=NOW)
+    await buffer.flush()
+    assert len(store.tags["device_mapping_state"]) == 20
+
+    buffer = TagWriteBuffer(store)
+    assert not await refresh_summary(buffer, now=NOW + 60)
+    assert await refresh_summary(buffer, now=NOW + 60, force=True)
+
+
+@pytest.mark.asyncio
+async def test_uplinks_rebuild_a_stale_summary():
+    store = FakeTagStore(device_mapping_state_updated_at="2026-01-01T00:00:00+00:00")
+    uplink = {
+        "end_device_ids": {"device_id": "summary-1"},
+        "received_at": "2026-01-01T00:00:00Z",
+        "uplink_message": {"f_port": 1, "f_cnt": 1, "frm_payload": "AQ=="},
+    }
+    app = BenchApp(bench_config(["summary-1"], "http://127.0.0.1:9"), store)
+    await app.setup()
+    await app.on_message_create(SimpleNamespace(message=SimpleNamespace(data=uplink)))
+
+    summary = store.peek("device_mapping_state")
+    assert summary["summary-1"]["doover_app_key"] == "agent-summary-1"
+
+
+@pytest.mark.asyncio
+async def test_only_the_lease_holder_rebuilds_a_stale_summary(monkeypatch):
+    monkeypatch.setattr(WARM_STATE, "leases", Leases())
+    store = FakeTagStore(
+        device_mapping_state_updated_at="2026-01-01T00:00:00+00:00",
+        device_mapping_state_lease={"holder": "other", "until": time.time() + 60},
+    )
+    uplink = {
+        "end_device_ids": {"device_id": "summary-1"},
+        "received_at": "2026-01-01T00:00:00Z",
+        "uplink_message": {"f_port": 1, "f_cnt": 1, "frm_payload": "AQ=="},
+    }
+    app = BenchApp(bench_config(["summary-1"], "http://127.0.0.1:9"), store)
+    await app.setup()
+    await app.on_message_create(SimpleNamespace(message=SimpleNamespace(data=uplink)))
+
+    assert store.peek("device_mapping_state") is None
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from ttn_platform_interface import downlink_queue
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from .fakes import BenchApp, FakeTagStore, FakeTtnServer, bench_config
+
+
+def test_prepare_dedupes_and_orders_by_priority():
+    items = downlink_queue.normalise(
+        [
+            {"id": "a", "frm_payload": "AQ=="},
+            {"id": "a", "frm_payload": "AQ=="},
+            {"frm_payload": "Ag==", "priority": "HIGH"},
+            {"frm_payload": "Ag==", "priority": "HIGH"},
+            {"frm_payload": "Aw==", "priority": "LOW"},
+            {"frm_payload": "BA=="},
+            {"f_port": 2},
+        ]
+    )
+    queue, invalid = downlink_queue.prepare(items)
+
+    assert [i["frm_payload"] for i in queue] == ["Ag==", "AQ==", "BA==", "Aw=="]
+    assert invalid == [{"f_port": 2}]
+
+
+def test_legacy_single_request_is_a_queue_of_one():
+    request = {"f_port": 3, "decoded_payload": {"led": "on"}, "confirmed": True}
+    queue, _ = downlink_queue.prepare(downlink_queue.normalise(request))
+    assert [downlink_queue.to_ttn_downlink(i) for i in queue] == [
+        {
+            "f_port": 3,
+            "priority": "NORMAL",
+            "confirmed": True,
+            "decoded_payload": {"led": "on"},
+        }
+    ]
+
+
+def test_remaining_after_keeps_items_queued_during_send():
+    sent = [{"id": 1, "frm_payload": "AQ=="}]
+    current = sent + [{"id": 2, "frm_payload": "Ag=="}]
+    assert downlink_queue.remaining_after(current, sent) == [
+        {"id": 2, "frm_payload": "Ag=="}
+    ]
+    assert downlink_queue.remaining_after(sent, sent) is None
+
+
+def test_chunks():
+    queue = [{"frm_payload": "AQ==", "id": i} for i in range(35)]
+    assert [len(c) for c in downlink_queue.chunks(queue)] == [16, 16, 3]
+
+
+@pytest.mark.asyncio
+async def test_sweep_pushes_the_queue_at_once_and_trims_the_tag():
+    server = FakeTtnServer(latency=0.05)
+    await server.start()
+    config = bench_config(["valve-1"], server.url)
+    request_key = "ttn_downlink_request_valve-1"
+    store = FakeTagStore()
+    store.put(
+        request_key,
+        [
+            {"id": "open", "frm_payload": "AQ=="},
+            {"id": "open", "frm_payload": "AQ=="},
+            {"id": "close", "frm_payload": "Ag==", "priority": "HIGH"},
+            {"id": "report", "frm_payload": "Aw==", "priority": "LOW"},
+        ],
+    )
+
+    async def queue_during_push():
+        # Another app queues a request while the push is in flight
+        await asyncio.sleep(0.02)
+        store.put(
+            request_key,
+            downlink_queue.enqueue(
+                store.peek(request_key), {"id": "later", "frm_payload": "BA=="}
+            ),
+        )
+
+    app = BenchApp(config, store)
+    await app.setup()
+    try:
+        await asyncio.gather(app.on_schedule(None), queue_during_push())
+    finally:
+        await app.close()
+        await WARM_STATE.close()
+        await server.stop()
+
+    assert server.requests == 1
+    assert [d["frm_payload"] for d in server.pushes[0]] == ["Ag==", "AQ==", "Aw=="]
+    assert store.peek(request_key) == [{"id": "later", "frm_payload": "BA=="}]
+    status = store.peek("ttn_downlink_status_valve-1")
+    assert (status["downlinks"], status["pending"]) == (3, 1)
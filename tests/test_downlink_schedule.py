@@ -0,0 +1,75 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from ttn_platform_interface import downlink_schedule
+from ttn_platform_interface.downlink_schedule import (
+    Pacer,
+    next_uplink_at,
+    plan,
+    update_interval,
+)
+
+NOW = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+def state(seconds_ago: float, interval: float | None) -> dict:
+    return {
+        "last_seen": (NOW - timedelta(seconds=seconds_ago)).isoformat(),
+        "uplink_interval": interval,
+    }
+
+
+def test_update_interval_averages_gaps():
+    assert update_interval(None, NOW) is None
+    assert update_interval(state(600, None), NOW) == 600
+
+    # New gaps pull the average towards them
+    assert update_interval(state(1000, 600), NOW) == 720
+
+    # Bursts and outages don't count towards the interval
+    assert update_interval(state(2, 600), NOW) == 600
+    assert update_interval(state(3 * 86400, 600), NOW) == 600
+
+
+def test_next_uplink_at():
+    assert next_uplink_at(None) is None
+    assert next_uplink_at(state(100, None)) is None
+    assert next_uplink_at(state(100, 600)) == NOW.timestamp() + 500
+
+
+def test_plan_holds_class_a_devices_until_their_window():
+    classes = {"valve": "C"}
+    states = {
+        "soon": state(550, 600),  # next uplink in 50 s
+        "overdue": state(900, 600),  # missed its window by 300 s
+        "later": state(100, 3600),  # next uplink in 3500 s
+        "valve": state(100, 3600),  # Class C: always listening
+    }
+
+    result = plan(
+        ["soon", "later", "unknown", "valve", "overdue"],
+        lambda device_id: classes.get(device_id, "A"),
+        states,
+        lead=600,
+        now=NOW.timestamp(),
+    )
+
+    assert result.due == ["overdue", "unknown", "valve", "soon"]
+    assert result.deferred == ["later"]
+
+
+@pytest.mark.asyncio
+async def test_pacer_spreads_sends(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(round(delay))
+
+    monkeypatch.setattr(downlink_schedule.asyncio, "sleep", fake_sleep)
+    pacer = Pacer(4, 40)
+    for position in range(4):
+        await pacer.wait(position)
+
+    assert sleeps == [10, 20, 30]
+    assert Pacer(4, 10_000).step == downlink_schedule.MAX_SPREAD_SECONDS / 4
@@ -0,0 +1,26 @@
+import pytest
+
+from ttn_platform_interface.lease import Leases
+
+from .fakes import FakeTagStore
+
+NOW = 1_800_000_000.0
+
+
+@pytest.mark.asyncio
+async def test_one_holder_at_a_time():
+    store = FakeTagStore()
+    assert await Leases().claim(store, "summary", "a", now=NOW)
+    # Renewing your own lease is fine
+    assert await Leases().claim(store, "summary", "a", now=NOW + 10)
+
+    other = Leases()
+    assert not await other.claim(store, "summary", "b", now=NOW + 20)
+    assert store.peek("summary_lease")["holder"] == "a"
+    # Remembered until it runs out, without reading the tag again
+    reads = store.reads
+    assert not await other.claim(store, "summary", "b", now=NOW + 30)
+    assert store.reads == reads
+
+    assert await other.claim(store, "summary", "b", now=NOW + 200)
+    assert store.peek("summary_lease")["holder"] == "b"
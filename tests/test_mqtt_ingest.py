@@ -0,0 +1,343 @@
+import asyncio
+import json
+import struct
+import time
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+
+from ttn_platform_interface import mqtt, mqtt_ingest, uplinks
+from ttn_platform_interface.dedup import SeenUplinks
+from ttn_platform_interface.mqtt import MqttClient, MqttError
+from ttn_platform_interface.mqtt_ingest import MqttIngest, uplink_topic
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from .fakes import BenchApp, FakeMqttBroker, FakeTagStore, FakeTtnServer, bench_config
+
+TOPIC = uplink_topic("app@ttn")
+
+
+def uplink(device_id: str, f_cnt: int) -> dict:
+    return {
+        "end_device_ids": {"device_id": device_id},
+        "received_at": f"2026-01-01T00:00:{f_cnt:02d}Z",
+        "uplink_message": {
+            "f_port": 2,
+            "f_cnt": f_cnt,
+            "frm_payload": "AQID",
+            "rx_metadata": [{"rssi": -80, "snr": 7.5}],
+        },
+    }
+
+
+@pytest_asyncio.fixture
+async def broker():
+    broker = FakeMqttBroker("app@ttn", "key")
+    await broker.start()
+    yield broker
+    await broker.stop()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(mqtt_ingest, "backoff_delay", lambda attempt: 0.01)
+
+
+def client_for(broker, password="key") -> MqttClient:
+    host, port, tls = mqtt.parse_url(broker.url)
+    return MqttClient(host, port, "app@ttn", password, tls=tls)
+
+
+async def subscribed(broker, count=1):
+    while sum(1 for filters in broker._subscribers.values() if filters) < count:
+        await asyncio.sleep(0.01)
+
+
+def test_parse_url():
+    assert mqtt.parse_url("https://eu1.cloud.thethings.network") == (
+        "eu1.cloud.thethings.network",
+        8883,
+        True,
+    )
+    assert mqtt.parse_url("https://eu1.cloud.thethings.network:443")[1] == 8883
+    assert mqtt.parse_url("mqtt://localhost:1884") == ("localhost", 1884, False)
+
+
+@pytest.mark.asyncio
+async def test_client_receives_and_acknowledges(broker):
+    client = client_for(broker)
+    await client.connect()
+    await client.subscribe(TOPIC)
+    await subscribed(broker)
+
+    await broker.publish("v3/app@ttn/devices/dev-1/up", b'{"n": 1}')
+    await broker.publish("v3/app@ttn/devices/dev-1/join", b"{}")
+    message = await anext(client.messages())
+    assert message.topic == "v3/app@ttn/devices/dev-1/up"
+    assert message.payload == b'{"n": 1}'
+
+    await client.ack(message.packet_id)
+    await client.close()
+    await asyncio.sleep(0.05)
+    assert broker.acked == 1
+
+
+@pytest.mark.asyncio
+async def test_client_rejects_bad_credentials(broker):
+    with pytest.raises(MqttError, match="bad username or password"):
+        await client_for(broker, password="wrong").connect()
+
+
+@pytest.mark.asyncio
+async def test_ingest_batches_and_reconnects(broker):
+    batches = []
+
+    async def handle_batch(batch):
+        batches.append([json.loads(payload)["n"] for payload in batch])
+
+    async def publish():
+        await subscribed(broker)
+        for n in range(5):
+            await broker.publish(
+                "v3/app@ttn/devices/dev-1/up", json.dumps({"n": n}).encode()
+            )
+        await asyncio.sleep(0.3)
+        # Broker restart: the ingest reconnects and carries on
+        broker.drop_connections()
+        await subscribed(broker)
+        for n in range(5, 8):
+            await broker.publish(
+                "v3/app@ttn/devices/dev-1/up", json.dumps({"n": n}).encode()
+            )
+
+    ingest = MqttIngest(
+        lambda: client_for(broker), TOPIC, handle_batch, window=0.1, max_batch=4
+    )
+    publisher = asyncio.create_task(publish())
+    stats = await ingest.run(1.0)
+    await publisher
+
+    assert [n for batch in batches for n in batch] == list(range(8))
+    assert all(len(batch) <= 4 for batch in batches)
+    assert stats.messages == 8
+    assert stats.connections == 2
+    assert broker.acked == 8
+
+
+@pytest.mark.asyncio
+async def test_failed_batches_are_dropped(broker):
+    handled = []
+
+    async def handle_batch(batch):
+        if b'{"n": 0}' in batch:
+            raise RuntimeError("tag store down")
+        handled.extend(batch)
+
+    async def publish():
+        await subscribed(broker)
+        await broker.publish("v3/app@ttn/devices/dev-1/up", b'{"n": 0}')
+        await asyncio.sleep(0.2)
+        await broker.publish("v3/app@ttn/devices/dev-1/up", b'{"n": 1}')
+
+    publisher = asyncio.create_task(publish())
+    stats = await MqttIngest(
+        lambda: client_for(broker), TOPIC, handle_batch, window=0.05
+    ).run(0.5)
+    await publisher
+
+    # The stream carries on past the failed batch, which isn't retried
+    assert handled == [b'{"n": 1}']
+    assert (stats.errors, stats.messages, stats.batches) == (1, 1, 1)
+    # Both are acknowledged, so the failed one doesn't hold the in-flight window
+    assert broker.acked == 2
+
+
+@pytest.mark.asyncio
+async def test_reader_reconnects_after_an_unexpected_error(broker, monkeypatch):
+    decode_publish = mqtt.decode_publish
+    calls = 0
+
+    def malformed_once(flags, body):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise struct.error("unpack_from requires a buffer of at least 2 bytes")
+        return decode_publish(flags, body)
+
+    monkeypatch.setattr(mqtt, "decode_publish", malformed_once)
+    handled = []
+
+    async def handle_batch(batch):
+        handled.extend(batch)
+
+    async def publish():
+        await subscribed(broker)
+        await broker.publish("v3/app@ttn/devices/dev-1/up", b'{"n": 0}')
+        # The reader has given up on the first connection and made a new one
+        while broker.connections < 2:
+            await asyncio.sleep(0.01)
+        await subscribed(broker)
+        await broker.publish("v3/app@ttn/devices/dev-1/up", b'{"n": 1}')
+
+    publisher = asyncio.create_task(publish())
+    stats = await MqttIngest(
+        lambda: client_for(broker), TOPIC, handle_batch, window=0.05
+    ).run(0.5)
+    await asyncio.wait_for(publisher, 1)
+
+    assert handled == [b'{"n": 1}']
+    assert stats.errors == 1
+    assert stats.connections == 2
+
+
+@pytest.mark.asyncio
+async def test_scheduled_run_ingests_uplinks_over_mqtt(broker, monkeypatch):
+    # Forget uplinks other tests processed
+    monkeypatch.setattr(WARM_STATE, "seen_uplinks", SeenUplinks())
+    device_ids = ["dev-1", "dev-2", "dev-3"]
+    store = FakeTagStore()
+    config = bench_config(
+        device_ids,
+        "http://127.0.0.1:9",
+        ttn_application_id="app",
+        ttn_api_key="key",
+        mqtt_url=broker.url,
+        mqtt_ingest_seconds=1,
+        mqtt_batch_window_ms=100,
+    )
+
+    async def publish():
+        await subscribed(broker)
+        for f_cnt, device_id in enumerate(device_ids * 2, 1):
+            await broker.publish(
+                f"v3/app@ttn/devices/{device_id}/up",
+                json.dumps(uplink(device_id, f_cnt)).encode(),
+            )
+
+    app = BenchApp(config, store)
+    await app.setup()
+    publisher = asyncio.create_task(publish())
+    try:
+        await app.on_schedule(None)
+    finally:
+        await app.close()
+        await WARM_STATE.close()
+    await publisher
+
+    for f_cnt, device_id in enumerate(device_ids, 4):
+        assert store.peek(f"ttn_uplink_{device_id}")["f_cnt"] == f_cnt
+    assert broker.acked == 6
+
+
+@pytest.mark.asyncio
+async def test_every_application_gets_a_subscription(monkeypatch):
+    monkeypatch.setattr(WARM_STATE, "seen_uplinks", SeenUplinks())
+    # Accepts any credentials, as one broker stands in for both applications
+    broker = FakeMqttBroker()
+    await broker.start()
+    store = FakeTagStore()
+    config = bench_config(
+        ["dev-1", "dev-2"],
+        "http://127.0.0.1:9",
+        ttn_application_id="app",
+        ttn_api_key="key",
+        mqtt_url=broker.url,
+        mqtt_ingest_seconds=1,
+        mqtt_batch_window_ms=100,
+    )
+    config.ttn_applications.elements = [
+        SimpleNamespace(elements=[SimpleNamespace(value="other")])
+    ]
+
+    async def publish():
+        await asyncio.wait_for(subscribed(broker, count=2), 5)
+        await broker.publish(
+            "v3/app@ttn/devices/dev-1/up", json.dumps(uplink("dev-1", 1)).encode()
+        )
+        await broker.publish(
+            "v3/other@ttn/devices/dev-2/up", json.dumps(uplink("dev-2", 2)).encode()
+        )
+
+    app = BenchApp(config, store)
+    await app.setup()
+    publisher = asyncio.create_task(publish())
+    try:
+        await app.on_schedule(None)
+    finally:
+        await app.close()
+        await broker.stop()
+    await publisher
+
+    assert broker.connections == 2
+    assert store.peek("ttn_uplink_dev-1")["f_cnt"] == 1
+    assert store.peek("ttn_uplink_dev-2")["f_cnt"] == 2
+
+
+@pytest.mark.asyncio
+async def test_malformed_payloads_are_skipped_alone(monkeypatch):
+    monkeypatch.setattr(WARM_STATE, "seen_uplinks", SeenUplinks())
+    loads = uplinks.loads
+
+    def flaky_loads(payload):
+        if payload == b"boom":
+            raise TypeError("unexpected gateway entry")
+        return loads(payload)
+
+    monkeypatch.setattr(uplinks, "loads", flaky_loads)
+    store = FakeTagStore()
+    app = BenchApp(bench_config(["dev-1"], "http://127.0.0.1:9"), store)
+    await app.setup()
+    await app._ingest_batch(
+        [
+            b"boom",
+            b'{"end_device_ids": {"device_id": "dev-1"}, "uplink_',
+            b"\xff",
+            json.dumps(uplink("dev-1", 7)).encode(),
+        ]
+    )
+
+    assert store.peek("ttn_uplink_dev-1")["f_cnt"] == 7
+    assert app.counters.totals["errors"] >= 3
+
+
+def test_ingest_budget_leaves_room_for_the_flush():
+    assert mqtt_ingest.ingest_budget(60, elapsed=5) == 60
+    assert mqtt_ingest.ingest_budget(600, elapsed=0) == mqtt_ingest.MAX_INGEST_SECONDS
+    # A sweep that spread its pushes over 180 s leaves 90 s
+    assert mqtt_ingest.ingest_budget(240, elapsed=180) == 90
+    assert mqtt_ingest.ingest_budget(240, elapsed=290) == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_sweep_shortens_the_ingest(broker, monkeypatch):
+    monkeypatch.setattr(mqtt_ingest, "INVOCATION_TIMEOUT_SECONDS", 2.5)
+    monkeypatch.setattr(mqtt_ingest, "FLUSH_MARGIN_SECONDS", 0.5)
+    server = FakeTtnServer(latency=1.0)
+    await server.start()
+    store = FakeTagStore()
+    store.put("ttn_downlink_request_slow-1", {"frm_payload": "AQID"})
+    config = bench_config(
+        ["slow-1"],
+        server.url,
+        ttn_application_id="app",
+        ttn_api_key="key",
+        mqtt_url=broker.url,
+        mqtt_ingest_seconds=10,
+    )
+
+    app = BenchApp(config, store)
+    await app.setup()
+    start = time.monotonic()
+    try:
+        await app.on_schedule(None)
+    finally:
+        await app.close()
+        await WARM_STATE.close()
+        await server.stop()
+
+    # About 1 s of sweep, then the 1 s left before the flush margin
+    assert server.downlinks == 1
+    assert broker.connections == 1
+    assert time.monotonic() - start < 2.5
+    assert store.peek("stats") is not None
@@ -0,0 +1,92 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from ttn_platform_interface import pending_index
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from .fakes import BenchApp, FakeTagStore, FakeTtnServer, bench_config
+
+
+def test_mark_and_unmark():
+    now = datetime(2026, 2, 6, tzinfo=UTC)
+    value = pending_index.mark(None, "dev-1", now)
+    value = pending_index.mark(value, "dev-2", now)
+    seen = dict(value)
+
+    # dev-2 is re-marked while the sweep is running
+    value = pending_index.mark(value, "dev-2", now.replace(minute=1))
+
+    assert pending_index.unmark(value, seen) == {"dev-2": "2026-02-06T00:01:00+00:00"}
+
+
+def test_plain_list_is_accepted():
+    assert pending_index.pending_devices(["dev-1", "dev-2"]) == {
+        "dev-1": "",
+        "dev-2": "",
+    }
+
+
+def test_full_sweep_is_due_hourly():
+    now = datetime(2026, 2, 6, 12, tzinfo=UTC)
+    assert pending_index.full_sweep_due(None, now)
+    assert pending_index.full_sweep_due("not a time", now)
+    assert not pending_index.full_sweep_due(
+        now.replace(hour=11, minute=30).isoformat(), now
+    )
+    assert pending_index.full_sweep_due(now.replace(hour=11).isoformat(), now)
+
+
+async def sweep(store: FakeTagStore, device_ids: list[str]) -> FakeTtnServer:
+    server = FakeTtnServer()
+    await server.start()
+    app = BenchApp(bench_config(device_ids, server.url, use_pending_index=True), store)
+    await app.setup()
+    try:
+        await app.on_schedule(None)
+    finally:
+        await app.close()
+        await WARM_STATE.close()
+        await server.stop()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_sweep_visits_only_marked_devices():
+    device_ids = ["dev-1", "dev-2", "dev-3"]
+    store = FakeTagStore()
+    for device_id in device_ids:
+        store.put(f"ttn_downlink_request_{device_id}", {"frm_payload": "AQID"})
+    store.put(pending_index.PENDING_TAG, pending_index.mark(None, "dev-2"))
+    store.put(pending_index.FULL_SWEEP_TAG, datetime.now(UTC).isoformat())
+
+    server = await sweep(store, device_ids)
+
+    assert server.requests == 1
+    assert store.peek("ttn_downlink_request_dev-2") is None
+    # dev-1's and dev-3's marks were lost: their requests wait for a full sweep
+    assert store.peek("ttn_downlink_request_dev-1") == {"frm_payload": "AQID"}
+    assert store.peek(pending_index.PENDING_TAG) == {}
+
+
+@pytest.mark.asyncio
+async def test_full_sweep_sends_requests_whose_mark_was_lost():
+    device_ids = ["dev-1", "dev-2", "dev-3"]
+    store = FakeTagStore()
+    for device_id in device_ids:
+        store.put(f"ttn_downlink_request_{device_id}", {"frm_payload": "AQID"})
+    store.put(pending_index.PENDING_TAG, pending_index.mark(None, "dev-2"))
+    last_full_sweep = datetime.now(UTC) - timedelta(hours=2)
+    store.put(pending_index.FULL_SWEEP_TAG, last_full_sweep.isoformat())
+
+    server = await sweep(store, device_ids)
+
+    assert server.requests == 3
+    assert all(
+        store.peek(f"ttn_downlink_request_{device_id}") is None
+        for device_id in device_ids
+    )
+    assert store.peek(pending_index.PENDING_TAG) == {}
+    assert datetime.fromisoformat(store.peek(pending_index.FULL_SWEEP_TAG)) > (
+        last_full_sweep
+    )
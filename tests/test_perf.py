@@ -0,0 +1,63 @@
+import pytest
+
+from ttn_platform_interface.perf import (
+    PERF_TAG,
+    Histogram,
+    PerfRecorder,
+    aggregate_perf,
+)
+from ttn_platform_interface.tag_buffer import TagWriteBuffer
+
+from .fakes import FakeTagStore
+
+NOW = 1_800_000_000.0
+
+
+def test_histogram_percentiles_are_within_bucket_error():
+    histogram = Histogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+
+    assert histogram.count == 100
+    assert 0.045 <= histogram.percentile(50) <= 0.055
+    assert 0.090 <= histogram.percentile(95) <= 0.1
+    assert histogram.percentile(99) <= histogram.max == 0.1
+
+
+def test_disabled_recorder_records_nothing():
+    perf = PerfRecorder()
+    with perf.timer("stage"):
+        pass
+    assert perf.histograms == {}
+
+    perf.enabled = True
+    with perf.timer("stage"):
+        pass
+    assert perf.histograms["stage"].count == 1
+
+
+@pytest.mark.asyncio
+async def test_shards_are_written_on_a_cadence_and_merged():
+    store = FakeTagStore(stats_shards={"a": "", "b": ""})
+    other = PerfRecorder()
+    other.enabled = True
+    other.record("uplink.total", 0.2)
+
+    buffer = TagWriteBuffer(store)
+    other.stage(buffer, "b", now=NOW)
+    await buffer.flush()
+    other.record("uplink.total", 0.2)
+    other.stage(buffer, "b", now=NOW + 1)  # within the write interval
+    assert not buffer.pending
+
+    local = PerfRecorder()
+    local.enabled = True
+    local.record("uplink.total", 0.1)
+    buffer = TagWriteBuffer(store)
+    await aggregate_perf(buffer, local, "a", now=NOW + 10)
+    await buffer.flush()
+
+    stage = store.tags[PERF_TAG]["stages"]["uplink.total"]
+    assert stage["count"] == 2
+    assert stage["max_ms"] == 200.0
+    assert store.tags[PERF_TAG]["shards"] == 2
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from ttn_platform_interface.rate_limit import SharedBackoff, TokenBucket
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from .fakes import BenchApp, FakeTagStore, FakeTtnServer, bench_config
+
+
+@pytest.mark.asyncio
+async def test_shared_backoff_collapses_overlapping_triggers():
+    backoff = SharedBackoff()
+    loop = asyncio.get_running_loop()
+
+    backoff.trigger(0.05)
+    backoff.trigger(0.01)  # must not shorten the open window
+    assert backoff.active
+
+    start = loop.time()
+    await asyncio.gather(backoff.wait(), backoff.wait(), backoff.wait())
+    assert loop.time() - start >= 0.04
+    assert not backoff.active
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=100, capacity=5)
+    loop = asyncio.get_running_loop()
+
+    start = loop.time()
+    for _ in range(5):
+        await bucket.acquire()
+    assert loop.time() - start < 0.01
+
+    for _ in range(5):
+        await bucket.acquire()
+    assert loop.time() - start >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_sweep_is_bounded_and_pauses_together_on_a_429():
+    # The first push is rate limited, the rest answered normally
+    server = FakeTtnServer(latency=0.02, retry_after=0.2, rate_limit_first=1)
+    await server.start()
+    device_ids = [f"sensor-{i}" for i in range(20)]
+    config = bench_config(device_ids, server.url, downlink_concurrency=4)
+    store = FakeTagStore()
+    for device_id in device_ids:
+        store.put(f"ttn_downlink_request_{device_id}", {"frm_payload": "AQID"})
+
+    app = BenchApp(config, store)
+    await app.setup()
+    try:
+        await app.on_schedule(None)
+    finally:
+        await app.close()
+        await WARM_STATE.close()
+        await server.stop()
+
+    assert server.max_in_flight == 4
+    assert server.downlinks == 20
+    # Every worker waits out the one Retry-After before its next push
+    rate_limited_at = next(end for _, end, status in server.history if status == 429)
+    assert not [
+        arrived
+        for arrived, _, _ in server.history
+        if rate_limited_at + 0.01 < arrived < rate_limited_at + 0.18
+    ]
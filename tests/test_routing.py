@@ -0,0 +1,111 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ttn_platform_interface import routing
+from ttn_platform_interface.routing import TtnApplication
+from ttn_platform_interface.warm_state import WARM_STATE
+
+from .fakes import BenchApp, FakeTagStore, FakeTtnServer, bench_config
+
+
+def _setting(value):
+    return SimpleNamespace(value=value)
+
+
+def application_entry(*values) -> SimpleNamespace:
+    return SimpleNamespace(elements=[_setting(value) for value in values])
+
+
+def test_applications_fall_back_to_the_default():
+    config = bench_config([], "https://eu1.cloud.thethings.network/")
+    config.ttn_applications.elements = [
+        application_entry(
+            "us-app", "https://nam1.cloud.thethings.network", "us-key", None
+        ),
+        application_entry("eu-app-2", None, None, "hook"),
+        application_entry(None, "https://au1.cloud.thethings.network", None, None),
+    ]
+
+    applications = routing.applications_from_config(config)
+
+    assert list(applications) == ["bench-app", "us-app", "eu-app-2"]
+    assert applications["bench-app"] == TtnApplication(
+        "bench-app", "https://eu1.cloud.thethings.network", "bench-key", "doover"
+    )
+    assert applications["us-app"].cluster == "nam1.cloud.thethings.network"
+    assert applications["us-app"].webhook_id == "doover"
+    assert applications["eu-app-2"] == TtnApplication(
+        "eu-app-2", "https://eu1.cloud.thethings.network", "bench-key", "hook"
+    )
+
+
+def test_route_groups_devices_by_cluster():
+    applications = {
+        "eu-app": TtnApplication("eu-app", "https://eu1.cloud.thethings.network", "k"),
+        "eu-app-2": TtnApplication(
+            "eu-app-2", "https://eu1.cloud.thethings.network", "k"
+        ),
+        "us-app": TtnApplication("us-app", "https://nam1.cloud.thethings.network", "k"),
+    }
+    mapped = {"b": "eu-app-2", "c": "us-app", "d": "missing-app"}
+
+    routes = routing.route("abcd", mapped.get, applications)
+
+    assert routes.by_cluster == {
+        "eu1.cloud.thethings.network": ["a", "b"],
+        "nam1.cloud.thethings.network": ["c"],
+    }
+    assert routes.applications["a"].app_id == "eu-app"
+    assert routes.applications["b"].app_id == "eu-app-2"
+    assert routes.unrouted == ["d"]
+
+
+def test_circuit_tag_keeps_the_original_tag_for_the_default_cluster():
+    assert routing.circuit_tag("eu1", "eu1") == "ttn_circuit"
+    assert routing.circuit_tag("nam1", "eu1") == "ttn_circuit_nam1"
+
+
+@pytest.mark.asyncio
+async def test_sweep_fans_out_across_clusters():
+    eu, us = FakeTtnServer(), FakeTtnServer()
+    await eu.start()
+    await us.start()
+    device_ids = ["eu-1", "eu-2", "us-1", "au-1"]
+    config = bench_config(device_ids, eu.url)
+    config.ttn_applications.elements = [
+        application_entry("us-app", us.url, "us-key", None),
+        application_entry("au-app", "http://127.0.0.1:9", None, None),
+    ]
+    for entry in config.device_mapping.elements:
+        device_id = entry.elements[0].value
+        entry.elements[4] = _setting(
+            {"us-1": "us-app", "au-1": "au-app"}.get(device_id)
+        )
+
+    store = FakeTagStore()
+    for device_id in device_ids:
+        store.put(f"ttn_downlink_request_{device_id}", {"frm_payload": "AQID"})
+    # The third cluster is down: its devices are skipped, the rest still sent
+    au_cluster = routing.circuit_tag("127.0.0.1:9", routing.cluster_host(eu.url))
+    store.put(au_cluster, {"state": "open", "open_until": time.time() + 60})
+
+    app = BenchApp(config, store)
+    await app.setup()
+    try:
+        await app.on_schedule(None)
+        assert set(WARM_STATE.http_sessions) == {
+            routing.cluster_host(eu.url),
+            routing.cluster_host(us.url),
+        }
+    finally:
+        await app.close()
+        await WARM_STATE.close()
+        await eu.stop()
+        await us.stop()
+
+    assert eu.applications == {"bench-app": 2}
+    assert us.applications == {"us-app": 1}
+    assert store.peek("ttn_downlink_request_us-1") is None
+    assert store.peek("ttn_downlink_request_au-1") == {"frm_payload": "AQID"}
@@ -0,0 +1,70 @@
+import pytest
+
+from ttn_platform_interface.tag_buffer import TagWriteBuffer
+from ttn_platform_interface.warm_state import TagSnapshotCache
+
+from .fakes import FakeTagStore
+
+
+@pytest.mark.asyncio
+async def test_buffer_coalesces_writes_and_counters():
+    store = FakeTagStore(stats={"uplinks_processed": 4, "errors": 1})
+    buffer = TagWriteBuffer(store)
+
+    buffer.set("ttn_uplink", {"f_cnt": 1})
+    buffer.set("ttn_uplink", {"f_cnt": 2})
+    buffer.increment("stats", "uplinks_processed")
+    buffer.increment("stats", "errors")
+    buffer.increment("stats", "errors")
+    buffer.merge("device_mapping_state", {"dev-1": {"rssi": -40}})
+    assert store.writes == 0
+
+    await buffer.flush()
+
+    assert store.tags["ttn_uplink"] == {"f_cnt": 2}
+    assert store.tags["stats"] == {"uplinks_processed": 5, "errors": 3}
+    assert store.tags["device_mapping_state"] == {"dev-1": {"rssi": -40}}
+    assert store.reads == 2
+    assert store.writes == 3
+    assert not buffer.pending
+
+
+@pytest.mark.asyncio
+async def test_get_sees_pending_mutations():
+    store = FakeTagStore(stats={"errors": 2})
+    buffer = TagWriteBuffer(store)
+
+    buffer.increment("stats", "errors")
+    assert await buffer.get("stats") == {"errors": 3}
+    assert await buffer.get("missing", {}) == {}
+
+
+@pytest.mark.asyncio
+async def test_get_without_keep_does_not_cache():
+    store = FakeTagStore(stats={"errors": 2})
+    buffer = TagWriteBuffer(store)
+
+    assert await buffer.get("stats", keep=False) == {"errors": 2}
+    assert await buffer.get("stats", keep=False) == {"errors": 2}
+    assert store.reads == 2
+
+    await buffer.get("stats")
+    assert await buffer.get("stats", keep=False) == {"errors": 2}
+    assert store.reads == 3
+
+
+@pytest.mark.asyncio
+async def test_snapshots_skip_reads_across_invocations():
+    store = FakeTagStore(stats={"uplinks_processed": 1})
+    snapshots = TagSnapshotCache(frozenset({"stats"}))
+
+    first = TagWriteBuffer(store, snapshots)
+    first.increment("stats", "uplinks_processed")
+    await first.flush()
+
+    second = TagWriteBuffer(store, snapshots)
+    second.increment("stats", "uplinks_processed")
+    await second.flush()
+
+    assert store.tags["stats"] == {"uplinks_processed": 3}
+    assert store.reads == 1
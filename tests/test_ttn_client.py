@@ -0,0 +1,131 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+from email.utils import format_datetime
+
+import pytest
+
+from ttn_platform_interface.circuit_breaker import FAILURE_THRESHOLD, CircuitBreaker
+from ttn_platform_interface.ttn_client import TtnClient, parse_retry_after
+
+
+class FakeResponse:
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def text(self):
+        return "body"
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def post(self, url, json=None, headers=None):
+        self.calls.append((url, json))
+        return self.responses.pop(0) if self.responses else FakeResponse(200)
+
+
+def make_client(session, breaker=None):
+    return TtnClient(
+        session,
+        api_url="https://eu1.example/",
+        app_id="app",
+        webhook_id="doover",
+        api_key="key",
+        breaker=breaker,
+        requests_per_second=1000,
+    )
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("9999") == 60.0
+    assert parse_retry_after("soon") is None
+
+    retry_at = datetime.now(UTC) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+
+@pytest.mark.asyncio
+async def test_push_success():
+    session = FakeSession(FakeResponse(200))
+    result = await make_client(session).push_downlinks("dev-1", {"downlinks": []})
+
+    assert result.ok
+    assert session.calls[0][0] == (
+        "https://eu1.example/api/v3/as/applications/app"
+        "/webhooks/doover/devices/dev-1/down/push"
+    )
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_honours_retry_after():
+    session = FakeSession(FakeResponse(429, {"Retry-After": "0.05"}), FakeResponse(200))
+    loop = asyncio.get_running_loop()
+
+    start = loop.time()
+    result = await make_client(session).push_downlinks("dev-1", {})
+    assert result.ok
+    assert loop.time() - start >= 0.04
+    assert len(session.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    session = FakeSession(FakeResponse(404))
+    result = await make_client(session).push_downlinks("dev-1", {})
+
+    assert not result.ok
+    assert result.status == 404
+    assert len(session.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_skips_without_sending():
+    breaker = CircuitBreaker()
+    for _ in range(FAILURE_THRESHOLD):
+        breaker.record_failure()
+    session = FakeSession()
+
+    result = await make_client(session, breaker).push_downlinks("dev-1", {})
+    assert result.skipped
+    assert not session.calls
+
+
+@pytest.mark.asyncio
+async def test_server_errors_open_the_breaker():
+    breaker = CircuitBreaker(failures=FAILURE_THRESHOLD - 1)
+    session = FakeSession(FakeResponse(503, {"Retry-After": "0"}))
+
+    result = await make_client(session, breaker).push_downlinks("dev-1", {})
+    assert not result.ok
+    assert result.skipped
+    assert breaker.is_open()
+    assert len(session.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_session_factory_is_only_called_on_first_request():
+    session = FakeSession()
+    created = []
+
+    def factory():
+        created.append(session)
+        return session
+
+    client = make_client(factory)
+    assert not created
+
+    await client.push_downlinks("dev-1", {})
+    await client.push_downlinks("dev-2", {})
+    assert created == [session]
+    assert len(session.calls) == 2
@@ -0,0 +1,68 @@
+import pytest
+
+from ttn_platform_interface.tag_buffer import TagWriteBuffer
+from ttn_platform_interface.uplink_history import (
+    append,
+    append_history,
+    history_key,
+    window,
+)
+from ttn_platform_interface.uplinks import UplinkRecord, records_per_device
+
+from .fakes import FakeTagStore
+
+
+def record(f_cnt, device_id="dev-1", decoded=None):
+    return UplinkRecord(
+        device_id=device_id,
+        dev_eui=None,
+        f_port=1,
+        f_cnt=f_cnt,
+        frm_payload=None,
+        decoded_payload=decoded if decoded is not None else {"t": f_cnt / 10},
+        rssi=-50,
+        snr=7.0,
+        received_at=f"2026-01-01T00:00:{f_cnt:02d}Z",
+    )
+
+
+def test_ring_wraps_and_window_is_chronological():
+    ring = append(None, [record(i) for i in range(5)], 3, "now")
+
+    assert ring["count"] == 3
+    assert ring["head"] == 2
+    history = window(ring)
+    assert history["f_cnt"] == [2, 3, 4]
+    assert history["fields"]["t"] == [0.2, 0.3, 0.4]
+    assert window(ring, 2)["f_cnt"] == [3, 4]
+
+
+def test_new_and_vanished_fields():
+    ring = append(None, [record(1, decoded={"a": 1, "nested": {"x": 1}})], 2, "now")
+    assert list(ring["fields"]) == ["a"]
+
+    ring = append(ring, [record(2, decoded={"b": 2})], 2, "now")
+    assert window(ring)["fields"] == {"a": [1, None], "b": [None, 2]}
+
+    ring = append(ring, [record(3, decoded={"b": 3})], 2, "now")
+    assert window(ring)["fields"] == {"b": [2, 3]}
+
+
+def test_resize_keeps_newest_entries():
+    ring = append(None, [record(i) for i in range(4)], 4, "now")
+    ring = append(ring, [record(4)], 2, "now")
+    assert window(ring)["f_cnt"] == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_batch_is_one_write_per_device():
+    store = FakeTagStore()
+    buffer = TagWriteBuffer(store)
+    batch = [record(2), record(1), record(5, device_id="dev-2")]
+
+    await append_history(buffer, "ttn_uplink", records_per_device(batch), 10, "now")
+    await buffer.flush()
+
+    assert store.writes == 2
+    history = window(store.tags[history_key("ttn_uplink", "dev-1")])
+    assert history["f_cnt"] == [1, 2]
@@ -0,0 +1,121 @@
+from ttn_platform_interface.uplinks import (
+    latest_per_device,
+    latest_record,
+    parse_uplink,
+    split_batch,
+)
+
+
+def make_uplink(device_id, f_cnt, received_at, rssi=-80):
+    return {
+        "end_device_ids": {"device_id": device_id, "dev_eui": "0004A30B001C0530"},
+        "uplink_message": {
+            "f_port": 1,
+            "f_cnt": f_cnt,
+            "frm_payload": "AQI=",
+            "rx_metadata": [
+                {"rssi": rssi - 10, "snr": 1.0},
+                {"rssi": rssi, "snr": 7.5},
+            ],
+            "received_at": received_at,
+        },
+    }
+
+
+def test_split_batch_shapes():
+    uplink = make_uplink("dev-1", 1, "2026-02-06T12:00:00Z")
+    assert split_batch(uplink) == [uplink]
+    assert split_batch([uplink, uplink, "junk"]) == [uplink, uplink]
+    assert split_batch({"uplinks": [uplink]}) == [uplink]
+    assert split_batch("junk") == []
+
+
+def test_parse_uplink_picks_best_gateway():
+    record = parse_uplink(make_uplink("dev-1", 3, "2026-02-06T12:00:00Z", rssi=-42))
+    assert record.device_id == "dev-1"
+    assert record.f_cnt == 3
+    assert (record.rssi, record.snr) == (-42, 7.5)
+    assert parse_uplink({"uplink_message": {}}) is None
+
+
+def test_null_rssi_gateways_rank_last():
+    message = make_uplink("dev-1", 3, "2026-02-06T12:00:00Z")
+    message["uplink_message"]["rx_metadata"] = [
+        {"rssi": None, "snr": 9.0},
+        {"rssi": -95, "snr": 2.0},
+        {"snr": 8.0},
+    ]
+    record = parse_uplink(message)
+    assert (record.rssi, record.snr) == (-95, 2.0)
+
+
+def test_loads_handles_null_rssi_and_truncated_messages(monkeypatch):
+    import json
+
+    import pytest
+
+    from ttn_platform_interface import uplinks
+
+    # Stream messages far smaller than a real micro-batch
+    monkeypatch.setattr(uplinks, "STREAMING_THRESHOLD", 8192)
+    message = make_uplink("dev-1", 5, "2026-02-06T12:00:00Z")
+    message["uplink_message"]["rx_metadata"] = [
+        {
+            "gateway_ids": {"gateway_id": f"gw-{i}"},
+            "rssi": None if i % 2 else -120 + i % 50,
+        }
+        for i in range(400)
+    ]
+    text = json.dumps(message)
+    assert len(text) > uplinks.STREAMING_THRESHOLD
+
+    compact = uplinks.loads(text)
+    assert compact["uplink_message"]["rx_metadata"] == [{"rssi": -72, "snr": None}]
+    with pytest.raises(ValueError):
+        uplinks.loads(text[: text.index('"rx_metadata"') + 20])
+
+
+def test_latest_per_device_orders_by_received_at():
+    records = [
+        parse_uplink(make_uplink("dev-1", 2, "2026-02-06T12:00:05.123456789Z")),
+        parse_uplink(make_uplink("dev-1", 1, "2026-02-06T12:00:00Z")),
+        parse_uplink(make_uplink("dev-2", 9, "2026-02-06T12:00:01Z")),
+    ]
+    latest = latest_per_device(records)
+    assert latest["dev-1"].f_cnt == 2
+    assert latest["dev-2"].f_cnt == 9
+    assert latest_record(records).f_cnt == 2
+
+
+def test_loads_compacts_large_rx_metadata(monkeypatch):
+    import json
+
+    from ttn_platform_interface import uplinks
+
+    # Stream messages far smaller than a real micro-batch
+    monkeypatch.setattr(uplinks, "STREAMING_THRESHOLD", 8192)
+    message = make_uplink("dev-1", 5, "2026-02-06T12:00:00Z")
+    message["uplink_message"]["rx_metadata"] = [
+        {"gateway_ids": {"gateway_id": f"gw-{i}"}, "rssi": -120 + i % 50, "snr": i / 10}
+        for i in range(400)
+    ]
+    text = json.dumps([message, message])
+    assert len(text) > uplinks.STREAMING_THRESHOLD
+
+    compact = uplinks.loads(text)
+    assert compact[0]["uplink_message"]["rx_metadata"] == [{"rssi": -71, "snr": 4.9}]
+    assert parse_uplink(compact[1]) == parse_uplink(json.loads(text)[1])
+
+
+def test_decode_payload_runs_registered_decoder():
+    from ttn_platform_interface.decoders import register_decoder, unregister_decoder
+
+    register_decoder(1, lambda raw: {"bytes": list(raw)})
+    try:
+        record = parse_uplink(make_uplink("dev-1", 1, None), decode_payload=True)
+    finally:
+        unregister_decoder(1)
+
+    assert record.payload_hex == "0102"
+    assert record.decoded_payload == {"bytes": [1, 2]}
+    assert record.to_tag("now")["payload_hex"] == "0102"
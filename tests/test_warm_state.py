@@ -0,0 +1,60 @@
+import asyncio
+import gc
+import warnings
+
+import pytest
+
+from ttn_platform_interface.warm_state import WarmState
+
+from .fakes import FakeTtnServer
+
+
+def test_sessions_from_a_previous_loop_are_released():
+    state = WarmState()
+    server = FakeTtnServer()
+
+    async def invocation():
+        # A live keep-alive connection, as a downlink push would leave
+        await server.start()
+        session = state.get_http_session("eu1")
+        url = f"{server.url}/api/v3/as/applications/a/webhooks/w/devices/d/down/push"
+        async with session.post(url, json={}):
+            pass
+        await server.stop()
+        return session, session.connector
+
+    errors = []
+
+    def run(coro):
+        # A runtime that uses asyncio.run per invocation gets a new loop each time
+        loop = asyncio.new_event_loop()
+        loop.set_exception_handler(lambda loop, context: errors.append(context))
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        first, first_connector = run(invocation())
+        second, _ = run(invocation())
+        assert second is not first
+        assert first.closed and first_connector.closed
+
+        run(state.close())
+        assert second.closed
+        del first, second
+        gc.collect()
+
+    assert not errors
+    assert not [w for w in caught if "Unclosed" in str(w.message)]
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_reused_on_the_same_loop():
+    state = WarmState()
+    try:
+        assert state.get_http_session("eu1") is state.get_http_session("eu1")
+        assert state.get_http_session("eu1") is not state.get_http_session("nam1")
+    finally:
+        await state.close()